@@ -0,0 +1,49 @@
+"""Coocorrência de filmes favoritos
+
+Revision ID: 2c8d5a1f6b90
+Revises: 9b4f7e2c1a63
+Create Date: 2026-10-18 17:02:47.193356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c8d5a1f6b90'
+down_revision: Union[str, Sequence[str], None] = '9b4f7e2c1a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'filme_coocorrencias',
+        sa.Column('filme_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('outro_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['filme_id'], ['filmes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['outro_id'], ['filmes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('filme_id', 'outro_id'),
+    )
+    op.create_index('ix_filme_coocorrencias_filme_id_total', 'filme_coocorrencias', ['filme_id', 'total'], unique=False)
+    op.create_index('ix_filme_coocorrencias_outro_id', 'filme_coocorrencias', ['outro_id'], unique=False)
+    # Contagens dos favoritos já existentes
+    op.execute(
+        "INSERT INTO filme_coocorrencias (filme_id, outro_id, total) "
+        "SELECT a.filme_id, b.filme_id, COUNT(*) "
+        "FROM usuario_filmes_favoritos a "
+        "JOIN usuario_filmes_favoritos b ON b.usuario_id = a.usuario_id AND b.filme_id <> a.filme_id "
+        "GROUP BY a.filme_id, b.filme_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_filme_coocorrencias_outro_id', table_name='filme_coocorrencias')
+    op.drop_index('ix_filme_coocorrencias_filme_id_total', table_name='filme_coocorrencias')
+    op.drop_table('filme_coocorrencias')
@@ -0,0 +1,28 @@
+"""Índice para paginação por cursor de filmes
+
+Revision ID: 3f1c9a7d2b40
+Revises: a8761ca298e6
+Create Date: 2026-10-18 09:12:04.311842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b40'
+down_revision: Union[str, Sequence[str], None] = 'a8761ca298e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_filmes_titulo_id', 'filmes', ['titulo', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_filmes_titulo_id', table_name='filmes')
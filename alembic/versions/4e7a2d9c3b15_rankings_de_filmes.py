@@ -0,0 +1,44 @@
+"""Rankings de filmes por média bayesiana
+
+Revision ID: 4e7a2d9c3b15
+Revises: 2c8d5a1f6b90
+Create Date: 2026-10-18 18:11:05.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7a2d9c3b15'
+down_revision: Union[str, Sequence[str], None] = '2c8d5a1f6b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Preenchida por `python -m app.cli atualizar-rankings`
+    op.create_table(
+        'filme_rankings',
+        sa.Column('escopo', sa.String(length=20), nullable=False),
+        sa.Column('chave', sa.String(length=100), nullable=False),
+        sa.Column('posicao', sa.Integer(), nullable=False),
+        sa.Column('filme_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('nota', sa.Float(), nullable=False),
+        sa.Column('media', sa.Float(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('calculado_em', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['filme_id'], ['filmes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('escopo', 'chave', 'posicao'),
+    )
+    op.create_index('ix_filme_rankings_filme_id', 'filme_rankings', ['filme_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_filme_rankings_filme_id', table_name='filme_rankings')
+    op.drop_table('filme_rankings')
@@ -0,0 +1,108 @@
+"""Elenco normalizado
+
+Revision ID: 5d93b0e7a214
+Revises: c41d8e6a9f27
+Create Date: 2026-10-18 11:32:40.512807
+
+"""
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d93b0e7a214'
+down_revision: Union[str, Sequence[str], None] = 'c41d8e6a9f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Filmes migrados por lote
+LOTE = 1000
+
+filmes = sa.table(
+    'filmes',
+    sa.column('id', postgresql.UUID(as_uuid=True)),
+    sa.column('elenco', sa.String()),
+)
+pessoas = sa.table(
+    'pessoas',
+    sa.column('id', postgresql.UUID(as_uuid=True)),
+    sa.column('nome', sa.String()),
+)
+filme_elenco = sa.table(
+    'filme_elenco',
+    sa.column('filme_id', postgresql.UUID(as_uuid=True)),
+    sa.column('pessoa_id', postgresql.UUID(as_uuid=True)),
+    sa.column('ordem', sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pessoas',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('nome', sa.String(length=200), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('nome')
+    )
+    op.create_table('filme_elenco',
+    sa.Column('filme_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('pessoa_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('ordem', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['filme_id'], ['filmes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['pessoa_id'], ['pessoas.id'], ),
+    sa.PrimaryKeyConstraint('filme_id', 'pessoa_id')
+    )
+    op.create_index('ix_filme_elenco_pessoa_id_filme_id', 'filme_elenco', ['pessoa_id', 'filme_id'], unique=False)
+
+    # Converte a string separada por vírgulas em pessoas e créditos
+    conn = op.get_bind()
+    ids_pessoas = {}
+    resultado = conn.execute(sa.select(filmes.c.id, filmes.c.elenco).where(filmes.c.elenco.is_not(None)))
+    while True:
+        linhas = resultado.fetchmany(LOTE)
+        if not linhas:
+            break
+        novas, creditos = [], []
+        for filme_id, elenco in linhas:
+            nomes = dict.fromkeys(n.strip() for n in elenco.split(',') if n.strip())
+            for ordem, nome in enumerate(nomes):
+                if nome not in ids_pessoas:
+                    ids_pessoas[nome] = uuid.uuid4()
+                    novas.append({'id': ids_pessoas[nome], 'nome': nome})
+                creditos.append({'filme_id': filme_id, 'pessoa_id': ids_pessoas[nome], 'ordem': ordem})
+        if novas:
+            conn.execute(pessoas.insert(), novas)
+        if creditos:
+            conn.execute(filme_elenco.insert(), creditos)
+    resultado.close()
+
+    # O documento de busca não muda: o elenco continua indexado com peso B,
+    # agora concatenado a partir de filme_elenco pelo SearchService.
+    with op.batch_alter_table('filmes') as batch_op:
+        batch_op.drop_column('elenco')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('filmes') as batch_op:
+        batch_op.add_column(sa.Column('elenco', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    creditos = conn.execute(
+        sa.select(filme_elenco.c.filme_id, pessoas.c.nome)
+        .join(pessoas, pessoas.c.id == filme_elenco.c.pessoa_id)
+        .order_by(filme_elenco.c.filme_id, filme_elenco.c.ordem)
+    )
+    elencos = {}
+    for filme_id, nome in creditos:
+        elencos.setdefault(filme_id, []).append(nome)
+    for filme_id, nomes in elencos.items():
+        conn.execute(filmes.update().where(filmes.c.id == filme_id).values(elenco=', '.join(nomes)))
+
+    op.drop_index('ix_filme_elenco_pessoa_id_filme_id', table_name='filme_elenco')
+    op.drop_table('filme_elenco')
+    op.drop_table('pessoas')
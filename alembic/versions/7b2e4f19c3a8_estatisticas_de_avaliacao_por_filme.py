@@ -0,0 +1,44 @@
+"""Estatísticas de avaliação por filme
+
+Revision ID: 7b2e4f19c3a8
+Revises: 3f1c9a7d2b40
+Create Date: 2026-10-18 10:02:41.527310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e4f19c3a8'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7d2b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NOTAS = range(11)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('filme_estatisticas',
+    sa.Column('filme_id', sa.UUID(), nullable=False),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('soma', sa.Float(), server_default='0', nullable=False),
+    *[sa.Column(f'nota_{n}', sa.Integer(), server_default='0', nullable=False) for n in NOTAS],
+    sa.ForeignKeyConstraint(['filme_id'], ['filmes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('filme_id')
+    )
+    # Popula os agregados a partir das avaliações existentes
+    histograma = ", ".join(f"SUM(CASE WHEN ROUND(nota) = {n} THEN 1 ELSE 0 END)" for n in NOTAS)
+    colunas = ", ".join(f"nota_{n}" for n in NOTAS)
+    op.execute(
+        f"INSERT INTO filme_estatisticas (filme_id, total, soma, {colunas}) "
+        f"SELECT filme_id, COUNT(*), SUM(nota), {histograma} FROM avaliacoes GROUP BY filme_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('filme_estatisticas')
@@ -0,0 +1,40 @@
+"""Vizinhos de filmes para recomendações
+
+Revision ID: 9b4f7e2c1a63
+Revises: e6a1c94f2d07
+Create Date: 2026-10-18 16:21:05.744102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4f7e2c1a63'
+down_revision: Union[str, Sequence[str], None] = 'e6a1c94f2d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'filme_vizinhos',
+        sa.Column('filme_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('vizinho_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('similaridade', sa.Float(), nullable=False),
+        sa.Column('calculado_em', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['filme_id'], ['filmes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['vizinho_id'], ['filmes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('filme_id', 'vizinho_id'),
+    )
+    op.create_index('ix_filme_vizinhos_vizinho_id', 'filme_vizinhos', ['vizinho_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_filme_vizinhos_vizinho_id', table_name='filme_vizinhos')
+    op.drop_table('filme_vizinhos')
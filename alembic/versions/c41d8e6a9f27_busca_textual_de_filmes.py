@@ -0,0 +1,53 @@
+"""Busca textual de filmes
+
+Revision ID: c41d8e6a9f27
+Revises: 7b2e4f19c3a8
+Create Date: 2026-10-18 10:48:15.904126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# Mesma configuração (SEARCH_LANGUAGE) que o SearchService usa nas consultas
+from app.services.search_service import SEARCH_LANGUAGE
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d8e6a9f27'
+down_revision: Union[str, Sequence[str], None] = '7b2e4f19c3a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.add_column('filmes', sa.Column('busca', postgresql.TSVECTOR(), nullable=True))
+        op.execute(
+            sa.text(
+                "UPDATE filmes SET busca = "
+                "setweight(to_tsvector(CAST(:config AS regconfig), coalesce(titulo, '')), 'A') || "
+                "setweight(to_tsvector(CAST(:config AS regconfig), coalesce(elenco, '')), 'B') || "
+                "setweight(to_tsvector(CAST(:config AS regconfig), coalesce(sinopse, '')), 'C')"
+            ).bindparams(config=SEARCH_LANGUAGE)
+        )
+        op.create_index('ix_filmes_busca', 'filmes', ['busca'], unique=False, postgresql_using='gin')
+    else:
+        op.add_column('filmes', sa.Column('busca', sa.Text(), nullable=True))
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS filmes_fts USING fts5("
+            "filme_id UNINDEXED, titulo, elenco, sinopse, tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute("INSERT INTO filmes_fts (filme_id, titulo, elenco, sinopse) SELECT id, titulo, elenco, sinopse FROM filmes")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_filmes_busca', table_name='filmes', postgresql_using='gin')
+    else:
+        op.execute("DROP TABLE IF EXISTS filmes_fts")
+    op.drop_column('filmes', 'busca')
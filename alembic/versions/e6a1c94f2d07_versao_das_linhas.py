@@ -0,0 +1,46 @@
+"""Versão e data de atualização das linhas
+
+Revision ID: e6a1c94f2d07
+Revises: 5d93b0e7a214
+Create Date: 2026-10-18 15:04:12.318460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a1c94f2d07'
+down_revision: Union[str, Sequence[str], None] = '5d93b0e7a214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABELAS = ('usuarios', 'filmes', 'avaliacoes')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for tabela in TABELAS:
+        # O SQLite não aceita ADD COLUMN com default não constante (CURRENT_TIMESTAMP):
+        # a coluna entra anulável, é preenchida e só então vira NOT NULL.
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.add_column(sa.Column('versao', sa.Integer(), nullable=False, server_default='1'))
+            batch_op.add_column(sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=True))
+        op.execute(sa.text(f"UPDATE {tabela} SET atualizado_em = CURRENT_TIMESTAMP"))
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.alter_column(
+                'atualizado_em',
+                existing_type=sa.DateTime(timezone=True),
+                nullable=False,
+                server_default=sa.func.now(),
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabela in reversed(TABELAS):
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.drop_column('atualizado_em')
+            batch_op.drop_column('versao')
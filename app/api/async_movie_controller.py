@@ -0,0 +1,68 @@
+from typing import List, Optional, Union
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database, schemas
+from app.etag import etag, not_modified_response, parse_if_match, version_headers
+from app.services.movie_service import AsyncMovieService
+
+# Rotas de filmes para o modo DB_ASYNC. Os ids usam o conversor `uuid` para
+# que caminhos como /filmes/busca continuem chegando ao controller síncrono.
+router = APIRouter()
+
+
+@router.post("/", response_model=schemas.FilmeOut, status_code=status.HTTP_201_CREATED)
+async def criar_filme(filme: schemas.FilmeCreate, db: AsyncSession = Depends(database.get_async_db)):
+    return await AsyncMovieService.create_movie(db, filme)
+
+
+@router.get("/", response_model=Union[List[schemas.FilmeOut], schemas.FilmePagina])
+async def listar_filmes(
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    ator: Optional[str] = Query(None, description="Apenas filmes com esta pessoa no elenco (nome exato)"),
+    db: AsyncSession = Depends(database.get_async_read_db),
+):
+    payload = await AsyncMovieService.list_movies_json(db, skip=skip, limit=limit, cursor=cursor, ator=ator)
+    return Response(content=payload, media_type="application/json")
+
+
+@router.get("/{filme_id:uuid}", response_model=schemas.FilmeOut)
+async def obter_filme(filme_id: UUID, request: Request, db: AsyncSession = Depends(database.get_async_read_db)):
+    versao = await AsyncMovieService.get_movie_version(db, filme_id)
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    resposta = not_modified_response(request, etag(versao.versao), versao.atualizado_em)
+    if resposta is not None:
+        return resposta
+    entrada = await AsyncMovieService.get_movie_json(db, filme_id, versao=versao.versao)
+    if entrada is None:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    versao_atual, atualizado_em, payload = entrada
+    return Response(content=payload, media_type="application/json", headers=version_headers(etag(versao_atual), atualizado_em))
+
+
+@router.put("/{filme_id:uuid}", response_model=schemas.FilmeOut)
+async def atualizar_filme(
+    filme_id: UUID,
+    filme_update: schemas.FilmeUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    filme = await AsyncMovieService.update_movie(db, filme_id, filme_update, versoes=parse_if_match(if_match))
+    if not filme:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    response.headers.update(version_headers(etag(filme.versao), filme.atualizado_em))
+    return filme
+
+
+@router.delete("/{filme_id:uuid}", status_code=status.HTTP_204_NO_CONTENT)
+async def deletar_filme(filme_id: UUID, db: AsyncSession = Depends(database.get_async_db)):
+    deleted = await AsyncMovieService.delete_movie(db, filme_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    return None
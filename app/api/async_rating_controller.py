@@ -0,0 +1,52 @@
+from typing import List, Optional, Union
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database, schemas
+from app.etag import etag, not_modified_response, parse_if_match, version_headers
+from app.services.rating_service import AsyncRatingService
+
+# Rotas de avaliações para o modo DB_ASYNC
+router = APIRouter()
+
+@router.post("/", response_model=schemas.AvaliacaoOut, status_code=status.HTTP_201_CREATED)
+async def criar_avaliacao(avaliacao: schemas.AvaliacaoCreate, db: AsyncSession = Depends(database.get_async_db)):
+    return await AsyncRatingService.create_rating(db, avaliacao)
+
+@router.get("/", response_model=Union[List[schemas.AvaliacaoOut], schemas.AvaliacaoPagina])
+async def listar_avaliacoes(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(database.get_async_read_db)):
+    if cursor is not None:
+        avaliacoes, next_cursor = await AsyncRatingService.list_ratings_keyset(db, cursor, limit)
+        return {"itens": avaliacoes, "next_cursor": next_cursor}
+    return await AsyncRatingService.list_ratings(db, skip, limit)
+
+@router.get("/{avaliacao_id:uuid}", response_model=schemas.AvaliacaoOut)
+async def obter_avaliacao(avaliacao_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(database.get_async_read_db)):
+    versao = await AsyncRatingService.get_rating_version(db, avaliacao_id)
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Avaliação não encontrada")
+    resposta = not_modified_response(request, etag(versao.versao), versao.atualizado_em)
+    if resposta is not None:
+        return resposta
+    avaliacao = await AsyncRatingService.get_rating(db, avaliacao_id)
+    response.headers.update(version_headers(etag(avaliacao.versao), avaliacao.atualizado_em))
+    return avaliacao
+
+@router.put("/{avaliacao_id:uuid}", response_model=schemas.AvaliacaoOut)
+async def atualizar_avaliacao(
+    avaliacao_id: UUID,
+    avaliacao_update: schemas.AvaliacaoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    avaliacao = await AsyncRatingService.update_rating(db, avaliacao_id, avaliacao_update, versoes=parse_if_match(if_match))
+    response.headers.update(version_headers(etag(avaliacao.versao), avaliacao.atualizado_em))
+    return avaliacao
+
+@router.delete("/{avaliacao_id:uuid}", status_code=status.HTTP_204_NO_CONTENT)
+async def deletar_avaliacao(avaliacao_id: UUID, db: AsyncSession = Depends(database.get_async_db)):
+    await AsyncRatingService.delete_rating(db, avaliacao_id)
+    return None
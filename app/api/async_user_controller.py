@@ -0,0 +1,122 @@
+from typing import List, Optional, Union
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, Security, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database, schemas
+from app.etag import etag, not_modified_response, parse_if_match, version_headers
+from app.api.user_controller import oauth2_scheme
+from app.cache import principais_cache
+from fastapi.security import OAuth2PasswordRequestForm
+from app.services.auth_service import (
+    authenticate_user_async,
+    create_access_token,
+    decode_access_token,
+    get_password_hash_async,
+    principal_cache_key,
+    principal_from_claims,
+    token_claims,
+)
+from app.services.user_service import AsyncUserService
+
+# Rotas de usuários para o modo DB_ASYNC. As listas de filmes continuam no
+# controller síncrono.
+router = APIRouter()
+
+async def get_current_user(token: str = Security(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)) -> schemas.UsuarioIdentidade:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Não foi possível validar as credenciais",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    payload = decode_access_token(token)
+    if payload is None or "sub" not in payload:
+        raise credentials_exception
+    principal = principal_from_claims(payload)
+    if principal is not None:
+        return principal
+    chave = principal_cache_key(payload)
+    principal = principais_cache.get(chave)
+    if principal is None:
+        token_cache = principais_cache.token()
+        try:
+            user_id = UUID(payload["sub"])
+        except ValueError:
+            raise credentials_exception
+        principal = await AsyncUserService.get_identity(db, user_id)
+        if principal is None:
+            raise credentials_exception
+        principais_cache.set(chave, principal, tags=(user_id,), token=token_cache)
+    return principal
+
+@router.post("/", response_model=schemas.UsuarioResumo, status_code=status.HTTP_201_CREATED)
+async def create_usuario(usuario: schemas.UsuarioCreate, db: AsyncSession = Depends(database.get_async_db)):
+    # O bcrypt é CPU-bound: roda no pool dedicado, fora do event loop
+    usuario_dict = usuario.model_dump()
+    usuario_dict["senha"] = await get_password_hash_async(usuario.senha)
+    return await AsyncUserService.create_user(db, schemas.UsuarioCreate(**usuario_dict))
+
+@router.post("/login", summary="Autenticação de usuário")
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(status_code=400, detail="Usuário ou senha incorretos")
+    access_token = create_access_token(data=token_claims(user))
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.get("/", response_model=Union[List[schemas.UsuarioResumo], schemas.UsuarioPagina])
+async def list_usuarios(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(database.get_async_read_db)):
+    payload = await AsyncUserService.list_users_json(db, skip=skip, limit=limit, cursor=cursor)
+    return Response(content=payload, media_type="application/json")
+
+@router.get("/me", response_model=schemas.UsuarioIdentidade)
+async def read_users_me(current_user: schemas.UsuarioIdentidade = Depends(get_current_user)):
+    return current_user
+
+@router.get("/{usuario_id:uuid}", response_model=schemas.UsuarioResumo)
+async def get_usuario(
+    usuario_id: UUID,
+    request: Request,
+    response: Response,
+    listas: bool = Query(False, description="Inclui os filmes das três listas (UsuarioOut)"),
+    db: AsyncSession = Depends(database.get_async_read_db),
+):
+    versao = await AsyncUserService.get_user_version(db, usuario_id, listas=listas)
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    componentes, atualizado_em = versao
+    tag = etag(*componentes)
+    resposta = not_modified_response(request, tag, atualizado_em)
+    if resposta is not None:
+        return resposta
+    usuario = await AsyncUserService.get_user(db, usuario_id, listas=listas)
+    if listas:
+        # Representação completa (legada): serializada aqui, fora do response_model
+        return Response(
+            content=schemas.UsuarioOut.model_validate(usuario).model_dump_json(),
+            media_type="application/json",
+            headers=version_headers(tag, atualizado_em),
+        )
+    response.headers.update(version_headers(tag, atualizado_em))
+    return usuario
+
+@router.put("/{usuario_id:uuid}", response_model=schemas.UsuarioResumo)
+async def update_usuario(
+    usuario_id: UUID,
+    usuario_update: schemas.UsuarioUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    if usuario_update.senha is not None:
+        usuario_update.senha = await get_password_hash_async(usuario_update.senha)
+    usuario = await AsyncUserService.update_user(db, usuario_id, usuario_update, versoes=parse_if_match(if_match))
+    componentes, atualizado_em = await AsyncUserService.get_user_version(db, usuario_id)
+    response.headers.update(version_headers(etag(*componentes), atualizado_em))
+    return usuario
+
+@router.delete("/{usuario_id:uuid}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_usuario(usuario_id: UUID, db: AsyncSession = Depends(database.get_async_db)):
+    await AsyncUserService.delete_user(db, usuario_id)
+    return None
@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+
+from app import database
+from app.cache import filmes_cache, principais_cache
+from app.services.auth_service import BCRYPT_ROUNDS, hashing_pool
+
+router = APIRouter()
+
+
+@router.get("/pool", summary="Ocupação dos pools de conexões")
+def pool():
+    pools = {nome: database.pool_stats(engine) for nome, engine in database.todos_os_pools().items()}
+    return {
+        "configuracao": {
+            "pool_size": database.DB_POOL_SIZE,
+            "max_overflow": database.DB_MAX_OVERFLOW,
+            "pool_timeout": database.DB_POOL_TIMEOUT,
+            "pool_recycle": database.DB_POOL_RECYCLE,
+            "pool_pre_ping": database.DB_POOL_PRE_PING,
+        },
+        "pools": pools,
+        "replicas": database.replicas.stats() if database.replicas is not None else [],
+        "replicas_async": database.async_replicas.stats() if database.async_replicas is not None else [],
+    }
+
+
+@router.get("/cache", summary="Estatísticas dos caches em memória")
+def cache():
+    return {"filmes": filmes_cache.stats(), "principais": principais_cache.stats()}
+
+
+@router.get("/senhas", summary="Fila e latência do pool de hashing de senhas")
+def senhas():
+    return {"bcrypt_rounds": BCRYPT_ROUNDS, **hashing_pool.stats()}
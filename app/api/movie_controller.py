@@ -1,11 +1,18 @@
-from typing import List
+import codecs
+from typing import List, Optional, Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app import database, models, schemas
+from app.etag import etag, not_modified_response, parse_if_match, version_headers
+from app.services.cooccurrence_service import CooccurrenceService
+from app.services.export_service import MEDIA_TYPES, ExportService, em_sessao_propria
+from app.services.import_service import FORMATOS, ImportService, ler_csv, ler_ndjson
 from app.services.movie_service import MovieService
+from app.services.ranking_service import RANKING_TAMANHO, RankingService
 
 router = APIRouter()
 
@@ -20,43 +27,104 @@ def get_db():
 
 @router.post("/", response_model=schemas.FilmeOut, status_code=status.HTTP_201_CREATED)
 def criar_filme(filme: schemas.FilmeCreate, db: Session = Depends(database.get_db)):
-    db_filme = MovieService.create_movie(db, filme)
-    # Converte elenco de string para lista antes de retornar
-    if db_filme.elenco:
-        db_filme.elenco = [e.strip() for e in db_filme.elenco.split(",")]
-    else:
-        db_filme.elenco = []
-    return db_filme
-
-
-@router.get("/", response_model=List[schemas.FilmeOut])
-def listar_filmes(skip: int = 0, limit: int = 20, db: Session = Depends(database.get_db)):
-    filmes = MovieService.list_movies(db, skip=skip, limit=limit)
-    for filme in filmes:
-        if filme.elenco:
-            filme.elenco = [e.strip() for e in filme.elenco.split(",")]
-        else:
-            filme.elenco = []
-    return filmes
+    return MovieService.create_movie(db, filme)
+
+
+@router.post("/importar", response_model=schemas.ImportacaoResultado)
+def importar_filmes(
+    arquivo: UploadFile = File(..., description="NDJSON (um filme por linha) ou CSV com cabeçalho"),
+    formato: Optional[str] = Query(None, description="ndjson ou csv; por padrão, deduzido da extensão"),
+    db: Session = Depends(database.get_db),
+):
+    formato = formato or ("csv" if (arquivo.filename or "").lower().endswith(".csv") else "ndjson")
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato deve ser ndjson ou csv")
+    # Lido linha a linha a partir do arquivo temporário do upload
+    linhas = codecs.iterdecode(arquivo.file, "utf-8-sig")
+    leitor = ler_csv if formato == "csv" else ler_ndjson
+    return ImportService.import_movies(db, leitor(linhas))
+
+
+@router.get("/", response_model=Union[List[schemas.FilmeOut], schemas.FilmePagina])
+def listar_filmes(
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    ator: Optional[str] = Query(None, description="Apenas filmes com esta pessoa no elenco (nome exato)"),
+    db: Session = Depends(database.get_read_db),
+):
+    # Com `cursor` (vazio para a primeira página) a paginação é por chave e a
+    # resposta inclui `next_cursor`; sem ele, mantém o skip/limit original.
+    # A página vem serializada do cache de filmes (ver app/cache.py).
+    payload = MovieService.list_movies_json(db, skip=skip, limit=limit, cursor=cursor, ator=ator)
+    return Response(content=payload, media_type="application/json")
+
+
+@router.get("/busca", response_model=schemas.FilmePagina)
+def buscar_filmes(
+    q: str = Query(..., min_length=1, description="Termos buscados em título, elenco e sinopse"),
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_read_db),
+):
+    filmes, next_cursor = MovieService.search_movies(db, q, cursor=cursor, limit=limit)
+    return {"itens": filmes, "next_cursor": next_cursor}
+
+
+@router.get("/ranking", response_model=List[schemas.FilmeRankingOut])
+def ranking_filmes(
+    genero: Optional[str] = Query(None, description="Ranking do gênero (nome exato)"),
+    decada: Optional[int] = Query(None, description="Ranking da década, ex.: 1990"),
+    limit: int = Query(20, ge=1, le=RANKING_TAMANHO),
+    db: Session = Depends(database.get_read_db),
+):
+    # Sem filtros, o ranking geral
+    return RankingService.get_ranking(db, genero=genero, decada=decada, limit=limit)
+
+
+@router.get("/exportar", summary="Exporta o catálogo em NDJSON ou CSV (formato aceito por /importar)")
+def exportar_filmes(formato: str = Query("ndjson", description="ndjson ou csv")):
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato deve ser ndjson ou csv")
+    return StreamingResponse(
+        em_sessao_propria(database.fabrica_de_leitura(), ExportService.export_movies, formato),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="filmes.{formato}"'},
+    )
 
 
 @router.get("/{filme_id}", response_model=schemas.FilmeOut)
-def obter_filme(filme_id: UUID, db: Session = Depends(database.get_db)):
-    filme = MovieService.get_movie(db, filme_id)
-    if not filme:
+def obter_filme(filme_id: UUID, request: Request, db: Session = Depends(database.get_read_db)):
+    versao = MovieService.get_movie_version(db, filme_id)
+    if versao is None:
         raise HTTPException(status_code=404, detail="Filme não encontrado")
-    if filme.elenco:
-        filme.elenco = [e.strip() for e in filme.elenco.split(",")]
-    else:
-        filme.elenco = []
-    return filme
+    resposta = not_modified_response(request, etag(versao.versao), versao.atualizado_em)
+    if resposta is not None:
+        return resposta
+    entrada = MovieService.get_movie_json(db, filme_id, versao=versao.versao)
+    if entrada is None:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    versao_atual, atualizado_em, payload = entrada
+    return Response(content=payload, media_type="application/json", headers=version_headers(etag(versao_atual), atualizado_em))
+
+
+@router.get("/{filme_id}/tambem_favoritaram", response_model=List[schemas.FilmeRelacionado])
+def tambem_favoritaram(filme_id: UUID, limit: int = Query(10, ge=1, le=100), db: Session = Depends(database.get_read_db)):
+    return CooccurrenceService.related(db, filme_id, limit)
 
 
 @router.put("/{filme_id}", response_model=schemas.FilmeOut)
-def atualizar_filme(filme_id: UUID, filme_update: schemas.FilmeUpdate, db: Session = Depends(database.get_db)):
-    filme = MovieService.update_movie(db, filme_id, filme_update)
+def atualizar_filme(
+    filme_id: UUID,
+    filme_update: schemas.FilmeUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(database.get_db),
+):
+    filme = MovieService.update_movie(db, filme_id, filme_update, versoes=parse_if_match(if_match))
     if not filme:
         raise HTTPException(status_code=404, detail="Filme não encontrado")
+    response.headers.update(version_headers(etag(filme.versao), filme.atualizado_em))
     return filme
 
 
@@ -0,0 +1,23 @@
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app import database, schemas
+from app.services.person_service import PersonService
+
+router = APIRouter()
+
+
+@router.get("/{pessoa_id}", response_model=schemas.PessoaOut)
+def obter_pessoa(pessoa_id: UUID, db: Session = Depends(database.get_read_db)):
+    return PersonService.get_person(db, pessoa_id)
+
+
+@router.get("/{pessoa_id}/filmes", response_model=schemas.FilmePagina)
+def listar_filmes_da_pessoa(
+    pessoa_id: UUID, limit: int = 20, cursor: Optional[str] = None, db: Session = Depends(database.get_read_db)
+):
+    filmes, next_cursor = PersonService.list_movies(db, pessoa_id, cursor=cursor, limit=limit)
+    return {"itens": filmes, "next_cursor": next_cursor}
@@ -1,10 +1,13 @@
-from typing import List
+from typing import List, Optional, Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app import database, models, schemas
+from app.etag import etag, not_modified_response, parse_if_match, version_headers
+from app.services.export_service import FORMATOS, MEDIA_TYPES, ExportService, em_sessao_propria
 from app.services.rating_service import RatingService
 
 router = APIRouter()
@@ -20,17 +23,57 @@ def get_db():
 def criar_avaliacao(avaliacao: schemas.AvaliacaoCreate, db: Session = Depends(database.get_db)):
     return RatingService.create_rating(db, avaliacao)
 
-@router.get("/", response_model=List[schemas.AvaliacaoOut])
-def listar_avaliacoes(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
+@router.post("/lote", response_model=schemas.AvaliacaoLoteResultado)
+def gravar_avaliacoes_em_lote(avaliacoes: List[schemas.AvaliacaoCreate], db: Session = Depends(database.get_db)):
+    return RatingService.upsert_ratings(db, avaliacoes)
+
+@router.get("/", response_model=Union[List[schemas.AvaliacaoOut], schemas.AvaliacaoPagina])
+def listar_avaliacoes(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(database.get_read_db)):
+    if cursor is not None:
+        avaliacoes, next_cursor = RatingService.list_ratings_keyset(db, cursor, limit)
+        return {"itens": avaliacoes, "next_cursor": next_cursor}
     return RatingService.list_ratings(db, skip, limit)
 
+@router.get("/exportar", summary="Exporta avaliações em NDJSON ou CSV")
+def exportar_avaliacoes(
+    formato: str = Query("ndjson", description="ndjson ou csv"),
+    filme_id: Optional[UUID] = None,
+    usuario_id: Optional[UUID] = None,
+):
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato deve ser ndjson ou csv")
+    corpo = em_sessao_propria(
+        database.fabrica_de_leitura(), ExportService.export_ratings, formato, filme_id=filme_id, usuario_id=usuario_id
+    )
+    return StreamingResponse(
+        corpo,
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="avaliacoes.{formato}"'},
+    )
+
 @router.get("/{avaliacao_id}", response_model=schemas.AvaliacaoOut)
-def obter_avaliacao(avaliacao_id: UUID, db: Session = Depends(database.get_db)):
-    return RatingService.get_rating(db, avaliacao_id)
+def obter_avaliacao(avaliacao_id: UUID, request: Request, response: Response, db: Session = Depends(database.get_read_db)):
+    versao = RatingService.get_rating_version(db, avaliacao_id)
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Avaliação não encontrada")
+    resposta = not_modified_response(request, etag(versao.versao), versao.atualizado_em)
+    if resposta is not None:
+        return resposta
+    avaliacao = RatingService.get_rating(db, avaliacao_id)
+    response.headers.update(version_headers(etag(avaliacao.versao), avaliacao.atualizado_em))
+    return avaliacao
 
 @router.put("/{avaliacao_id}", response_model=schemas.AvaliacaoOut)
-def atualizar_avaliacao(avaliacao_id: UUID, avaliacao_update: schemas.AvaliacaoUpdate, db: Session = Depends(database.get_db)):
-    return RatingService.update_rating(db, avaliacao_id, avaliacao_update)
+def atualizar_avaliacao(
+    avaliacao_id: UUID,
+    avaliacao_update: schemas.AvaliacaoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(database.get_db),
+):
+    avaliacao = RatingService.update_rating(db, avaliacao_id, avaliacao_update, versoes=parse_if_match(if_match))
+    response.headers.update(version_headers(etag(avaliacao.versao), avaliacao.atualizado_em))
+    return avaliacao
 
 @router.delete("/{avaliacao_id}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_avaliacao(avaliacao_id: UUID, db: Session = Depends(database.get_db)):
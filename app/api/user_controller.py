@@ -1,12 +1,25 @@
-from typing import List
+from typing import List, Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app import database, models, schemas
+from app import database, schemas
+from app.etag import etag, not_modified_response, parse_if_match, version_headers
+from app.services.export_service import FORMATOS, MEDIA_TYPES, ExportService, em_sessao_propria
+from app.services.recommendation_service import RecommendationService
 from app.services.user_service import UserService
-from app.services.auth_service import authenticate_user, create_access_token
+from app.cache import principais_cache
+from app.services.auth_service import (
+    authenticate_user,
+    create_access_token,
+    decode_access_token,
+    get_password_hash,
+    principal_cache_key,
+    principal_from_claims,
+    token_claims,
+)
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi import Security
 from jose import JWTError
@@ -25,8 +38,7 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Security(oauth2_scheme), db: database.SessionLocal = Depends(database.get_db)) -> models.Usuario:
-    from app.services.auth_service import decode_access_token
+def get_current_user(token: str = Security(oauth2_scheme), db: Session = Depends(database.get_db)) -> schemas.UsuarioIdentidade:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não foi possível validar as credenciais",
@@ -35,44 +47,106 @@ def get_current_user(token: str = Security(oauth2_scheme), db: database.SessionL
     payload = decode_access_token(token)
     if payload is None or "sub" not in payload:
         raise credentials_exception
-    user_id = payload["sub"]
-    user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
-    if user is None:
-        raise credentials_exception
-    return user
-
-@router.post("/", response_model=schemas.UsuarioOut, status_code=status.HTTP_201_CREATED)
+    # Token com a identidade nos claims (JWT_IDENTITY_CLAIMS): nenhum acesso ao banco
+    principal = principal_from_claims(payload)
+    if principal is not None:
+        return principal
+    # Senão, id/nome/e-mail ficam em cache por token até expirar ou o usuário mudar
+    chave = principal_cache_key(payload)
+    principal = principais_cache.get(chave)
+    if principal is None:
+        token_cache = principais_cache.token()
+        try:
+            user_id = UUID(payload["sub"])
+        except ValueError:
+            raise credentials_exception
+        principal = UserService.get_identity(db, user_id)
+        if principal is None:
+            raise credentials_exception
+        principais_cache.set(chave, principal, tags=(user_id,), token=token_cache)
+    return principal
+
+@router.post("/", response_model=schemas.UsuarioResumo, status_code=status.HTTP_201_CREATED)
 def create_usuario(usuario: schemas.UsuarioCreate, db: Session = Depends(database.get_db)):
-    # Hash da senha ao criar usuário
-    from app.services.auth_service import get_password_hash
-    usuario_dict = usuario.dict()
+    # Hash da senha ao criar usuário (no pool do bcrypt; 503 se estiver saturado)
+    usuario_dict = usuario.model_dump()
     usuario_dict["senha"] = get_password_hash(usuario.senha)
     usuario_hashed = schemas.UsuarioCreate(**usuario_dict)
     return UserService.create_user(db, usuario_hashed)
 
-@router.get("/", response_model=List[schemas.UsuarioOut])
-def list_usuarios(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return UserService.list_users(db, skip, limit)
+@router.get("/", response_model=Union[List[schemas.UsuarioResumo], schemas.UsuarioPagina])
+def list_usuarios(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(database.get_read_db)):
+    # Serializada direto das linhas do banco (ver app/serialization.py)
+    payload = UserService.list_users_json(db, skip=skip, limit=limit, cursor=cursor)
+    return Response(content=payload, media_type="application/json")
 
 @router.post("/login", summary="Autenticação de usuário")
 def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Usuário ou senha incorretos")
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_access_token(data=token_claims(user))
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.get("/me", response_model=schemas.UsuarioOut)
-def read_users_me(current_user: models.Usuario = Depends(get_current_user)):
+@router.get("/me", response_model=schemas.UsuarioIdentidade)
+def read_users_me(current_user: schemas.UsuarioIdentidade = Depends(get_current_user)):
     return current_user
 
-@router.get("/{usuario_id}", response_model=schemas.UsuarioOut)
-def get_usuario(usuario_id: UUID, db: Session = Depends(database.get_db)):
-    return UserService.get_user(db, usuario_id)
+@router.get("/exportar/listas", summary="Exporta as listas de filmes dos usuários em NDJSON ou CSV")
+def exportar_listas(formato: str = Query("ndjson", description="ndjson ou csv"), usuario_id: Optional[UUID] = None):
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato deve ser ndjson ou csv")
+    return StreamingResponse(
+        em_sessao_propria(database.fabrica_de_leitura(), ExportService.export_user_lists, formato, usuario_id=usuario_id),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="listas.{formato}"'},
+    )
 
-@router.put("/{usuario_id}", response_model=schemas.UsuarioOut)
-def update_usuario(usuario_id: UUID, usuario_update: schemas.UsuarioUpdate, db: Session = Depends(database.get_db)):
-    return UserService.update_user(db, usuario_id, usuario_update)
+@router.get("/{usuario_id}", response_model=schemas.UsuarioResumo)
+def get_usuario(
+    usuario_id: UUID,
+    request: Request,
+    response: Response,
+    listas: bool = Query(False, description="Inclui os filmes das três listas (UsuarioOut)"),
+    db: Session = Depends(database.get_read_db),
+):
+    versao = UserService.get_user_version(db, usuario_id, listas=listas)
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    componentes, atualizado_em = versao
+    tag = etag(*componentes)
+    resposta = not_modified_response(request, tag, atualizado_em)
+    if resposta is not None:
+        return resposta
+    usuario = UserService.get_user(db, usuario_id, listas=listas)
+    if listas:
+        # Representação completa (legada): serializada aqui, fora do response_model
+        return Response(
+            content=schemas.UsuarioOut.model_validate(usuario).model_dump_json(),
+            media_type="application/json",
+            headers=version_headers(tag, atualizado_em),
+        )
+    response.headers.update(version_headers(tag, atualizado_em))
+    return usuario
+
+@router.put("/{usuario_id}", response_model=schemas.UsuarioResumo)
+def update_usuario(
+    usuario_id: UUID,
+    usuario_update: schemas.UsuarioUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(database.get_db),
+):
+    if usuario_update.senha is not None:
+        usuario_update.senha = get_password_hash(usuario_update.senha)
+    usuario = UserService.update_user(db, usuario_id, usuario_update, versoes=parse_if_match(if_match))
+    componentes, atualizado_em = UserService.get_user_version(db, usuario_id)
+    response.headers.update(version_headers(etag(*componentes), atualizado_em))
+    return usuario
+
+@router.get("/{usuario_id}/recomendacoes", response_model=List[schemas.FilmeRecomendado])
+def recomendacoes(usuario_id: UUID, limit: int = Query(20, ge=1, le=100), db: Session = Depends(database.get_read_db)):
+    return RecommendationService.recommend(db, usuario_id, limit)
 
 @router.delete("/{usuario_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_usuario(usuario_id: UUID, db: Session = Depends(database.get_db)):
@@ -80,26 +154,88 @@ def delete_usuario(usuario_id: UUID, db: Session = Depends(database.get_db)):
     return None
 
 # Rotas para manipular listas de filmes do usuário (favoritos, assistidos, em espera)
-@router.post("/{usuario_id}/favoritos/{filme_id}", response_model=schemas.UsuarioOut)
+# Filmes de cada lista, paginados por cursor (vazio ou ausente na primeira página)
+def _filmes_da_lista(lista: str, usuario_id: UUID, ordem: str, cursor: Optional[str], limit: int, db: Session):
+    filmes, next_cursor = UserService.list_movies_in_list(db, usuario_id, lista, ordem=ordem, cursor=cursor, limit=limit)
+    return {"itens": filmes, "next_cursor": next_cursor}
+
+ORDEM_LISTA = Query("titulo", description="titulo ou ano; com \"-\" na frente, em ordem decrescente")
+
+@router.get("/{usuario_id}/favoritos", response_model=schemas.FilmePagina)
+def list_favoritos(
+    usuario_id: UUID,
+    ordem: str = ORDEM_LISTA,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(database.get_read_db),
+):
+    return _filmes_da_lista("favoritos", usuario_id, ordem, cursor, limit, db)
+
+@router.get("/{usuario_id}/assistidos", response_model=schemas.FilmePagina)
+def list_assistidos(
+    usuario_id: UUID,
+    ordem: str = ORDEM_LISTA,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(database.get_read_db),
+):
+    return _filmes_da_lista("assistidos", usuario_id, ordem, cursor, limit, db)
+
+@router.get("/{usuario_id}/em_espera", response_model=schemas.FilmePagina)
+def list_em_espera(
+    usuario_id: UUID,
+    ordem: str = ORDEM_LISTA,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(database.get_read_db),
+):
+    return _filmes_da_lista("em_espera", usuario_id, ordem, cursor, limit, db)
+
+# Em lote: {"filme_ids": [...]}, um único INSERT/DELETE por requisição
+@router.post("/{usuario_id}/favoritos", response_model=schemas.FilmesLoteResultado)
+def add_favoritos_lote(usuario_id: UUID, lote: schemas.FilmesLote, db: Session = Depends(database.get_db)):
+    return UserService.add_movies_to_list(db, usuario_id, "favoritos", lote.filme_ids)
+
+@router.post("/{usuario_id}/assistidos", response_model=schemas.FilmesLoteResultado)
+def add_assistidos_lote(usuario_id: UUID, lote: schemas.FilmesLote, db: Session = Depends(database.get_db)):
+    return UserService.add_movies_to_list(db, usuario_id, "assistidos", lote.filme_ids)
+
+@router.post("/{usuario_id}/em_espera", response_model=schemas.FilmesLoteResultado)
+def add_em_espera_lote(usuario_id: UUID, lote: schemas.FilmesLote, db: Session = Depends(database.get_db)):
+    return UserService.add_movies_to_list(db, usuario_id, "em_espera", lote.filme_ids)
+
+@router.delete("/{usuario_id}/favoritos", response_model=schemas.FilmesLoteResultado)
+def remove_favoritos_lote(usuario_id: UUID, lote: schemas.FilmesLote, db: Session = Depends(database.get_db)):
+    return UserService.remove_movies_from_list(db, usuario_id, "favoritos", lote.filme_ids)
+
+@router.delete("/{usuario_id}/assistidos", response_model=schemas.FilmesLoteResultado)
+def remove_assistidos_lote(usuario_id: UUID, lote: schemas.FilmesLote, db: Session = Depends(database.get_db)):
+    return UserService.remove_movies_from_list(db, usuario_id, "assistidos", lote.filme_ids)
+
+@router.delete("/{usuario_id}/em_espera", response_model=schemas.FilmesLoteResultado)
+def remove_em_espera_lote(usuario_id: UUID, lote: schemas.FilmesLote, db: Session = Depends(database.get_db)):
+    return UserService.remove_movies_from_list(db, usuario_id, "em_espera", lote.filme_ids)
+
+@router.post("/{usuario_id}/favoritos/{filme_id}", response_model=schemas.StatusLista)
 def add_favorito(usuario_id: UUID, filme_id: UUID, db: Session = Depends(database.get_db)):
     return UserService.add_favorite(db, usuario_id, filme_id)
 
-@router.post("/{usuario_id}/assistidos/{filme_id}", response_model=schemas.UsuarioOut)
+@router.post("/{usuario_id}/assistidos/{filme_id}", response_model=schemas.StatusLista)
 def add_assistido(usuario_id: UUID, filme_id: UUID, db: Session = Depends(database.get_db)):
     return UserService.add_watched(db, usuario_id, filme_id)
 
-@router.post("/{usuario_id}/em_espera/{filme_id}", response_model=schemas.UsuarioOut)
+@router.post("/{usuario_id}/em_espera/{filme_id}", response_model=schemas.StatusLista)
 def add_em_espera(usuario_id: UUID, filme_id: UUID, db: Session = Depends(database.get_db)):
     return UserService.add_waiting(db, usuario_id, filme_id)
 
-@router.delete("/{usuario_id}/favoritos/{filme_id}", response_model=schemas.UsuarioOut)
+@router.delete("/{usuario_id}/favoritos/{filme_id}", response_model=schemas.StatusLista)
 def remove_favorito(usuario_id: UUID, filme_id: UUID, db: Session = Depends(database.get_db)):
     return UserService.remove_favorite(db, usuario_id, filme_id)
 
-@router.delete("/{usuario_id}/assistidos/{filme_id}", response_model=schemas.UsuarioOut)
+@router.delete("/{usuario_id}/assistidos/{filme_id}", response_model=schemas.StatusLista)
 def remove_assistido(usuario_id: UUID, filme_id: UUID, db: Session = Depends(database.get_db)):
     return UserService.remove_watched(db, usuario_id, filme_id)
 
-@router.delete("/{usuario_id}/em_espera/{filme_id}", response_model=schemas.UsuarioOut)
+@router.delete("/{usuario_id}/em_espera/{filme_id}", response_model=schemas.StatusLista)
 def remove_em_espera(usuario_id: UUID, filme_id: UUID, db: Session = Depends(database.get_db)):
     return UserService.remove_waiting(db, usuario_id, filme_id)
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+# Cache das respostas de filmes (por processo/worker). Tamanho 0 desliga.
+FILMES_CACHE_SIZE = int(os.getenv("FILMES_CACHE_SIZE", 1024))
+FILMES_CACHE_TTL = float(os.getenv("FILMES_CACHE_TTL", 30))
+
+# Cache dos usuários autenticados (por processo), por token. Tamanho 0 desliga.
+PRINCIPAIS_CACHE_SIZE = int(os.getenv("PRINCIPAIS_CACHE_SIZE", 4096))
+PRINCIPAIS_CACHE_TTL = float(os.getenv("PRINCIPAIS_CACHE_TTL", 60))
+
+# Tag presente em todas as páginas de listagem de filmes
+TAG_LISTAS_FILMES = "filmes:listas"
+
+
+class TTLCache:
+    """
+    Cache LRU limitado em tamanho, com expiração por TTL e invalidação por
+    tags: cada entrada declara as tags de que depende (ex.: os ids dos filmes
+    que contém) e invalidate(tag) remove todas as entradas associadas.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._itens: "OrderedDict[Hashable, tuple[float, Any, tuple[Hashable, ...]]]" = OrderedDict()
+        self._por_tag: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        # Instante da última invalidação de cada tag, da mais antiga para a
+        # mais recente. Limitado em tamanho: as que saem elevam `_piso`, que
+        # vale para todas as tags (descartar uma nunca deixa gravar a mais)
+        self._invalidado_em: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._max_invalidacoes = max(maxsize, 1) * 4
+        self._piso = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def token(self, atraso: float = 0.0) -> float:
+        """
+        Marca o início de uma leitura no banco. Passado a set(), impede que
+        um valor lido antes de uma invalidação concorrente de uma das suas
+        tags seja gravado. Leituras de réplica informam o `atraso` máximo da
+        réplica: uma tag invalidada nesse intervalo antes da leitura pode
+        ainda não ter a escrita na réplica, e set() também recusa o valor.
+        """
+        return self._clock() - atraso
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._itens.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expira_em, valor, _ = item
+            if expira_em <= self._clock():
+                self._remover(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._itens.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = (), token: Optional[float] = None) -> bool:
+        if self.maxsize <= 0:
+            return False
+        tags = tuple(tags)
+        with self._lock:
+            if token is not None and self._invalidada_desde(tags, token):
+                return False
+            if key in self._itens:
+                self._remover(key)
+            self._itens[key] = (self._clock() + self.ttl, value, tags)
+            for tag in tags:
+                self._por_tag.setdefault(tag, set()).add(key)
+            while len(self._itens) > self.maxsize:
+                self._remover(next(iter(self._itens)))
+                self.evictions += 1
+            return True
+
+    def invalidate(self, *tags: Hashable) -> None:
+        with self._lock:
+            agora = self._clock()
+            for tag in tags:
+                self._invalidado_em.pop(tag, None)
+                self._invalidado_em[tag] = agora
+            while len(self._invalidado_em) > self._max_invalidacoes:
+                _, self._piso = self._invalidado_em.popitem(last=False)
+            for tag in tags:
+                for key in self._por_tag.pop(tag, ()):
+                    if key in self._itens:
+                        self._remover(key)
+                        self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidado_em.clear()
+            self._piso = self._clock()
+            self.invalidations += len(self._itens)
+            self._itens.clear()
+            self._por_tag.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "tamanho": len(self._itens),
+                "capacidade": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirados": self.expirations,
+                "invalidacoes": self.invalidations,
+            }
+
+    def _invalidada_desde(self, tags: Tuple[Hashable, ...], instante: float) -> bool:
+        if self._piso >= instante:
+            return True
+        return any(self._invalidado_em.get(tag, float("-inf")) >= instante for tag in tags)
+
+    def _remover(self, key: Hashable) -> None:
+        _, _, tags = self._itens.pop(key)
+        for tag in tags:
+            chaves = self._por_tag.get(tag)
+            if chaves is not None:
+                chaves.discard(key)
+                if not chaves:
+                    del self._por_tag[tag]
+
+
+filmes_cache = TTLCache(FILMES_CACHE_SIZE, FILMES_CACHE_TTL)
+principais_cache = TTLCache(PRINCIPAIS_CACHE_SIZE, PRINCIPAIS_CACHE_TTL)
+
+
+def invalidar_filmes(*filme_ids, listas: bool = False) -> None:
+    """
+    Remove do cache os filmes informados e as páginas que os contêm. Com
+    listas=True remove todas as páginas (filme criado, removido ou com
+    título alterado muda a composição das listagens). Chamar após o commit.
+    """
+    tags = list(filme_ids)
+    if listas:
+        tags.append(TAG_LISTAS_FILMES)
+    filmes_cache.invalidate(*tags)
+
+
+def invalidar_principal(*user_ids) -> None:
+    """Remove do cache as identidades dos usuários informados (todos os tokens). Chamar após o commit."""
+    principais_cache.invalidate(*user_ids)
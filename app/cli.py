@@ -0,0 +1,108 @@
+"""
+Tarefas de manutenção executadas fora do servidor HTTP.
+
+Uso:
+    python -m app.cli reconciliar-avaliacoes [--filme FILME_ID ...]
+    python -m app.cli importar-filmes ARQUIVO [--formato ndjson|csv] [--lote N]
+    python -m app.cli atualizar-recomendacoes [--completo]
+    python -m app.cli reconstruir-coocorrencias
+    python -m app.cli atualizar-rankings
+"""
+import argparse
+import json
+from uuid import UUID
+
+from app import database
+from app.services.cooccurrence_service import CooccurrenceService
+from app.services.import_service import FORMATOS, TAMANHO_LOTE, ImportService, ler_csv, ler_ndjson
+from app.services.ranking_service import RankingService
+from app.services.rating_service import RatingService
+from app.services.recommendation_service import RecommendationService
+
+
+def reconciliar_avaliacoes(args) -> None:
+    db = database.SessionLocal()
+    try:
+        total = RatingService.rebuild_stats(db, args.filme or None)
+        print(f"Agregados reconstruídos para {total} filme(s)")
+    finally:
+        db.close()
+
+
+def importar_filmes(args) -> None:
+    formato = args.formato or ("csv" if args.arquivo.lower().endswith(".csv") else "ndjson")
+    leitor = ler_csv if formato == "csv" else ler_ndjson
+    db = database.SessionLocal()
+    try:
+        with open(args.arquivo, encoding="utf-8-sig", newline="") as arquivo:
+            resultado = ImportService.import_movies(db, leitor(arquivo), tamanho_lote=args.lote)
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    finally:
+        db.close()
+
+
+def atualizar_recomendacoes(args) -> None:
+    db = database.SessionLocal()
+    try:
+        print(json.dumps(RecommendationService.refresh_neighbors(db, completo=args.completo), ensure_ascii=False))
+    finally:
+        db.close()
+
+
+def reconstruir_coocorrencias(args) -> None:
+    db = database.SessionLocal()
+    try:
+        total = CooccurrenceService.rebuild(db)
+        print(f"Coocorrências reconstruídas: {total} par(es) de filmes")
+    finally:
+        db.close()
+
+
+def atualizar_rankings(args) -> None:
+    db = database.SessionLocal()
+    try:
+        print(json.dumps(RankingService.rebuild(db), ensure_ascii=False))
+    finally:
+        db.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Tarefas de manutenção da MovieTracker API")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    reconciliar = subparsers.add_parser(
+        "reconciliar-avaliacoes", help="Reconstrói as estatísticas de avaliação dos filmes a partir de `avaliacoes`"
+    )
+    reconciliar.add_argument("--filme", type=UUID, action="append", help="Restringe a um filme (pode repetir)")
+    reconciliar.set_defaults(func=reconciliar_avaliacoes)
+
+    importar = subparsers.add_parser("importar-filmes", help="Importa filmes em massa de um arquivo NDJSON ou CSV")
+    importar.add_argument("arquivo", help="Caminho do arquivo (.ndjson/.jsonl ou .csv)")
+    importar.add_argument("--formato", choices=FORMATOS, help="Por padrão, deduzido da extensão")
+    importar.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Filmes por transação")
+    importar.set_defaults(func=importar_filmes)
+
+    recomendacoes = subparsers.add_parser(
+        "atualizar-recomendacoes", help="Recalcula os filmes similares usados nas recomendações"
+    )
+    recomendacoes.add_argument(
+        "--completo", action="store_true", help="Recalcula todos os filmes, não só os alterados desde a última execução"
+    )
+    recomendacoes.set_defaults(func=atualizar_recomendacoes)
+
+    coocorrencias = subparsers.add_parser(
+        "reconstruir-coocorrencias", help="Recalcula o índice de filmes favoritados juntos a partir dos favoritos"
+    )
+    coocorrencias.set_defaults(func=reconstruir_coocorrencias)
+
+    rankings = subparsers.add_parser(
+        "atualizar-rankings", help="Recalcula os rankings geral, por gênero e por década (média bayesiana)"
+    )
+    rankings.set_defaults(func=atualizar_rankings)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
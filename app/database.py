@@ -1,18 +1,207 @@
 import os
-from sqlalchemy import create_engine
+import time
+from functools import partial
+from typing import Callable, Optional
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
+from app.metrics import REGISTRO, Counter, Histogram
+from app.replicas import DATABASE_REPLICA_URLS, REPLICA_ATRASO_MAX, Replicas, atraso_stmt, leitura_no_primario
+
 # Carrega variáveis do .env
 load_dotenv()
 
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
 # URL do banco de dados - agora carregada do .env
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, echo=True, future=True)
+# Log de SQL desligado por padrão; DB_ECHO=true para depuração
+DB_ECHO = _env_bool("DB_ECHO", False)
+
+# Dimensionamento do pool de conexões (por processo/worker)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+# Modo assíncrono: quando habilitado, as rotas principais usam AsyncSession
+# e não ocupam uma thread do threadpool enquanto aguardam o banco.
+DB_ASYNC = _env_bool("DB_ASYNC", False)
+
+# Drivers assíncronos equivalentes aos drivers síncronos suportados
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """Deriva a URL assíncrona (asyncpg/aiosqlite) a partir da URL síncrona."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return url.render_as_string(hide_password=False)
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+class _EsperaMedida:
+    """
+    Mede quanto tempo cada checkout aguarda por uma conexão (incluindo a
+    abertura de uma nova) e conta os checkouts que estouram DB_POOL_TIMEOUT.
+    Guarda também o max_overflow configurado, que o QueuePool não expõe.
+    """
+
+    def __init__(self, creator, max_overflow: int = 10, **kw):
+        super().__init__(creator, max_overflow=max_overflow, **kw)
+        self.max_overflow = max_overflow
+        self.espera_checkout = Histogram()
+        self.timeouts = Counter()
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts.inc()
+            raise
+        finally:
+            self.espera_checkout.observe(time.perf_counter() - inicio)
+
+
+class MeteredQueuePool(_EsperaMedida, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_EsperaMedida, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, poolclass) -> dict:
+    """Opções de engine; o pool só é configurável em bancos servidor (não SQLite)."""
+    options = {"echo": DB_ECHO}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=poolclass,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    return options
+
+
+def pool_stats(engine) -> dict:
+    """Ocupação atual do pool de uma engine e histograma de espera no checkout."""
+    pool = engine.pool
+    stats = {"classe": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            tamanho=pool.size(),
+            em_uso=pool.checkedout(),
+            ociosas=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, _EsperaMedida):
+        stats["max_overflow"] = pool.max_overflow
+        stats["espera_checkout"] = pool.espera_checkout.snapshot()
+        stats["timeouts"] = pool.timeouts.value()
+    return stats
+
+
+engine = create_engine(DATABASE_URL, future=True, **engine_options(DATABASE_URL, MeteredQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, MeteredAsyncQueuePool)
+    )
+    # expire_on_commit=False: após o commit os objetos continuam legíveis
+    # sem disparar carregamentos implícitos, que não são permitidos em async.
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Réplicas de leitura (ver app/replicas.py); None sem DATABASE_REPLICA_URLS
+replicas = None
+async_replicas = None
+if DATABASE_REPLICA_URLS:
+    replicas = Replicas([
+        create_engine(url, future=True, **engine_options(url, MeteredQueuePool)) for url in DATABASE_REPLICA_URLS
+    ])
+    if DB_ASYNC:
+        async_replicas = Replicas([
+            create_async_engine(async_database_url(url), **engine_options(async_database_url(url), MeteredAsyncQueuePool))
+            for url in DATABASE_REPLICA_URLS
+        ])
+
+
+def _info_replica(indice: int) -> dict:
+    # atraso_maximo: os caches não guardam o que a réplica leu logo após uma invalidação
+    return {"replica": indice, "atraso_maximo": REPLICA_ATRASO_MAX}
+
+
+def _consulta_de_atraso(conjunto: Replicas, indice: int, dialeto: str):
+    """Consulta de atraso a executar na réplica agora, ou None (sem suporte ou medida há pouco)."""
+    stmt = atraso_stmt(dialeto)
+    if stmt is None or not conjunto.medir_agora(indice):
+        return None
+    return stmt
+
+
+def _atraso(valor) -> Optional[float]:
+    return None if valor is None else float(valor)
+
+
+def todos_os_pools() -> dict:
+    """Engines (síncronas) por nome: primário, assíncrona e réplicas."""
+    pools = {"primario": engine}
+    if async_engine is not None:
+        pools["async"] = async_engine.sync_engine
+    if replicas is not None:
+        pools.update((f"replica{i}", replica) for i, replica in enumerate(replicas.engines))
+    if async_replicas is not None:
+        pools.update((f"replica{i}_async", replica.sync_engine) for i, replica in enumerate(async_replicas.engines))
+    return pools
+
+
+@REGISTRO.coletor
+def _metricas_dos_pools():
+    """Ocupação dos pools para /metrics, lida no momento da coleta."""
+    pools = todos_os_pools()
+    conexoes, tamanhos, esperas, timeouts = [], [], [], []
+    for nome, pool_engine in pools.items():
+        stats = pool_stats(pool_engine)
+        if "em_uso" in stats:
+            for estado, chave in (("in_use", "em_uso"), ("idle", "ociosas"), ("overflow", "overflow")):
+                conexoes.append([{"pool": nome, "state": estado}, stats[chave]])
+            tamanhos.append([{"pool": nome}, stats["tamanho"]])
+        if "espera_checkout" in stats:
+            esperas.append([{"pool": nome}, stats["espera_checkout"]])
+            timeouts.append([{"pool": nome}, stats["timeouts"]])
+    return [
+        {"nome": "db_pool_connections", "tipo": "gauge", "ajuda": "Conexões do pool por estado", "series": conexoes},
+        {"nome": "db_pool_size", "tipo": "gauge", "ajuda": "Tamanho configurado do pool", "series": tamanhos},
+        {"nome": "db_pool_checkout_wait_seconds", "tipo": "histogram",
+         "ajuda": "Espera por uma conexão no checkout", "series": esperas},
+        {"nome": "db_pool_checkout_timeouts_total", "tipo": "counter",
+         "ajuda": "Checkouts que estouraram DB_POOL_TIMEOUT", "series": timeouts},
+    ]
+
+
 Base = declarative_base()
 
 def get_db():
@@ -21,3 +210,63 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def sessao_de_leitura(no_primario: bool = False) -> Session:
+    """
+    Sessão para consultas somente leitura: numa réplica disponível (a que não
+    conecta, ou cujo atraso medido passa de REPLICA_ATRASO_MAX, sai da
+    rotação) ou, sem réplicas ou com `no_primario` (o cliente acabou de
+    escrever, ver replicas.leitura_no_primario), no primário.
+    """
+    if replicas is not None and not no_primario:
+        for indice, replica in replicas.candidatas():
+            db = SessionLocal(bind=replica, info=_info_replica(indice))
+            try:
+                db.connection()
+                stmt = _consulta_de_atraso(replicas, indice, replica.dialect.name)
+                if stmt is None or replicas.registrar_atraso(indice, _atraso(db.execute(stmt).scalar())):
+                    return db
+            except (exc.DBAPIError, exc.TimeoutError):
+                replicas.falhou(indice)
+            db.close()
+    return SessionLocal()
+
+
+async def _sessao_de_leitura_async(no_primario: bool) -> AsyncSession:
+    if async_replicas is not None and not no_primario:
+        for indice, replica in async_replicas.candidatas():
+            db = AsyncSessionLocal(bind=replica, info=_info_replica(indice))
+            try:
+                await db.connection()
+                stmt = _consulta_de_atraso(async_replicas, indice, replica.dialect.name)
+                if stmt is None or async_replicas.registrar_atraso(indice, _atraso((await db.execute(stmt)).scalar())):
+                    return db
+            except (exc.DBAPIError, exc.TimeoutError):
+                async_replicas.falhou(indice)
+            await db.close()
+    return AsyncSessionLocal()
+
+
+def fabrica_de_leitura() -> Callable[[], Session]:
+    """
+    sessao_de_leitura com a decisão de primário da requisição atual, para
+    sessões abertas depois que a rota retorna (ex.: corpo de StreamingResponse).
+    """
+    return partial(sessao_de_leitura, no_primario=leitura_no_primario())
+
+
+def get_read_db():
+    db = sessao_de_leitura(leitura_no_primario())
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with await _sessao_de_leitura_async(leitura_no_primario()) as db:
+        yield db
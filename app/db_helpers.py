@@ -0,0 +1,14 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def dialect_insert(db, table):
+    """
+    INSERT do dialeto em uso, com suporte a ON CONFLICT (PostgreSQL e SQLite).
+    Aceita Session ou AsyncSession.
+    """
+    dialeto = db.get_bind().dialect.name
+    if dialeto == "postgresql":
+        return postgresql.insert(table)
+    if dialeto == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT não suportado para o dialeto {dialeto}")
@@ -0,0 +1,96 @@
+"""
+Requisições condicionais baseadas na coluna `versao` dos modelos:
+ETag/If-None-Match e Last-Modified/If-Modified-Since nos GETs (304) e
+If-Match nos PUTs (concorrência otimista, 412).
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Set
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy.orm.exc import StaleDataError
+
+VERSAO_ALTERADA = "O recurso foi alterado por outra requisição; recarregue e tente novamente"
+
+
+def etag(versao, *componentes) -> str:
+    """ETag forte a partir da versão da linha (e de versões dependentes, se houver)."""
+    return '"' + ".".join(str(parte) for parte in (versao, *componentes)) + '"'
+
+
+def _utc(momento: datetime) -> datetime:
+    # SQLite devolve datetimes sem fuso (gravados em UTC por CURRENT_TIMESTAMP)
+    if momento.tzinfo is None:
+        return momento.replace(tzinfo=timezone.utc)
+    return momento.astimezone(timezone.utc)
+
+
+def version_headers(tag: str, atualizado_em: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": tag}
+    if atualizado_em is not None:
+        headers["Last-Modified"] = format_datetime(_utc(atualizado_em), usegmt=True)
+    return headers
+
+
+def not_modified(request: Request, tag: str, atualizado_em: Optional[datetime]) -> bool:
+    """Avalia If-None-Match (prioritário) e If-Modified-Since para um GET."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Comparação fraca: W/"1" equivale a "1"
+        candidatas = {parte.strip().removeprefix("W/") for parte in if_none_match.split(",")}
+        return tag in candidatas
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and atualizado_em is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        return _utc(atualizado_em).replace(microsecond=0) <= desde
+    return False
+
+
+def not_modified_response(request: Request, tag: str, atualizado_em: Optional[datetime]) -> Optional[Response]:
+    """Resposta 304 (com ETag/Last-Modified) se o cliente já tem esta versão; senão None."""
+    if not_modified(request, tag, atualizado_em):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=version_headers(tag, atualizado_em))
+    return None
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[Set[int]]:
+    """
+    Versões aceitas por um If-Match; None quando não há pré-condição
+    (cabeçalho ausente ou "*"). Só o primeiro componente da ETag (a versão
+    da própria linha) é comparado. ETags fracas nunca satisfazem If-Match.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versoes = set()
+    for parte in if_match.split(","):
+        parte = parte.strip()
+        if parte.startswith('"') and parte.endswith('"') and len(parte) > 1:
+            versao = parte[1:-1].split(".", 1)[0]
+            if versao.isdigit():
+                versoes.add(int(versao))
+    return versoes
+
+
+def check_version(versao_atual: int, versoes: Optional[Set[int]]) -> None:
+    if versoes is not None and versao_atual not in versoes:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=VERSAO_ALTERADA)
+
+
+@contextmanager
+def stale_version_guard():
+    """
+    Converte em 412 o StaleDataError do flush: a linha mudou de versão entre
+    a leitura e o UPDATE (que o ORM faz com WHERE versao = <lida>).
+    """
+    try:
+        yield
+    except StaleDataError:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=VERSAO_ALTERADA)
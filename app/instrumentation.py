@@ -0,0 +1,235 @@
+"""
+Instrumentação das requisições: quantas instruções SQL cada requisição
+executa, quanto tempo passa no banco e quais instruções idênticas se repetem
+(prováveis N+1), além das métricas HTTP e de banco expostas em /metrics.
+
+Os eventos do SQLAlchemy são registrados na classe Engine e valem para todas
+as engines, inclusive a sync_engine da engine assíncrona. Fora de uma
+requisição (ou de `contar_consultas`) só o histograma de /metrics é alimentado.
+"""
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import REGISTRO, TAMANHO_BUCKETS
+
+logger = logging.getLogger("app.sql")
+
+# Uma mesma instrução executada ao menos este número de vezes numa requisição
+# é reportada como provável N+1
+SQL_N_MAIS_1_LIMITE = int(os.getenv("SQL_N_MAIS_1_LIMITE", 5))
+
+# Tamanho máximo do texto SQL incluído nos logs
+SQL_LOG_TAMANHO = 300
+
+# Rótulo das requisições que não casaram com nenhuma rota (evita um rótulo por caminho)
+ROTA_DESCONHECIDA = "<desconhecida>"
+
+OPERACOES_SQL = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+http_requests = REGISTRO.counter(
+    "http_requests_total", "Requisições HTTP atendidas", ("method", "route", "status")
+)
+http_in_progress = REGISTRO.gauge("http_requests_in_progress", "Requisições HTTP em andamento")
+http_duration = REGISTRO.histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP", ("method", "route")
+)
+http_response_size = REGISTRO.histogram(
+    "http_response_size_bytes", "Tamanho do corpo das respostas HTTP", ("method", "route"), TAMANHO_BUCKETS
+)
+db_statement_duration = REGISTRO.histogram(
+    "db_statement_duration_seconds", "Duração das instruções SQL executadas", ("operation",)
+)
+
+
+class ColetorSQL:
+    """
+    Instruções e tempo de banco acumulados durante uma requisição. Coletores
+    aninhados (um teste envolvendo uma requisição) repassam ao coletor pai.
+    """
+
+    def __init__(self, pai: Optional["ColetorSQL"] = None):
+        self.pai = pai
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.instrucoes: Counter = Counter()
+
+    def registrar(self, instrucao: str, duracao: float) -> None:
+        self.consultas += 1
+        self.tempo_db += duracao
+        self.instrucoes[instrucao] += 1
+        if self.pai is not None:
+            self.pai.registrar(instrucao, duracao)
+
+    def repetidas(self, limite: int = SQL_N_MAIS_1_LIMITE) -> List[Dict]:
+        """Instruções idênticas executadas `limite` vezes ou mais."""
+        return [
+            {"sql": instrucao[:SQL_LOG_TAMANHO], "vezes": vezes}
+            for instrucao, vezes in self.instrucoes.most_common()
+            if vezes >= limite
+        ]
+
+
+_coletor: ContextVar[Optional[ColetorSQL]] = ContextVar("coletor_sql", default=None)
+
+
+def _operacao(statement: str) -> str:
+    palavra = statement.lstrip()[:6].upper()
+    return palavra if palavra in OPERACOES_SQL else "OTHER"
+
+
+# O início fica no contexto de execução, que é descartado com a instrução:
+# uma instrução que falha (sem after_cursor_execute) não deixa nada para trás
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._inicio_consulta = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_inicio_consulta", None)
+    if inicio is None:
+        return
+    duracao = time.perf_counter() - inicio
+    db_statement_duration.labels(_operacao(statement)).observe(duracao)
+    coletor = _coletor.get()
+    if coletor is not None:
+        coletor.registrar(statement, duracao)
+
+
+@contextmanager
+def contar_consultas() -> Iterator[ColetorSQL]:
+    """Coleta as instruções executadas dentro do bloco (inclusive em threads do threadpool)."""
+    coletor = ColetorSQL(pai=_coletor.get())
+    token = _coletor.set(coletor)
+    try:
+        yield coletor
+    finally:
+        _coletor.reset(token)
+
+
+@contextmanager
+def max_consultas(maximo: int) -> Iterator[ColetorSQL]:
+    """
+    Falha (AssertionError) se o bloco executar mais de `maximo` instruções.
+    Para testes de rotas e serviços:
+
+        with max_consultas(3):
+            client.get(f"/filmes/{filme_id}")
+    """
+    with contar_consultas() as coletor:
+        yield coletor
+    if coletor.consultas > maximo:
+        instrucoes = "\n".join(f"  {vezes}x {sql[:SQL_LOG_TAMANHO]}" for sql, vezes in coletor.instrucoes.most_common())
+        raise AssertionError(f"{coletor.consultas} instruções SQL executadas (máximo {maximo}):\n{instrucoes}")
+
+
+def modelo_da_rota(scope, rotas: Dict[int, str]) -> Optional[str]:
+    """Caminho da rota que atendeu a requisição, ex.: "/filmes/{filme_id}"."""
+    rota = scope.get("route")
+    if rota is None:
+        return None
+    return rotas.get(id(rota)) or getattr(rota, "path", None)
+
+
+def server_timing(coletor: ColetorSQL) -> str:
+    return f'db;dur={coletor.tempo_db * 1000:.1f};desc="{coletor.consultas} consultas"'
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Middleware ASGI que abre um coletor por requisição HTTP, acrescenta o
+    cabeçalho Server-Timing à resposta e registra uma linha JSON no logger
+    "app.sql" (em WARNING quando há prováveis N+1).
+
+    `rotas` mapeia id(rota) para o caminho completo com o prefixo do router
+    (o log agrupa por "/filmes/{filme_id}", não pelo caminho requisitado).
+    """
+
+    def __init__(self, app, rotas: Optional[Dict[int, str]] = None):
+        self.app = app
+        self.rotas = rotas if rotas is not None else {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                mensagem["headers"] = [*mensagem.get("headers", []), (b"server-timing", server_timing(coletor).encode())]
+            await send(mensagem)
+
+        with contar_consultas() as coletor:
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                self._registrar(scope, status, coletor, time.perf_counter() - inicio)
+
+    def _registrar(self, scope, status: int, coletor: ColetorSQL, duracao: float) -> None:
+        repetidas = coletor.repetidas()
+        nivel = logging.WARNING if repetidas else logging.INFO
+        if not logger.isEnabledFor(nivel):
+            return
+        linha = {
+            "metodo": scope["method"],
+            "rota": modelo_da_rota(scope, self.rotas) or scope["path"],
+            "status": status,
+            "consultas": coletor.consultas,
+            "tempo_db_ms": round(coletor.tempo_db * 1000, 2),
+            "tempo_total_ms": round(duracao * 1000, 2),
+        }
+        if repetidas:
+            linha["n_mais_1"] = repetidas
+        logger.log(nivel, json.dumps(linha, ensure_ascii=False))
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que alimenta as métricas HTTP de /metrics: contagem por
+    rota e status, requisições em andamento, latência e tamanho das respostas.
+    """
+
+    def __init__(self, app, rotas: Optional[Dict[int, str]] = None):
+        self.app = app
+        self.rotas = rotas if rotas is not None else {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        status = 500
+        tamanho = 0
+
+        async def enviar(mensagem):
+            nonlocal status, tamanho
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            elif mensagem["type"] == "http.response.body":
+                tamanho += len(mensagem.get("body", b""))
+            await send(mensagem)
+
+        http_in_progress.labels().inc()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            http_in_progress.labels().dec()
+            metodo = scope["method"]
+            rota = modelo_da_rota(scope, self.rotas) or ROTA_DESCONHECIDA
+            http_requests.labels(metodo, rota, str(status)).inc()
+            http_duration.labels(metodo, rota).observe(time.perf_counter() - inicio)
+            http_response_size.labels(metodo, rota).observe(tamanho)
@@ -1,17 +1,99 @@
-from fastapi import FastAPI
-from app.api import user_controller, movie_controller, rating_controller
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.routing import APIRoute
+
+from app import database, metrics
+from app.instrumentation import MetricsMiddleware, SQLInstrumentationMiddleware
+from app.replicas import LeituraAposEscritaMiddleware
+from app.services.auth_service import SECRET_KEY, principal_do_cabecalho
+from app.api import user_controller, movie_controller, rating_controller, person_controller, diagnostics_controller
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Com METRICAS_DIR, cada worker grava suas métricas para o /metrics somar
+    exportador = None
+    if metrics.METRICAS_DIR:
+        exportador = metrics.ExportadorMetricas(metrics.METRICAS_DIR)
+        exportador.start()
+    yield
+    if exportador is not None:
+        exportador.stop()
+
 
 app = FastAPI(
     title="MovieTracker API",
     description="API RESTful para gerenciar filmes, usuários e avaliações.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Server-Timing e log por requisição com o número de consultas e o tempo de banco,
+# e as métricas HTTP de /metrics; ROTAS (id da rota -> caminho completo) é
+# preenchido ao incluir os routers
+ROTAS = {}
+app.add_middleware(SQLInstrumentationMiddleware, rotas=ROTAS)
+app.add_middleware(MetricsMiddleware, rotas=ROTAS)
+if database.replicas is not None:
+    # Quem acabou de escrever lê do primário por um tempo (ver app/replicas.py)
+    app.add_middleware(LeituraAposEscritaMiddleware, segredo=SECRET_KEY, identificar=principal_do_cabecalho)
+
+ROUTERS = [
+    (user_controller.router, "/usuarios", ["Usuários"]),
+    (movie_controller.router, "/filmes", ["Filmes"]),
+    (rating_controller.router, "/avaliacoes", ["Avaliações"]),
+    (person_controller.router, "/pessoas", ["Pessoas"]),
+    (diagnostics_controller.router, "/diagnostico", ["Diagnóstico"]),
+]
+
+
+def _sem_rotas_substituidas(router: APIRouter, prefix: str, ocupadas: set) -> APIRouter:
+    """Cópia do router sem as rotas que já têm versão assíncrona registrada."""
+    restantes = APIRouter()
+    restantes.routes.extend(
+        rota for rota in router.routes
+        if not (isinstance(rota, APIRoute) and any((prefix + rota.path_format, m) in ocupadas for m in rota.methods))
+    )
+    return restantes
+
+
+def _caminhos(router: APIRouter, prefix: str) -> dict:
+    return {id(rota): prefix + rota.path_format for rota in router.routes if isinstance(rota, APIRoute)}
+
+
+if database.DB_ASYNC:
+    from app.api import async_movie_controller, async_rating_controller, async_user_controller
+
+    # As rotas assíncronas são registradas primeiro; as síncronas equivalentes
+    # são descartadas e as demais continuam atendidas pelos controllers síncronos.
+    ASYNC_ROUTERS = [
+        (async_user_controller.router, "/usuarios", ["Usuários"]),
+        (async_movie_controller.router, "/filmes", ["Filmes"]),
+        (async_rating_controller.router, "/avaliacoes", ["Avaliações"]),
+    ]
+    for router, prefix, tags in ASYNC_ROUTERS:
+        app.include_router(router, prefix=prefix, tags=tags)
+        ROTAS.update(_caminhos(router, prefix))
+    ocupadas = {
+        (prefix + rota.path_format, metodo)
+        for router, prefix, _ in ASYNC_ROUTERS
+        for rota in router.routes if isinstance(rota, APIRoute)
+        for metodo in rota.methods
+    }
+    ROUTERS = [(_sem_rotas_substituidas(r, prefix, ocupadas), prefix, tags) for r, prefix, tags in ROUTERS]
+
 # Inclui as rotas dos controllers
-app.include_router(user_controller.router, prefix="/usuarios", tags=["Usuários"])
-app.include_router(movie_controller.router, prefix="/filmes", tags=["Filmes"])
-app.include_router(rating_controller.router, prefix="/avaliacoes", tags=["Avaliações"])
+for router, prefix, tags in ROUTERS:
+    app.include_router(router, prefix=prefix, tags=tags)
+    ROTAS.update(_caminhos(router, prefix))
 
 @app.get("/")
 def read_root():
     return {"message": "Bem-vindo à MovieTracker API!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metricas():
+    # Formato de texto do Prometheus
+    return Response(content=metrics.exposicao(), media_type=metrics.CONTENT_TYPE)
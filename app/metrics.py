@@ -0,0 +1,282 @@
+"""
+Métricas em memória no formato de texto do Prometheus.
+
+Contadores e histogramas são divididos em fatias por thread: cada thread só
+escreve na própria fatia (sem lock no caminho quente) e a leitura soma as
+fatias. Com vários workers, METRICAS_DIR aponta um diretório compartilhado
+onde cada processo grava periodicamente suas amostras; /metrics soma todos.
+"""
+import abc
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Limites (em segundos) adequados para latências de banco e de requisições
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Limites (em bytes) para tamanhos de resposta
+TAMANHO_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Diretório compartilhado pelos workers (vazio: métricas só do processo atual)
+METRICAS_DIR = os.getenv("METRICAS_DIR")
+# Intervalo, em segundos, entre as gravações de cada worker em METRICAS_DIR
+METRICAS_INTERVALO = float(os.getenv("METRICAS_INTERVALO", 5))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Fatiado(abc.ABC):
+    """Uma fatia de estado por thread, criada no primeiro uso."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._fatias: List = []
+
+    @abc.abstractmethod
+    def _nova_fatia(self):
+        """Estado inicial da fatia de uma thread."""
+
+    def _fatia(self):
+        try:
+            return self._local.fatia
+        except AttributeError:
+            fatia = self._local.fatia = self._nova_fatia()
+            # list.append é atômico; as fatias de threads encerradas continuam somando
+            self._fatias.append(fatia)
+            return fatia
+
+
+class Counter(_Fatiado):
+    """Contador (ou gauge, com valores negativos) sem lock."""
+
+    def _nova_fatia(self):
+        return [0]
+
+    def inc(self, value: float = 1) -> None:
+        self._fatia()[0] += value
+
+    def dec(self, value: float = 1) -> None:
+        self._fatia()[0] -= value
+
+    def value(self) -> float:
+        return sum(fatia[0] for fatia in list(self._fatias))
+
+    def amostra(self) -> float:
+        return self.value()
+
+
+class Histogram(_Fatiado):
+    """Histograma cumulativo de observações (no formato de buckets do Prometheus)."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__()
+        self.buckets = tuple(sorted(buckets))
+
+    def _nova_fatia(self):
+        return [[0] * (len(self.buckets) + 1), 0.0]
+
+    def observe(self, value: float) -> None:
+        fatia = self._fatia()
+        fatia[0][bisect_left(self.buckets, value)] += 1
+        fatia[1] += value
+
+    def snapshot(self) -> Dict:
+        counts = [0] * (len(self.buckets) + 1)
+        soma = 0.0
+        for fatia_counts, fatia_soma in list(self._fatias):
+            for indice, quantidade in enumerate(fatia_counts):
+                counts[indice] += quantidade
+            soma += fatia_soma
+        acumulado = 0
+        buckets = {}
+        for limite, quantidade in zip(self.buckets, counts):
+            acumulado += quantidade
+            buckets[str(limite)] = acumulado
+        total = acumulado + counts[-1]
+        buckets["+Inf"] = total
+        return {"buckets": buckets, "soma": soma, "total": total}
+
+    def amostra(self) -> Dict:
+        return self.snapshot()
+
+
+class Familia:
+    """Uma métrica e suas séries, uma por combinação de valores dos rótulos."""
+
+    def __init__(self, nome: str, tipo: str, ajuda: str, rotulos: Sequence[str], fabrica: Callable):
+        self.nome = nome
+        self.tipo = tipo
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._fabrica = fabrica
+        self._series: Dict[Tuple, object] = {}
+
+    def labels(self, *valores):
+        serie = self._series.get(valores)
+        if serie is None:
+            # setdefault é atômico: em uma corrida, uma das séries é descartada
+            serie = self._series.setdefault(valores, self._fabrica())
+        return serie
+
+    def amostras(self) -> Dict:
+        return {
+            "nome": self.nome,
+            "tipo": self.tipo,
+            "ajuda": self.ajuda,
+            "series": [
+                [dict(zip(self.rotulos, valores)), serie.amostra()]
+                for valores, serie in list(self._series.items())
+            ],
+        }
+
+
+class Registro:
+    """Métricas do processo e coletores chamados a cada leitura (ex.: ocupação dos pools)."""
+
+    def __init__(self):
+        self.familias: List[Familia] = []
+        self.coletores: List[Callable[[], Iterable[Dict]]] = []
+
+    def _registrar(self, familia: Familia) -> Familia:
+        self.familias.append(familia)
+        return familia
+
+    def counter(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Familia:
+        return self._registrar(Familia(nome, "counter", ajuda, rotulos, Counter))
+
+    def gauge(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Familia:
+        return self._registrar(Familia(nome, "gauge", ajuda, rotulos, Counter))
+
+    def histogram(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Familia:
+        return self._registrar(Familia(nome, "histogram", ajuda, rotulos, lambda: Histogram(buckets)))
+
+    def coletor(self, funcao: Callable[[], Iterable[Dict]]):
+        """Registra uma função que devolve famílias no formato de `Familia.amostras()`."""
+        self.coletores.append(funcao)
+        return funcao
+
+    def amostras(self) -> List[Dict]:
+        amostras = [familia.amostras() for familia in self.familias]
+        for coletor in self.coletores:
+            amostras.extend(coletor())
+        return amostras
+
+
+REGISTRO = Registro()
+
+
+def _somar(familias: Iterable[Dict]) -> Dict[str, Dict]:
+    """Soma as séries de mesmo nome e rótulos (de vários processos)."""
+    somadas: Dict[str, Dict] = {}
+    for familia in familias:
+        destino = somadas.setdefault(familia["nome"], {**familia, "series": {}})
+        for rotulos, valor in familia["series"]:
+            chave = tuple(sorted(rotulos.items()))
+            atual = destino["series"].get(chave)
+            if atual is None:
+                destino["series"][chave] = valor
+            elif familia["tipo"] == "histogram":
+                destino["series"][chave] = {
+                    "buckets": {le: atual["buckets"].get(le, 0) + n for le, n in valor["buckets"].items()},
+                    "soma": atual["soma"] + valor["soma"],
+                    "total": atual["total"] + valor["total"],
+                }
+            else:
+                destino["series"][chave] = atual + valor
+    return somadas
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(pares: Iterable[Tuple[str, str]]) -> str:
+    pares = list(pares)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + "}"
+
+
+def render(familias: Iterable[Dict]) -> str:
+    """Formato de texto do Prometheus (versão 0.0.4)."""
+    linhas = []
+    for nome, familia in sorted(_somar(familias).items()):
+        linhas.append(f"# HELP {nome} {familia['ajuda']}")
+        linhas.append(f"# TYPE {nome} {familia['tipo']}")
+        for chave, valor in sorted(familia["series"].items()):
+            if familia["tipo"] == "histogram":
+                for le, quantidade in valor["buckets"].items():
+                    linhas.append(f"{nome}_bucket{_rotulos([*chave, ('le', le)])} {quantidade}")
+                linhas.append(f"{nome}_sum{_rotulos(chave)} {valor['soma']}")
+                linhas.append(f"{nome}_count{_rotulos(chave)} {valor['total']}")
+            else:
+                linhas.append(f"{nome}{_rotulos(chave)} {valor}")
+    return "\n".join(linhas) + "\n"
+
+
+def gravar_amostras(diretorio: str, registro: Registro = REGISTRO) -> None:
+    """Grava as amostras deste processo em <diretorio>/<pid>.json (substituição atômica)."""
+    destino = os.path.join(diretorio, f"{os.getpid()}.json")
+    temporario = f"{destino}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(registro.amostras(), arquivo)
+    os.replace(temporario, destino)
+
+
+def ler_amostras(diretorio: str, validade: float) -> List[Dict]:
+    """
+    Amostras de todos os processos. Contadores e histogramas de workers
+    encerrados continuam somando (são cumulativos); gauges de arquivos não
+    atualizados há mais de `validade` segundos são descartados.
+    """
+    familias = []
+    limite = time.time() - validade
+    for nome in os.listdir(diretorio):
+        if not nome.endswith(".json"):
+            continue
+        caminho = os.path.join(diretorio, nome)
+        try:
+            recente = os.path.getmtime(caminho) >= limite
+            with open(caminho, encoding="utf-8") as arquivo:
+                amostras = json.load(arquivo)
+        except (OSError, ValueError):
+            continue
+        familias.extend(f for f in amostras if recente or f["tipo"] != "gauge")
+    return familias
+
+
+def exposicao(registro: Registro = REGISTRO) -> str:
+    """Conteúdo de /metrics: deste processo ou, com METRICAS_DIR, de todos os workers."""
+    if not METRICAS_DIR:
+        return render(registro.amostras())
+    gravar_amostras(METRICAS_DIR, registro)
+    return render(ler_amostras(METRICAS_DIR, validade=METRICAS_INTERVALO * 3))
+
+
+class ExportadorMetricas(threading.Thread):
+    """Grava as amostras do processo em METRICAS_DIR a cada METRICAS_INTERVALO segundos."""
+
+    def __init__(self, diretorio: str, intervalo: float = METRICAS_INTERVALO, registro: Registro = REGISTRO):
+        super().__init__(name="exportador-metricas", daemon=True)
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.registro = registro
+        self._parar = threading.Event()
+
+    def run(self) -> None:
+        os.makedirs(self.diretorio, exist_ok=True)
+        gravar_amostras(self.diretorio, self.registro)
+        while not self._parar.wait(self.intervalo):
+            gravar_amostras(self.diretorio, self.registro)
+
+    def stop(self) -> None:
+        self._parar.set()
+        gravar_amostras(self.diretorio, self.registro)
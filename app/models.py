@@ -1,18 +1,28 @@
 import uuid
+from itertools import chain
 
 from sqlalchemy import (
+    DDL,
     Column,
     Date,
+    DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
     Text,
     UniqueConstraint,
+    event,
+    func,
+    select,
 )
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import Session, declarative_base, deferred, relationship
+from sqlalchemy.orm.attributes import flag_dirty
+
+from app.db_helpers import dialect_insert
 
 Base = declarative_base()
 
@@ -46,28 +56,52 @@ class Usuario(Base):
     email = Column(String(120), unique=True, nullable=False)
     senha = Column(String(255), nullable=False)
     data_nascimento = Column(Date, nullable=False)
+    # Versão da linha (ETag e controle de concorrência otimista). Mudanças
+    # que não passam por colunas de `usuarios` (listas) usam touch_stmt.
+    versao = Column(Integer, nullable=False, server_default="1")
+    atualizado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
+    # As listas só são carregadas sob demanda; quem precisa delas na resposta
+    # pede selectinload explicitamente (ver UserService), evitando o JOIN
+    # cartesiano entre as três listas a cada consulta de usuário.
     filmes_favoritos = relationship(
         "Filme",
         secondary=usuario_filmes_favoritos,
         back_populates="usuarios_favoritaram",
-        lazy="joined",
+        lazy="select",
     )
     filmes_assistidos = relationship(
         "Filme",
         secondary=usuario_filmes_assistidos,
         back_populates="usuarios_assistiram",
-        lazy="joined",
+        lazy="select",
     )
     filmes_em_espera = relationship(
         "Filme",
         secondary=usuario_filmes_em_espera,
         back_populates="usuarios_em_espera",
-        lazy="joined",
+        lazy="select",
     )
 
     avaliacoes = relationship("Avaliacao", back_populates="usuario", cascade="all, delete-orphan")
 
+    # Tamanho de cada lista (UsuarioResumo): contagens pela chave primária das
+    # tabelas de associação, carregadas juntas com undefer_group("totais_listas")
+    total_favoritos = deferred(
+        select(func.count()).where(usuario_filmes_favoritos.c.usuario_id == id).scalar_subquery(),
+        group="totais_listas",
+    )
+    total_assistidos = deferred(
+        select(func.count()).where(usuario_filmes_assistidos.c.usuario_id == id).scalar_subquery(),
+        group="totais_listas",
+    )
+    total_em_espera = deferred(
+        select(func.count()).where(usuario_filmes_em_espera.c.usuario_id == id).scalar_subquery(),
+        group="totais_listas",
+    )
+
+    __mapper_args__ = {"version_id_col": versao, "eager_defaults": True}
+
 
 class Filme(Base):
     __tablename__ = "filmes"
@@ -77,30 +111,156 @@ class Filme(Base):
     duracao = Column(Integer, nullable=False)
     ano = Column(Integer, nullable=False)
     diretor = Column(String(100), nullable=False)
-    elenco = Column(Text, nullable=True)
     sinopse = Column(Text, nullable=True)
+    # Documento de busca textual (PostgreSQL), mantido pelo SearchService.
+    # Em SQLite a busca usa a tabela FTS5 `filmes_fts` e a coluna fica vazia.
+    busca = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True))
+    # Versão de tudo o que FilmeOut expõe: elenco, estatísticas e favoritos
+    # também a incrementam (ver touch_stmt e _resolver_elenco).
+    versao = Column(Integer, nullable=False, server_default="1")
+    atualizado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
+    # Elenco normalizado em `filme_elenco`, na ordem de créditos
+    creditos = relationship(
+        "FilmeElenco",
+        back_populates="filme",
+        order_by="FilmeElenco.ordem",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+    )
     avaliacoes = relationship("Avaliacao", back_populates="filme", cascade="all, delete-orphan")
+    estatisticas = relationship(
+        "FilmeEstatisticas",
+        back_populates="filme",
+        uselist=False,
+        cascade="all, delete-orphan",
+        lazy="joined",
+    )
 
+    # Os usuários de um filme nunca são carregados implicitamente: podem ser
+    # milhões de linhas. Acessá-los sem carregamento explícito é um erro;
+    # respostas com FilmeOut carregam só os ids de quem favoritou
+    # (sql_helpers.FAVORITOS_DO_FILME).
     usuarios_favoritaram = relationship(
         "Usuario",
         secondary=usuario_filmes_favoritos,
         back_populates="filmes_favoritos",
-        lazy="joined",
+        lazy="raise",
     )
     usuarios_assistiram = relationship(
         "Usuario",
         secondary=usuario_filmes_assistidos,
         back_populates="filmes_assistidos",
-        lazy="joined",
+        lazy="raise",
     )
     usuarios_em_espera = relationship(
         "Usuario",
         secondary=usuario_filmes_em_espera,
         back_populates="filmes_em_espera",
-        lazy="joined",
+        lazy="raise",
     )
 
+    __table_args__ = (
+        # Suporta a paginação por cursor ordenada por (titulo, id)
+        Index("ix_filmes_titulo_id", "titulo", "id"),
+        Index("ix_filmes_busca", "busca", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+    __mapper_args__ = {"version_id_col": versao, "eager_defaults": True}
+
+    # Nomes atribuídos a `elenco` ainda não convertidos em créditos
+    _elenco_pendente = None
+
+    @property
+    def elenco(self):
+        if self._elenco_pendente is not None:
+            return list(self._elenco_pendente)
+        return [credito.pessoa.nome for credito in self.creditos]
+
+    @elenco.setter
+    def elenco(self, nomes):
+        # Aceita a lista de nomes ou o formato legado separado por vírgulas.
+        # Os créditos são resolvidos no flush (ver _resolver_elenco).
+        if isinstance(nomes, str):
+            nomes = nomes.split(",")
+        self._elenco_pendente = list(dict.fromkeys(n.strip() for n in nomes or [] if n and n.strip()))
+        flag_dirty(self)
+
+
+# Índice FTS5 equivalente ao tsvector quando o banco é SQLite
+event.listen(
+    Filme.__table__,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS filmes_fts USING fts5("
+        "filme_id UNINDEXED, titulo, elenco, sinopse, tokenize='unicode61 remove_diacritics 2')"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Filme.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS filmes_fts").execute_if(dialect="sqlite"),
+)
+
+
+class Pessoa(Base):
+    __tablename__ = "pessoas"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    nome = Column(String(200), nullable=False, unique=True)
+
+    creditos = relationship("FilmeElenco", back_populates="pessoa")
+
+
+class FilmeElenco(Base):
+    __tablename__ = "filme_elenco"
+    filme_id = Column(UUID(as_uuid=True), ForeignKey("filmes.id", ondelete="CASCADE"), primary_key=True)
+    pessoa_id = Column(UUID(as_uuid=True), ForeignKey("pessoas.id"), primary_key=True)
+    ordem = Column(Integer, nullable=False)
+
+    filme = relationship("Filme", back_populates="creditos")
+    pessoa = relationship("Pessoa", back_populates="creditos", lazy="joined")
+
+    __table_args__ = (
+        # "Todos os filmes da pessoa X" sem varrer filme_elenco
+        Index("ix_filme_elenco_pessoa_id_filme_id", "pessoa_id", "filme_id"),
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _resolver_elenco(session, flush_context, instances):
+    """
+    Converte os nomes atribuídos a Filme.elenco em créditos: garante uma
+    linha em `pessoas` por nome (INSERT ... ON CONFLICT DO NOTHING, seguro
+    sob concorrência) e reaproveita os créditos que já existiam.
+    """
+    filmes = [
+        obj for obj in chain(session.new, session.dirty)
+        if isinstance(obj, Filme) and obj._elenco_pendente is not None
+    ]
+    if not filmes:
+        return
+    nomes = {nome for filme in filmes for nome in filme._elenco_pendente}
+    if nomes:
+        session.execute(
+            dialect_insert(session, Pessoa.__table__)
+            .values([{"id": uuid.uuid4(), "nome": nome} for nome in nomes])
+            .on_conflict_do_nothing(index_elements=["nome"])
+        )
+    pessoas = {p.nome: p for p in session.scalars(select(Pessoa).where(Pessoa.nome.in_(nomes)))}
+    for filme in filmes:
+        atuais = {credito.pessoa_id: credito for credito in filme.creditos}
+        creditos = []
+        for ordem, nome in enumerate(filme._elenco_pendente):
+            pessoa = pessoas[nome]
+            credito = atuais.get(pessoa.id) or FilmeElenco(pessoa_id=pessoa.id)
+            credito.pessoa = pessoa
+            credito.ordem = ordem
+            creditos.append(credito)
+        filme.creditos = creditos
+        filme._elenco_pendente = None
+        if filme not in session.new:
+            # Os créditos ficam em outra tabela: força o UPDATE (e a nova versão) do filme
+            filme.atualizado_em = func.now()
+
 
 class Avaliacao(Base):
     __tablename__ = "avaliacoes"
@@ -110,9 +270,103 @@ class Avaliacao(Base):
     usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=False)
     filme_id = Column(UUID(as_uuid=True), ForeignKey("filmes.id"), nullable=False)
 
+    versao = Column(Integer, nullable=False, server_default="1")
+    atualizado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
     usuario = relationship("Usuario", back_populates="avaliacoes")
     filme = relationship("Filme", back_populates="avaliacoes")
 
     __table_args__ = (
         UniqueConstraint("usuario_id", "filme_id", name="unique_usuario_filme_avaliacao"),
     )
+    __mapper_args__ = {"version_id_col": versao, "eager_defaults": True}
+
+
+class FilmeEstatisticas(Base):
+    """
+    Agregado desnormalizado das avaliações de um filme, mantido na mesma
+    transação pelas escritas do RatingService (incrementos atômicos em SQL)
+    e reconstruível a partir de `avaliacoes` por RatingService.rebuild_stats.
+    """
+    __tablename__ = "filme_estatisticas"
+    filme_id = Column(UUID(as_uuid=True), ForeignKey("filmes.id", ondelete="CASCADE"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    soma = Column(Float, nullable=False, default=0, server_default="0")
+    # Histograma das notas 0–10 (uma coluna por nota, para permitir incrementos atômicos)
+    nota_0 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_5 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_6 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_7 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_8 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_9 = Column(Integer, nullable=False, default=0, server_default="0")
+    nota_10 = Column(Integer, nullable=False, default=0, server_default="0")
+
+    filme = relationship("Filme", back_populates="estatisticas")
+
+    @property
+    def media(self):
+        return self.soma / self.total if self.total else None
+
+    @property
+    def histograma(self):
+        return [getattr(self, f"nota_{nota}") for nota in range(11)]
+
+
+class FilmeVizinho(Base):
+    """
+    Vizinhos mais similares de cada filme (filtragem colaborativa item a item),
+    calculados a partir de `avaliacoes` pelo RecommendationService. Cada filme
+    guarda no máximo RECOMENDACAO_VIZINHOS linhas, só com similaridade positiva.
+    """
+    __tablename__ = "filme_vizinhos"
+    filme_id = Column(UUID(as_uuid=True), ForeignKey("filmes.id", ondelete="CASCADE"), primary_key=True)
+    vizinho_id = Column(UUID(as_uuid=True), ForeignKey("filmes.id", ondelete="CASCADE"), primary_key=True)
+    similaridade = Column(Float, nullable=False)
+    calculado_em = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Atualização incremental e remoção de filmes procuram pelo vizinho
+        Index("ix_filme_vizinhos_vizinho_id", "vizinho_id"),
+    )
+
+
+class FilmeCoocorrencia(Base):
+    """
+    Quantos usuários têm os dois filmes entre os favoritos. Cada par aparece
+    nas duas direções, para que os relacionados de um filme sejam lidos pelo
+    índice (filme_id, total) sem varrer `usuario_filmes_favoritos`. Mantida
+    pelo UserService a cada favorito incluído ou removido.
+    """
+    __tablename__ = "filme_coocorrencias"
+    filme_id = Column(UUID(as_uuid=True), ForeignKey("filmes.id", ondelete="CASCADE"), primary_key=True)
+    outro_id = Column(UUID(as_uuid=True), ForeignKey("filmes.id", ondelete="CASCADE"), primary_key=True)
+    total = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_filme_coocorrencias_filme_id_total", "filme_id", "total"),
+        Index("ix_filme_coocorrencias_outro_id", "outro_id"),
+    )
+
+
+class FilmeRanking(Base):
+    """
+    Classificações pré-calculadas pela média bayesiana das notas: geral
+    (escopo "geral", chave ""), por gênero (chave = Filme.genero) e por década
+    (chave "1990", "2000", ...). Recalculadas por RankingService.rebuild a
+    partir de `filme_estatisticas`; a leitura é uma faixa da chave primária.
+    """
+    __tablename__ = "filme_rankings"
+    escopo = Column(String(20), primary_key=True)
+    chave = Column(String(100), primary_key=True)
+    posicao = Column(Integer, primary_key=True)
+    filme_id = Column(UUID(as_uuid=True), ForeignKey("filmes.id", ondelete="CASCADE"), nullable=False)
+    nota = Column(Float, nullable=False)
+    media = Column(Float, nullable=False)
+    total = Column(Integer, nullable=False)
+    calculado_em = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (Index("ix_filme_rankings_filme_id", "filme_id"),)
@@ -0,0 +1,125 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(valores: Sequence[Any]) -> str:
+    """Serializa a chave do último item de uma página em um cursor opaco."""
+    payload = [str(v) if isinstance(v, UUID) else v for v in valores]
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, colunas: Sequence[Any]) -> List[Any]:
+    """
+    Decodifica um cursor gerado por encode_cursor, convertendo cada valor
+    para o tipo Python da coluna correspondente.
+    Levanta 400 se o cursor estiver malformado.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(raw.decode("utf-8"))
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            raise ValueError(cursor)
+        return [
+            None if valor is None else coluna.type.python_type(valor)
+            for coluna, valor in zip(colunas, valores)
+        ]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def keyset_after(colunas: Sequence[Any], valores: Sequence[Any], descendente: bool = False):
+    """
+    Monta o filtro (c1, c2, ...) > (v1, v2, ...) (ou < com descendente)
+    expandido em OR/AND, que funciona em qualquer banco e aproveita índices
+    compostos na mesma ordem.
+    """
+    condicoes = []
+    for i, (coluna, valor) in enumerate(zip(colunas, valores)):
+        iguais = [c == v for c, v in zip(colunas[:i], valores[:i])]
+        condicoes.append(and_(*iguais, coluna < valor if descendente else coluna > valor))
+    return or_(*condicoes)
+
+
+def _ordenacao(colunas: Sequence[Any], descendente: bool):
+    return [coluna.desc() for coluna in colunas] if descendente else list(colunas)
+
+
+def paginate_keyset(
+    query,
+    colunas: Sequence[Any],
+    cursor: Optional[str],
+    limit: int,
+    chave: Callable[[Any], Sequence[Any]],
+    descendente: bool = False,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Pagina uma query por chave (keyset) em vez de OFFSET: o custo de qualquer
+    página é o de uma busca no índice seguida de `limit` linhas.
+    `chave` extrai do item os valores correspondentes a `colunas`.
+    Retorna os itens da página e o cursor da próxima (None na última).
+    """
+    if cursor:
+        query = query.filter(keyset_after(colunas, decode_cursor(cursor, colunas), descendente))
+    itens = query.order_by(*_ordenacao(colunas, descendente)).limit(limit + 1).all()
+    return _fechar_pagina(itens, limit, chave)
+
+
+async def paginate_keyset_async(
+    db,
+    stmt,
+    colunas: Sequence[Any],
+    cursor: Optional[str],
+    limit: int,
+    chave: Callable[[Any], Sequence[Any]],
+    descendente: bool = False,
+) -> Tuple[List[Any], Optional[str]]:
+    """Equivalente a paginate_keyset para um select() executado em AsyncSession."""
+    result = await db.execute(_keyset_stmt(stmt, colunas, cursor, limit, descendente))
+    return _fechar_pagina(list(result.scalars().all()), limit, chave)
+
+
+def paginate_keyset_rows(
+    db,
+    stmt,
+    colunas: Sequence[Any],
+    cursor: Optional[str],
+    limit: int,
+    chave: Callable[[Any], Sequence[Any]],
+    descendente: bool = False,
+) -> Tuple[List[Any], Optional[str]]:
+    """Equivalente a paginate_keyset para um select() de colunas: a página é de linhas (Row)."""
+    return _fechar_pagina(db.execute(_keyset_stmt(stmt, colunas, cursor, limit, descendente)).all(), limit, chave)
+
+
+async def paginate_keyset_rows_async(
+    db,
+    stmt,
+    colunas: Sequence[Any],
+    cursor: Optional[str],
+    limit: int,
+    chave: Callable[[Any], Sequence[Any]],
+    descendente: bool = False,
+) -> Tuple[List[Any], Optional[str]]:
+    result = await db.execute(_keyset_stmt(stmt, colunas, cursor, limit, descendente))
+    return _fechar_pagina(result.all(), limit, chave)
+
+
+def _keyset_stmt(stmt, colunas: Sequence[Any], cursor: Optional[str], limit: int, descendente: bool):
+    if cursor:
+        stmt = stmt.where(keyset_after(colunas, decode_cursor(cursor, colunas), descendente))
+    return stmt.order_by(*_ordenacao(colunas, descendente)).limit(limit + 1)
+
+
+def _fechar_pagina(itens: List[Any], limit: int, chave: Callable[[Any], Sequence[Any]]):
+    next_cursor = None
+    if 0 < limit < len(itens):
+        itens = itens[:limit]
+        next_cursor = encode_cursor(chave(itens[-1]))
+    return itens, next_cursor
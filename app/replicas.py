@@ -0,0 +1,252 @@
+"""
+Roteamento de leituras para réplicas do banco.
+
+As rotas somente leitura usam `database.get_read_db`, que escolhe uma réplica
+em round-robin. Uma réplica que falha ao conectar sai da rotação por
+REPLICA_PAUSA segundos, e sem réplica disponível a leitura vai ao primário.
+Depois de uma escrita, o cliente (pelo cookie assinado ou pelo principal do
+token) lê do primário por REPLICA_ATRASO_MAX segundos, para ver as próprias
+escritas mesmo com réplicas atrasadas. Para que essa janela baste, o atraso
+de cada réplica PostgreSQL é medido a cada REPLICA_VERIFICACAO segundos, e a
+que passa de REPLICA_ATRASO_MAX sai da rotação até a próxima medição.
+"""
+import hashlib
+import hmac
+import itertools
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from starlette.requests import HTTPConnection
+
+load_dotenv()
+
+# Réplicas somente leitura, separadas por vírgula (vazio: tudo no primário)
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# Atraso máximo esperado das réplicas em relação ao primário (segundos)
+REPLICA_ATRASO_MAX = float(os.getenv("REPLICA_ATRASO_MAX", 5))
+
+# Tempo fora da rotação de uma réplica que falhou (segundos)
+REPLICA_PAUSA = float(os.getenv("REPLICA_PAUSA", 30))
+
+# Intervalo entre medições do atraso de cada réplica (segundos)
+REPLICA_VERIFICACAO = float(os.getenv("REPLICA_VERIFICACAO", 1))
+
+# Atraso de replicação em segundos; 0 se tudo o que foi recebido já foi
+# aplicado (sem escritas no primário, o último replay envelhece sem atraso
+# real) e NULL fora de uma réplica
+ATRASO_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+# Cookie que mantém as leituras do cliente no primário após uma escrita
+COOKIE_PRIMARIO = "leitura_primario"
+
+METODOS_LEITURA = {"GET", "HEAD", "OPTIONS"}
+
+
+class Replicas:
+    """
+    Engines das réplicas em round-robin, com as que falharam fora da rotação
+    por um tempo. Compartilhada pelas threads do servidor: o estado é lido e
+    alterado sob um lock.
+    """
+
+    def __init__(
+        self,
+        engines: List,
+        pausa: float = REPLICA_PAUSA,
+        atraso_max: float = REPLICA_ATRASO_MAX,
+        verificacao: float = REPLICA_VERIFICACAO,
+        clock=time.monotonic,
+    ):
+        self.engines = list(engines)
+        self.pausa = pausa
+        self.atraso_max = atraso_max
+        self.verificacao = verificacao
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._proxima = itertools.count()
+        self._fora_ate = [0.0] * len(self.engines)
+        self._medir_em = [0.0] * len(self.engines)
+        self.falhas = [0] * len(self.engines)
+        self.atrasos: List[Optional[float]] = [None] * len(self.engines)
+        self.atrasadas = [0] * len(self.engines)
+
+    def candidatas(self) -> Iterator[Tuple[int, object]]:
+        """Réplicas disponíveis, a partir da próxima da rotação."""
+        total = len(self.engines)
+        if not total:
+            return iter(())
+        with self._lock:
+            inicio = next(self._proxima) % total
+            agora = self._clock()
+            disponiveis = [
+                (indice, self.engines[indice])
+                for indice in ((inicio + deslocamento) % total for deslocamento in range(total))
+                if self._fora_ate[indice] <= agora
+            ]
+        return iter(disponiveis)
+
+    def falhou(self, indice: int) -> None:
+        with self._lock:
+            self._fora_ate[indice] = self._clock() + self.pausa
+            self.falhas[indice] += 1
+
+    def medir_agora(self, indice: int) -> bool:
+        """True se o atraso da réplica deve ser medido por quem chamou (uma vez por intervalo)."""
+        with self._lock:
+            agora = self._clock()
+            if self._medir_em[indice] > agora:
+                return False
+            self._medir_em[indice] = agora + self.verificacao
+            return True
+
+    def registrar_atraso(self, indice: int, atraso: Optional[float]) -> bool:
+        """
+        Guarda o atraso medido (None: desconhecido). Acima de atraso_max, a
+        réplica sai da rotação até a próxima medição e o retorno é False.
+        """
+        with self._lock:
+            self.atrasos[indice] = atraso
+            if atraso is None or atraso <= self.atraso_max:
+                return True
+            self._fora_ate[indice] = self._clock() + self.verificacao
+            self.atrasadas[indice] += 1
+            return False
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            agora = self._clock()
+            return [
+                {
+                    "replica": indice,
+                    "disponivel": self._fora_ate[indice] <= agora,
+                    "falhas": self.falhas[indice],
+                    "atraso": self.atrasos[indice],
+                    "vezes_atrasada": self.atrasadas[indice],
+                }
+                for indice in range(len(self.engines))
+            ]
+
+
+def atraso_stmt(dialeto: str):
+    """Consulta do atraso de replicação, ou None se o banco não tem como informá-lo."""
+    return ATRASO_SQL if dialeto == "postgresql" else None
+
+
+def _assinatura(expira: str, segredo: str) -> str:
+    return hmac.new(segredo.encode(), expira.encode(), hashlib.sha256).hexdigest()
+
+
+def valor_do_cookie(expira: float, segredo: str) -> str:
+    """Valor de COOKIE_PRIMARIO: "<expira>.<HMAC-SHA256 de expira>"."""
+    instante = f"{expira:.3f}"
+    return f"{instante}.{_assinatura(instante, segredo)}"
+
+
+def cookie_vigente(valor: Optional[str], segredo: str, agora: Optional[float] = None) -> bool:
+    """True se o cookie foi assinado com `segredo` e ainda não expirou."""
+    if not valor:
+        return False
+    instante, _, assinatura = valor.rpartition(".")
+    if not hmac.compare_digest(assinatura, _assinatura(instante, segredo)):
+        return False
+    try:
+        return float(instante) > (time.time() if agora is None else agora)
+    except ValueError:
+        return False
+
+
+_no_primario: ContextVar[bool] = ContextVar("leitura_no_primario", default=False)
+
+
+def leitura_no_primario() -> bool:
+    """True se a requisição atual deve ler do primário (marcada por LeituraAposEscritaMiddleware)."""
+    return _no_primario.get()
+
+
+class LeituraAposEscritaMiddleware:
+    """
+    Middleware ASGI que mantém no primário as leituras de quem acabou de
+    escrever (método que não é de leitura e status < 400), por `janela`
+    segundos. Clientes com cookies recebem COOKIE_PRIMARIO, assinado com
+    `segredo`. Clientes com token (Authorization: Bearer) também são
+    lembrados pelo principal que `identificar(authorization)` devolve, já
+    que muitos não guardam cookies. Essa lembrança fica na memória do
+    processo. Para cada requisição, o resultado fica disponível para
+    database.get_read_db em leitura_no_primario().
+    """
+
+    # Acima disto, as entradas vencidas da tabela de principais são descartadas
+    MAX_PRINCIPAIS = 10000
+
+    def __init__(
+        self,
+        app,
+        segredo: str,
+        identificar: Optional[Callable[[str], Optional[str]]] = None,
+        janela: float = REPLICA_ATRASO_MAX,
+    ):
+        self.app = app
+        self.segredo = segredo
+        self.identificar = identificar
+        self.janela = janela
+        self._escritas: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _principal(self, conexao: HTTPConnection) -> Optional[str]:
+        authorization = conexao.headers.get("authorization")
+        if self.identificar is None or not authorization:
+            return None
+        return self.identificar(authorization)
+
+    def _escreveu_ha_pouco(self, conexao: HTTPConnection) -> bool:
+        if cookie_vigente(conexao.cookies.get(COOKIE_PRIMARIO), self.segredo):
+            return True
+        if not self._escritas:
+            return False
+        principal = self._principal(conexao)
+        return principal is not None and self._escritas.get(principal, 0.0) > time.time()
+
+    def _registrar_escrita(self, conexao: HTTPConnection, expira: float) -> None:
+        principal = self._principal(conexao)
+        if principal is None:
+            return
+        with self._lock:
+            self._escritas[principal] = expira
+            if len(self._escritas) > self.MAX_PRINCIPAIS:
+                agora = time.time()
+                self._escritas = {chave: fim for chave, fim in self._escritas.items() if fim > agora}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        conexao = HTTPConnection(scope)
+        token = _no_primario.set(self._escreveu_ha_pouco(conexao))
+        try:
+            if scope["method"] in METODOS_LEITURA:
+                await self.app(scope, receive, send)
+                return
+
+            async def enviar(mensagem):
+                if mensagem["type"] == "http.response.start" and mensagem["status"] < 400:
+                    expira = time.time() + self.janela
+                    self._registrar_escrita(conexao, expira)
+                    cookie = (
+                        f"{COOKIE_PRIMARIO}={valor_do_cookie(expira, self.segredo)}; "
+                        f"Max-Age={int(self.janela) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                    )
+                    mensagem["headers"] = [*mensagem.get("headers", []), (b"set-cookie", cookie.encode())]
+                await send(mensagem)
+
+            await self.app(scope, receive, enviar)
+        finally:
+            _no_primario.reset(token)
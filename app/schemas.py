@@ -1,7 +1,7 @@
-from typing import List, Optional
+from typing import Annotated, List, Optional
 from uuid import UUID
 from datetime import date
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, field_validator
 
 
 # Avaliação Schemas
@@ -25,15 +25,46 @@ class AvaliacaoOut(AvaliacaoBase):
     class Config:
         from_attributes = True
 
+class AvaliacaoPagina(BaseModel):
+    itens: List[AvaliacaoOut]
+    next_cursor: Optional[str] = None
+
+class AvaliacaoLoteItem(BaseModel):
+    # Posição do item no lote enviado
+    indice: int
+    # criada, atualizada, ignorada (par repetido no lote) ou erro
+    status: str
+    id: Optional[UUID] = None
+    erro: Optional[str] = None
+
+class AvaliacaoLoteResultado(BaseModel):
+    criadas: int
+    atualizadas: int
+    ignoradas: int
+    erros: int
+    itens: List[AvaliacaoLoteItem]
+
 
 # Filme Schemas
+# Nome de uma pessoa do elenco (pessoas.nome é String(200))
+NomeElenco = Annotated[str, Field(max_length=200)]
+
+class EstatisticasOut(BaseModel):
+    total: int
+    media: Optional[float] = None
+    # Quantidade de avaliações com cada nota, de 0 a 10
+    histograma: List[int]
+
+    class Config:
+        from_attributes = True
+
 class FilmeBase(BaseModel):
     titulo: str
     genero: str
     duracao: int
     ano: int
     diretor: str
-    elenco: List[str]
+    elenco: List[NomeElenco]
     sinopse: Optional[str] = None
 
 class FilmeCreate(FilmeBase):
@@ -45,13 +76,62 @@ class FilmeUpdate(BaseModel):
     duracao: Optional[int] = None
     ano: Optional[int] = None
     diretor: Optional[str] = None
-    elenco: Optional[List[str]] = None
+    elenco: Optional[List[NomeElenco]] = None
     sinopse: Optional[str] = None
 
 class FilmeOut(FilmeBase):
     id: UUID
     avaliacao: Optional[List[AvaliacaoOut]] = []
     usuarios_favoritaram: Optional[List[UUID]] = []
+    estatisticas: Optional[EstatisticasOut] = None
+
+    @field_validator("usuarios_favoritaram", mode="before")
+    @classmethod
+    def ids_dos_usuarios(cls, value):
+        # Aceita a relação ORM (lista de Usuario) e devolve apenas os ids
+        if value is None:
+            return []
+        return [getattr(usuario, "id", usuario) for usuario in value]
+
+    class Config:
+        from_attributes = True
+
+class FilmePagina(BaseModel):
+    itens: List[FilmeOut]
+    next_cursor: Optional[str] = None
+
+class FilmeRankingOut(BaseModel):
+    posicao: int
+    filme: FilmeOut
+    # Média bayesiana usada na classificação
+    nota: float
+    media: float
+    total: int
+
+class FilmeRelacionado(BaseModel):
+    filme: FilmeOut
+    # Usuários que têm os dois filmes nos favoritos
+    favoritos_em_comum: int
+
+class FilmeRecomendado(BaseModel):
+    filme: FilmeOut
+    # Nota que o usuário provavelmente daria, de 0 a 10
+    nota_prevista: float
+
+class ErroImportacao(BaseModel):
+    linha: int
+    erro: str
+
+class ImportacaoResultado(BaseModel):
+    importados: int
+    total_erros: int
+    erros: List[ErroImportacao] = []
+
+
+# Pessoa Schemas
+class PessoaOut(BaseModel):
+    id: UUID
+    nome: str
 
     class Config:
         from_attributes = True
@@ -80,3 +160,51 @@ class UsuarioOut(UsuarioBase):
 
     class Config:
         from_attributes = True
+
+class UsuarioResumo(UsuarioBase):
+    """
+    Representação padrão do usuário: só o tamanho das listas. Os filmes de
+    cada lista ficam em GET /usuarios/{id}/favoritos|assistidos|em_espera.
+    """
+    id: UUID
+    total_favoritos: int = 0
+    total_assistidos: int = 0
+    total_em_espera: int = 0
+
+    class Config:
+        from_attributes = True
+
+class UsuarioIdentidade(BaseModel):
+    """Identidade do usuário autenticado, sem as listas de filmes."""
+    id: UUID
+    nome: str
+    email: EmailStr
+
+    class Config:
+        from_attributes = True
+
+class UsuarioPagina(BaseModel):
+    itens: List[UsuarioResumo]
+    next_cursor: Optional[str] = None
+
+class StatusLista(BaseModel):
+    """Estado de um filme numa lista do usuário após incluí-lo ou removê-lo."""
+    filme_id: UUID
+    lista: str
+    na_lista: bool
+    # False quando o filme já estava (ou já não estava) na lista
+    alterado: bool
+
+# Listas do usuário em lote
+MAX_FILMES_POR_LOTE = 1000
+
+class FilmesLote(BaseModel):
+    filme_ids: List[UUID] = Field(..., min_length=1, max_length=MAX_FILMES_POR_LOTE)
+
+class FilmesLoteResultado(BaseModel):
+    # Incluídos (POST) ou removidos (DELETE) da lista
+    alterados: int
+    # Filmes existentes que já estavam (POST) ou não estavam (DELETE) na lista
+    ignorados: int
+    # Ids que não correspondem a nenhum filme
+    inexistentes: List[UUID] = []
@@ -0,0 +1,138 @@
+"""
+Serialização rápida das listagens de filmes e usuários.
+
+As páginas são montadas a partir de projeções SQL (linhas, sem objetos ORM)
+por funções que produzem dicionários com as mesmas chaves, na mesma ordem, de
+FilmeOut e UsuarioResumo, e codificadas com orjson. Assim não há identity map,
+carregamento de relações nem validação pelo pydantic de dados que vieram do
+próprio banco. SERIALIZACAO_RAPIDA=false volta ao caminho pelos schemas.
+
+Elenco e favoritos vêm em uma consulta IN cada, como os selectinload do
+caminho pelos schemas.
+"""
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+import orjson
+from sqlalchemy import select
+
+from app import models
+
+SERIALIZACAO_RAPIDA = os.getenv("SERIALIZACAO_RAPIDA", "true").lower() in ("1", "true", "yes")
+
+_NOTAS = tuple(getattr(models.FilmeEstatisticas, f"nota_{nota}") for nota in range(11))
+
+# Colunas de FilmeOut, exceto elenco e favoritos (consultas à parte)
+FILME_COLUNAS = (
+    models.Filme.id,
+    models.Filme.titulo,
+    models.Filme.genero,
+    models.Filme.duracao,
+    models.Filme.ano,
+    models.Filme.diretor,
+    models.Filme.sinopse,
+    models.FilmeEstatisticas.total,
+    models.FilmeEstatisticas.soma,
+    *_NOTAS,
+)
+# As notas são as últimas colunas da linha
+_INICIO_NOTAS = len(FILME_COLUNAS) - len(_NOTAS)
+
+USUARIO_COLUNAS = (
+    models.Usuario.id,
+    models.Usuario.nome,
+    models.Usuario.email,
+    models.Usuario.data_nascimento,
+    models.Usuario.total_favoritos,
+    models.Usuario.total_assistidos,
+    models.Usuario.total_em_espera,
+)
+
+
+def filmes_select(*filtros):
+    return (
+        select(*FILME_COLUNAS)
+        .outerjoin(models.FilmeEstatisticas, models.FilmeEstatisticas.filme_id == models.Filme.id)
+        .where(*filtros)
+    )
+
+
+def elenco_select(filme_ids: Sequence[UUID]):
+    return (
+        select(models.FilmeElenco.filme_id, models.Pessoa.nome)
+        .join(models.Pessoa, models.Pessoa.id == models.FilmeElenco.pessoa_id)
+        .where(models.FilmeElenco.filme_id.in_(filme_ids))
+        .order_by(models.FilmeElenco.ordem)
+    )
+
+
+def favoritos_select(filme_ids: Sequence[UUID]):
+    """(filme_id, usuario_id) de quem favoritou cada filme, para FilmeOut.usuarios_favoritaram."""
+    favoritos = models.usuario_filmes_favoritos
+    return select(favoritos.c.filme_id, favoritos.c.usuario_id).where(favoritos.c.filme_id.in_(filme_ids))
+
+
+def usuarios_select():
+    return select(*USUARIO_COLUNAS)
+
+
+def agrupar_por_filme(linhas: Iterable) -> Dict[UUID, list]:
+    """Linhas (filme_id, valor) agrupadas por filme, na ordem em que vieram."""
+    grupos: Dict[UUID, list] = {}
+    for filme_id, valor in linhas:
+        grupos.setdefault(filme_id, []).append(valor)
+    return grupos
+
+
+def filme_dict(linha, elenco: List[str], favoritaram: List[UUID]) -> dict:
+    """
+    FilmeOut de uma linha de filmes_select(). `avaliacao` é sempre vazia,
+    também no caminho pelos schemas: Filme não tem atributo com esse nome.
+    """
+    estatisticas = None
+    if linha.total is not None:
+        estatisticas = {
+            "total": linha.total,
+            "media": linha.soma / linha.total if linha.total else None,
+            "histograma": list(linha[_INICIO_NOTAS:]),
+        }
+    return {
+        "titulo": linha.titulo,
+        "genero": linha.genero,
+        "duracao": linha.duracao,
+        "ano": linha.ano,
+        "diretor": linha.diretor,
+        "elenco": elenco,
+        "sinopse": linha.sinopse,
+        "id": linha.id,
+        "avaliacao": [],
+        "usuarios_favoritaram": favoritaram,
+        "estatisticas": estatisticas,
+    }
+
+
+def filmes_dicts(linhas: Sequence, linhas_elenco: Iterable, linhas_favoritos: Iterable) -> List[dict]:
+    elenco = agrupar_por_filme(linhas_elenco)
+    favoritos = agrupar_por_filme(linhas_favoritos)
+    return [filme_dict(linha, elenco.get(linha.id, []), favoritos.get(linha.id, [])) for linha in linhas]
+
+
+def usuario_dict(linha) -> dict:
+    """UsuarioResumo de uma linha de usuarios_select()."""
+    return {
+        "nome": linha.nome,
+        "email": linha.email,
+        "data_nascimento": linha.data_nascimento,
+        "id": linha.id,
+        "total_favoritos": linha.total_favoritos,
+        "total_assistidos": linha.total_assistidos,
+        "total_em_espera": linha.total_em_espera,
+    }
+
+
+def pagina_json(itens: List[dict], next_cursor: Optional[str], paginada: bool) -> bytes:
+    """Lista simples ou, com paginação por cursor, o envelope {itens, next_cursor}."""
+    if paginada:
+        return orjson.dumps({"itens": itens, "next_cursor": next_cursor})
+    return orjson.dumps(itens)
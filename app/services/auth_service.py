@@ -1,40 +1,153 @@
+import asyncio
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Dict, Hashable, Optional, Tuple
 
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from pydantic import ValidationError
 
 # Carrega variáveis de ambiente
 from dotenv import load_dotenv
 
+from app.metrics import Histogram
+
 load_dotenv()
 
 # Configurações de autenticação
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+# Inclui nome e e-mail no token: get_current_user passa a não consultar o banco
+JWT_IDENTITY_CLAIMS = os.getenv("JWT_IDENTITY_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# Custo do bcrypt. Hashes gravados com outro custo são refeitos no próximo login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Threads dedicadas ao bcrypt e quantos pedidos podem esperar por elas; além
+# disso a requisição recebe 503. Mantenha a soma abaixo do threadpool do
+# servidor (40 no Starlette), pois rotas síncronas ficam bloqueadas aguardando.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 2))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", 16))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class HashingPool:
+    """
+    Executor exclusivo para o bcrypt, com fila limitada. Uma rajada de logins
+    ocupa só estas threads (o bcrypt libera o GIL enquanto calcula) em vez do
+    threadpool compartilhado por todas as rotas; com a fila cheia, submit()
+    recusa o pedido com 503 em vez de acumular espera.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._vagas = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self.pendentes = 0
+        self.executando = 0
+        self.rejeitados = 0
+        self.espera = Histogram()
+        self.duracao = Histogram()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if not self._vagas.acquire(blocking=False):
+            with self._lock:
+                self.rejeitados += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado; tente novamente em instantes",
+                headers={"Retry-After": "1"},
+            )
+        with self._lock:
+            self.pendentes += 1
+        enviado_em = time.perf_counter()
+
+        def executar():
+            inicio = time.perf_counter()
+            self.espera.observe(inicio - enviado_em)
+            with self._lock:
+                self.executando += 1
+            try:
+                return fn(*args)
+            finally:
+                self.duracao.observe(time.perf_counter() - inicio)
+                with self._lock:
+                    self.executando -= 1
+                    self.pendentes -= 1
+                self._vagas.release()
+
+        try:
+            return self._executor.submit(executar)
+        except RuntimeError:
+            with self._lock:
+                self.pendentes -= 1
+            self._vagas.release()
+            raise
+
+    def run(self, fn: Callable, *args):
+        """Executa no pool e aguarda o resultado (rotas e serviços síncronos)."""
+        return self.submit(fn, *args).result()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    async def run_async(self, fn: Callable, *args):
+        """Executa no pool sem bloquear o event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pendentes, executando, rejeitados = self.pendentes, self.executando, self.rejeitados
+        return {
+            "workers": self.workers,
+            "fila_maxima": self.queue_size,
+            "executando": executando,
+            "na_fila": pendentes - executando,
+            "rejeitados": rejeitados,
+            "espera": self.espera.snapshot(),
+            "duracao": self.duracao.snapshot(),
+        }
+
+
+hashing_pool = HashingPool(HASH_WORKERS, HASH_QUEUE_SIZE)
+
+
+def _truncar(password: str) -> str:
+    # O bcrypt considera no máximo 72 bytes; o corte é o mesmo no hash e na verificação
+    return password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_pool.run(pwd_context.verify, _truncar(plain_password), hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(senha confere, novo hash se o atual usa um custo diferente de BCRYPT_ROUNDS)."""
+    return hashing_pool.run(pwd_context.verify_and_update, _truncar(plain_password), hashed_password)
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await hashing_pool.run_async(pwd_context.verify_and_update, _truncar(plain_password), hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    # Log temporário para inspecionar o valor da senha recebida
-    print(f"[DEBUG] Valor recebido em get_password_hash: {repr(password)} (type: {type(password)})")
-    # Trunca a senha para no máximo 72 bytes (bcrypt limitation)
-    password_bytes = password.encode("utf-8")[:72]
-    password_truncated = password_bytes.decode("utf-8", errors="ignore")
-    return pwd_context.hash(password_truncated)
+    return hashing_pool.run(pwd_context.hash, _truncar(password))
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await hashing_pool.run_async(pwd_context.hash, _truncar(password))
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -47,15 +160,74 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
 
 
+def principal_do_cabecalho(authorization: str) -> Optional[str]:
+    """"sub" de um cabeçalho "Authorization: Bearer <token>" válido, ou None."""
+    esquema, _, token = authorization.partition(" ")
+    if esquema.lower() != "bearer" or not token:
+        return None
+    payload = decode_access_token(token)
+    return payload.get("sub") if payload else None
+
+
+def token_claims(user) -> dict:
+    """Claims do token de acesso: o id e, com JWT_IDENTITY_CLAIMS, a identidade."""
+    claims = {"sub": str(user.id)}
+    if JWT_IDENTITY_CLAIMS:
+        claims.update({"nome": user.nome, "email": user.email})
+    return claims
+
+
+def principal_from_claims(payload: dict):
+    """Identidade montada só a partir do token, ou None se ele não a carrega."""
+    from app.schemas import UsuarioIdentidade
+
+    if not JWT_IDENTITY_CLAIMS or "nome" not in payload or "email" not in payload:
+        return None
+    try:
+        return UsuarioIdentidade(id=payload["sub"], nome=payload["nome"], email=payload["email"])
+    except ValidationError:
+        return None
+
+
+def principal_cache_key(payload: dict) -> Tuple[Hashable, Hashable]:
+    return payload["sub"], payload.get("jti")
+
+
 def authenticate_user(db, email: str, password: str):
     """
     Autentica um usuário pelo e-mail e senha.
     Retorna o usuário se autenticado, ou None.
     """
+    from sqlalchemy.orm import raiseload
+
+    from app.models import Usuario
+    # O login só precisa de id e senha: nenhuma relação deve ser carregada
+    user = db.query(Usuario).options(raiseload("*")).filter(Usuario.email == email).first()
+    if not user:
+        return None
+    valida, novo_hash = verify_and_update(password, user.senha)
+    if not valida:
+        return None
+    if novo_hash is not None:
+        user.senha = novo_hash
+        db.commit()
+    return user
+
+
+async def authenticate_user_async(db, email: str, password: str):
+    """Versão de authenticate_user para AsyncSession."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import raiseload
+
     from app.models import Usuario
-    user = db.query(Usuario).filter(Usuario.email == email).first()
+    result = await db.execute(select(Usuario).options(raiseload("*")).where(Usuario.email == email))
+    user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.senha):
+    valida, novo_hash = await verify_and_update_async(password, user.senha)
+    if not valida:
         return None
+    if novo_hash is not None:
+        user.senha = novo_hash
+        await db.commit()
     return user
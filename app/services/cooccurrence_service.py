@@ -0,0 +1,127 @@
+"""
+Índice "quem favoritou este filme também favoritou": contagens por par de
+filmes em `filme_coocorrencias`, atualizadas a cada favorito incluído ou
+removido e reconstruíveis a partir de `usuario_filmes_favoritos`.
+"""
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, func, insert, literal, or_, select, true, tuple_, update
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+from app.db_helpers import dialect_insert
+from app.services.sql_helpers import FAVORITOS_DO_FILME
+
+favoritos = models.usuario_filmes_favoritos
+coocorrencias = models.FilmeCoocorrencia.__table__
+
+
+def _pares_do_usuario(user_id: UUID, movie_ids: Optional[List[UUID]] = None):
+    """Pares ordenados (a, b), a != b, dos favoritos do usuário; com movie_ids, só os que envolvem esses filmes."""
+    outro = aliased(favoritos)
+    pares = (
+        select(favoritos.c.filme_id, outro.c.filme_id.label("outro_id"))
+        .join(outro, and_(outro.c.usuario_id == favoritos.c.usuario_id, outro.c.filme_id != favoritos.c.filme_id))
+        .where(favoritos.c.usuario_id == user_id)
+    )
+    if movie_ids is not None:
+        pares = pares.where(or_(favoritos.c.filme_id.in_(movie_ids), outro.c.filme_id.in_(movie_ids)))
+    return pares
+
+
+def _remover_zerados(*criterios):
+    return delete(coocorrencias).where(coocorrencias.c.total <= 0, or_(*criterios))
+
+
+def favorites_lock_stmt(user_id: UUID):
+    """
+    Trava a linha do usuário até o commit. Executar ANTES de alterar os
+    favoritos: os pares são calculados a partir dos favoritos atuais, então
+    duas transações do mesmo usuário em paralelo não podem enxergar cada uma
+    só a própria inclusão (o par entre os dois filmes não seria contado).
+    """
+    return select(models.Usuario.id).where(models.Usuario.id == user_id).with_for_update()
+
+
+def favorites_added_stmt(db: Session, user_id: UUID, movie_ids: List[UUID]):
+    """
+    +1 nos pares dos favoritos do usuário que envolvem algum dos filmes, nas
+    duas direções. Executar DEPOIS de gravar os favoritos (e de
+    favorites_lock_stmt), passando só os ids efetivamente incluídos.
+    """
+    pares = _pares_do_usuario(user_id, movie_ids).subquery()
+    novos = select(pares.c.filme_id, pares.c.outro_id, literal(1)).where(true())
+    stmt = dialect_insert(db, coocorrencias).from_select(["filme_id", "outro_id", "total"], novos)
+    return stmt.on_conflict_do_update(
+        index_elements=["filme_id", "outro_id"],
+        set_={"total": coocorrencias.c.total + stmt.excluded.total},
+    )
+
+
+def favorites_removed_stmts(user_id: UUID, movie_ids: List[UUID]):
+    """-1 nos pares dos favoritos do usuário que envolvem algum dos filmes (antes de removê-los, após favorites_lock_stmt)."""
+    return (
+        update(coocorrencias)
+        .where(tuple_(coocorrencias.c.filme_id, coocorrencias.c.outro_id).in_(_pares_do_usuario(user_id, movie_ids)))
+        .values(total=coocorrencias.c.total - 1),
+        _remover_zerados(coocorrencias.c.filme_id.in_(movie_ids), coocorrencias.c.outro_id.in_(movie_ids)),
+    )
+
+
+def user_removed_stmts(user_id: UUID):
+    """-1 em todos os pares dos favoritos do usuário (antes de removê-lo, após favorites_lock_stmt)."""
+    pares = _pares_do_usuario(user_id)
+    filmes = select(favoritos.c.filme_id).where(favoritos.c.usuario_id == user_id)
+    return (
+        update(coocorrencias)
+        .where(tuple_(coocorrencias.c.filme_id, coocorrencias.c.outro_id).in_(pares))
+        .values(total=coocorrencias.c.total - 1),
+        _remover_zerados(coocorrencias.c.filme_id.in_(filmes)),
+    )
+
+
+def movie_removed_stmt(movie_id: UUID):
+    return delete(coocorrencias).where(or_(coocorrencias.c.filme_id == movie_id, coocorrencias.c.outro_id == movie_id))
+
+
+class CooccurrenceService:
+    @staticmethod
+    def related(db: Session, filme_id: UUID, limit: int = 10) -> List[dict]:
+        """Filmes mais favoritados por quem favoritou `filme_id`, com a contagem de usuários em comum."""
+        if db.get(models.Filme, filme_id) is None:
+            raise HTTPException(status_code=404, detail="Filme não encontrado")
+        linhas = db.execute(
+            select(models.FilmeCoocorrencia.outro_id, models.FilmeCoocorrencia.total)
+            .where(models.FilmeCoocorrencia.filme_id == filme_id)
+            .order_by(models.FilmeCoocorrencia.total.desc(), models.FilmeCoocorrencia.outro_id)
+            .limit(limit)
+        ).all()
+        if not linhas:
+            return []
+        filmes = {
+            filme.id: filme
+            for filme in db.scalars(
+                select(models.Filme).options(FAVORITOS_DO_FILME).where(models.Filme.id.in_([linha.outro_id for linha in linhas]))
+            )
+        }
+        return [
+            {"filme": filmes[linha.outro_id], "favoritos_em_comum": linha.total}
+            for linha in linhas
+            if linha.outro_id in filmes
+        ]
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """Recalcula todas as contagens a partir dos favoritos. Retorna o número de pares."""
+        outro = aliased(favoritos)
+        pares = (
+            select(favoritos.c.filme_id, outro.c.filme_id, func.count())
+            .join(outro, and_(outro.c.usuario_id == favoritos.c.usuario_id, outro.c.filme_id != favoritos.c.filme_id))
+            .group_by(favoritos.c.filme_id, outro.c.filme_id)
+        )
+        db.execute(delete(coocorrencias))
+        resultado = db.execute(insert(coocorrencias).from_select(["filme_id", "outro_id", "total"], pares))
+        db.commit()
+        return resultado.rowcount
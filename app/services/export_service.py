@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+from itertools import groupby
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.import_service import FORMATOS, SEPARADOR_ELENCO_CSV
+
+# Linhas buscadas por ida ao banco e emitidas por pedaço da resposta
+LOTE_EXPORTACAO = 1000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+LISTAS_USUARIO = {
+    "favoritos": models.usuario_filmes_favoritos,
+    "assistidos": models.usuario_filmes_assistidos,
+    "em_espera": models.usuario_filmes_em_espera,
+}
+
+
+def em_sessao_propria(session_factory: Callable[[], Session], gerar, *args, **kwargs) -> Iterator[str]:
+    """
+    Executa um exportador numa sessão aberta só para ele. O corpo de uma
+    StreamingResponse é gerado depois que a rota retorna, então não pode
+    usar a sessão da dependência get_db.
+    """
+    db = session_factory()
+    try:
+        yield from gerar(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+def _particoes(db: Session, stmt):
+    # Cursor do lado do servidor: a memória fica limitada a um lote de linhas
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=LOTE_EXPORTACAO))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _valor_json(valor):
+    return str(valor) if isinstance(valor, UUID) else valor
+
+
+def _serializar(formato: str, colunas: Sequence[str], particoes: Iterable[Sequence[dict]]) -> Iterator[str]:
+    if formato == "csv":
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(colunas)
+        for particao in particoes:
+            escritor.writerows([linha[coluna] for coluna in colunas] for linha in particao)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+    for particao in particoes:
+        yield "".join(
+            json.dumps({coluna: _valor_json(linha[coluna]) for coluna in colunas}, ensure_ascii=False) + "\n"
+            for linha in particao
+        )
+
+
+class ExportService:
+    @staticmethod
+    def export_ratings(
+        db: Session, formato: str, filme_id: Optional[UUID] = None, usuario_id: Optional[UUID] = None
+    ) -> Iterator[str]:
+        tabela = models.Avaliacao.__table__
+        stmt = select(tabela.c.id, tabela.c.usuario_id, tabela.c.filme_id, tabela.c.nota, tabela.c.comentario)
+        if filme_id is not None:
+            stmt = stmt.where(tabela.c.filme_id == filme_id)
+        if usuario_id is not None:
+            stmt = stmt.where(tabela.c.usuario_id == usuario_id)
+        particoes = ([linha._mapping for linha in particao] for particao in _particoes(db, stmt))
+        return _serializar(formato, ["id", "usuario_id", "filme_id", "nota", "comentario"], particoes)
+
+    @staticmethod
+    def export_movies(db: Session, formato: str) -> Iterator[str]:
+        """
+        Filmes no mesmo formato aceito por POST /filmes/importar (mais o id).
+        O elenco de cada lote vem de uma única consulta a filme_elenco.
+        """
+        tabela = models.Filme.__table__
+        stmt = select(
+            tabela.c.id, tabela.c.titulo, tabela.c.genero, tabela.c.duracao,
+            tabela.c.ano, tabela.c.diretor, tabela.c.sinopse,
+        )
+        colunas = ["id", "titulo", "genero", "duracao", "ano", "diretor", "elenco", "sinopse"]
+
+        def com_elenco():
+            for particao in _particoes(db, stmt):
+                linhas = [dict(linha._mapping) for linha in particao]
+                creditos = db.execute(
+                    select(models.FilmeElenco.filme_id, models.Pessoa.nome)
+                    .join(models.Pessoa, models.Pessoa.id == models.FilmeElenco.pessoa_id)
+                    .where(models.FilmeElenco.filme_id.in_([linha["id"] for linha in linhas]))
+                    .order_by(models.FilmeElenco.filme_id, models.FilmeElenco.ordem)
+                )
+                elencos = {
+                    filme_id: [nome for _, nome in grupo]
+                    for filme_id, grupo in groupby(creditos, key=lambda credito: credito[0])
+                }
+                for linha in linhas:
+                    elenco = elencos.get(linha["id"], [])
+                    linha["elenco"] = SEPARADOR_ELENCO_CSV.join(elenco) if formato == "csv" else elenco
+                yield linhas
+
+        return _serializar(formato, colunas, com_elenco())
+
+    @staticmethod
+    def export_user_lists(db: Session, formato: str, usuario_id: Optional[UUID] = None) -> Iterator[str]:
+        """Uma linha por (usuario_id, lista, filme_id) das listas favoritos/assistidos/em_espera."""
+        consultas = []
+        for nome, tabela in LISTAS_USUARIO.items():
+            consulta = select(tabela.c.usuario_id, literal(nome).label("lista"), tabela.c.filme_id)
+            if usuario_id is not None:
+                consulta = consulta.where(tabela.c.usuario_id == usuario_id)
+            consultas.append(consulta)
+        particoes = ([linha._mapping for linha in particao] for particao in _particoes(db, union_all(*consultas)))
+        return _serializar(formato, ["usuario_id", "lista", "filme_id"], particoes)
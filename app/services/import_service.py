@@ -0,0 +1,157 @@
+import csv
+import json
+import uuid
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.cache import invalidar_filmes
+from app.db_helpers import dialect_insert
+from app.services.search_service import SearchService
+from app.services.sql_helpers import copy_rows
+
+# Filmes validados e gravados por transação
+TAMANHO_LOTE = 1000
+
+# Limite de erros detalhados na resposta; os demais só entram na contagem
+MAX_ERROS_REPORTADOS = 1000
+
+# Separador do elenco na coluna `elenco` do CSV
+SEPARADOR_ELENCO_CSV = "|"
+
+FORMATOS = ("ndjson", "csv")
+
+
+def ler_ndjson(linhas: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    """Um objeto JSON por linha; linhas em branco são ignoradas."""
+    for numero, linha in enumerate(linhas, start=1):
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except ValueError as exc:
+            yield numero, ValueError(f"JSON inválido: {exc}")
+
+
+def ler_csv(linhas: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    """CSV com cabeçalho; o elenco vem numa única coluna separado por `|`."""
+    leitor = csv.DictReader(linhas)
+    for registro in leitor:
+        dados = {campo: (valor if valor != "" else None) for campo, valor in registro.items() if campo}
+        elenco = dados.get("elenco")
+        dados["elenco"] = elenco.split(SEPARADOR_ELENCO_CSV) if elenco else []
+        yield leitor.line_num, dados
+
+
+def _mensagem_validacao(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in erro['loc']) or 'registro'}: {erro['msg']}" for erro in exc.errors())
+
+
+class ImportService:
+    @staticmethod
+    def import_movies(
+        db: Session, registros: Iterable[Tuple[int, object]], tamanho_lote: int = TAMANHO_LOTE
+    ) -> Dict:
+        """
+        Importa filmes a partir de (número da linha, dados) — ver ler_ndjson e
+        ler_csv. A entrada é consumida em lotes, então a memória não depende
+        do tamanho do arquivo. Cada lote é validado com FilmeCreate e gravado
+        numa transação com INSERTs em massa (COPY no PostgreSQL); linhas
+        inválidas são relatadas sem interromper a importação.
+        """
+        resultado = {"importados": 0, "total_erros": 0, "erros": []}
+
+        def registrar_erro(linha: int, mensagem: str) -> None:
+            resultado["total_erros"] += 1
+            if len(resultado["erros"]) < MAX_ERROS_REPORTADOS:
+                resultado["erros"].append({"linha": linha, "erro": mensagem})
+
+        lote: List[Tuple[int, schemas.FilmeCreate]] = []
+        for linha, dados in registros:
+            if isinstance(dados, Exception):
+                registrar_erro(linha, str(dados))
+                continue
+            try:
+                lote.append((linha, schemas.FilmeCreate.model_validate(dados)))
+            except ValidationError as exc:
+                registrar_erro(linha, _mensagem_validacao(exc))
+                continue
+            if len(lote) >= tamanho_lote:
+                resultado["importados"] += ImportService._gravar_lote(db, lote, registrar_erro)
+                lote = []
+        if lote:
+            resultado["importados"] += ImportService._gravar_lote(db, lote, registrar_erro)
+        return resultado
+
+    @staticmethod
+    def _gravar_lote(db: Session, lote, registrar_erro) -> int:
+        try:
+            ImportService._inserir(db, [filme for _, filme in lote])
+            db.commit()
+            invalidar_filmes(listas=True)
+            return len(lote)
+        except DBAPIError:
+            db.rollback()
+        # Algum registro foi recusado pelo banco (ex.: texto maior que a coluna):
+        # regrava o lote linha a linha, cada uma no seu savepoint, para isolá-lo.
+        gravados = 0
+        for linha, filme in lote:
+            try:
+                with db.begin_nested():
+                    ImportService._inserir(db, [filme])
+                gravados += 1
+            except DBAPIError as exc:
+                registrar_erro(linha, str(exc.orig).strip().splitlines()[0])
+        db.commit()
+        invalidar_filmes(listas=True)
+        return gravados
+
+    @staticmethod
+    def _inserir(db: Session, filmes: List[schemas.FilmeCreate]) -> None:
+        postgres = db.get_bind().dialect.name == "postgresql"
+        linhas_filmes = []
+        elencos = []
+        for filme in filmes:
+            filme_id = uuid.uuid4()
+            linhas_filmes.append({
+                "id": filme_id,
+                "titulo": filme.titulo,
+                "genero": filme.genero,
+                "duracao": filme.duracao,
+                "ano": filme.ano,
+                "diretor": filme.diretor,
+                "sinopse": filme.sinopse,
+            })
+            nomes = dict.fromkeys(nome.strip() for nome in filme.elenco if nome and nome.strip())
+            elencos.append((filme_id, list(nomes)))
+
+        if postgres:
+            copy_rows(db, models.Filme.__table__, linhas_filmes)
+        else:
+            db.execute(insert(models.Filme.__table__), linhas_filmes)
+
+        # Pessoas: um único upsert para todos os nomes do lote
+        nomes = {nome for _, elenco in elencos for nome in elenco}
+        creditos = []
+        if nomes:
+            db.execute(
+                dialect_insert(db, models.Pessoa.__table__).on_conflict_do_nothing(index_elements=["nome"]),
+                [{"id": uuid.uuid4(), "nome": nome} for nome in nomes],
+            )
+            ids = dict(db.execute(select(models.Pessoa.nome, models.Pessoa.id).where(models.Pessoa.nome.in_(nomes))).all())
+            creditos = [
+                {"filme_id": filme_id, "pessoa_id": ids[nome], "ordem": ordem}
+                for filme_id, elenco in elencos
+                for ordem, nome in enumerate(elenco)
+            ]
+        if creditos:
+            if postgres:
+                copy_rows(db, models.FilmeElenco.__table__, creditos)
+            else:
+                db.execute(insert(models.FilmeElenco.__table__), creditos)
+
+        SearchService.reindex(db, [linha["id"] for linha in linhas_filmes])
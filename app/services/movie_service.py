@@ -1,56 +1,381 @@
-from typing import List, Optional
+from typing import List, Optional, Set, Tuple
 from uuid import UUID
 
+from pydantic import TypeAdapter
+from sqlalchemy import delete, or_, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import models, schemas, serialization
+from app.cache import TAG_LISTAS_FILMES, filmes_cache, invalidar_filmes
+from app.etag import check_version, stale_version_guard
+from app.pagination import paginate_keyset, paginate_keyset_async, paginate_keyset_rows, paginate_keyset_rows_async
+from app.services.cooccurrence_service import movie_removed_stmt
+from app.services.search_service import SearchService
+from app.services.sql_helpers import FAVORITOS_DO_FILME, row_for_delete_stmt, touch_stmt
+
+
+def _filtros(ator: Optional[str] = None) -> list:
+    """Filtros opcionais das listagens de filmes."""
+    filtros = []
+    if ator is not None:
+        # Resolve o nome pelo índice único de pessoas e os filmes por ix_filme_elenco_pessoa_id_filme_id
+        filtros.append(models.Filme.id.in_(
+            select(models.FilmeElenco.filme_id)
+            .join(models.Pessoa, models.Pessoa.id == models.FilmeElenco.pessoa_id)
+            .where(models.Pessoa.nome == ator)
+        ))
+    return filtros
+
+
+LISTAS = (
+    models.usuario_filmes_favoritos,
+    models.usuario_filmes_assistidos,
+    models.usuario_filmes_em_espera,
+)
+
+
+def _usuarios_com_filme(filme_id: UUID):
+    """Usuários que têm o filme em alguma lista (e cuja versão muda ao removê-lo)."""
+    return union(*(select(tabela.c.usuario_id).where(tabela.c.filme_id == filme_id) for tabela in LISTAS))
+
+
+def _delete_vizinhos_stmt(filme_id: UUID):
+    # O filme sai das listas de recomendação dos outros, além da sua
+    vizinhos = models.FilmeVizinho
+    return delete(vizinhos).where(or_(vizinhos.filme_id == filme_id, vizinhos.vizinho_id == filme_id))
+
+
+_LISTA_FILMES = TypeAdapter(List[schemas.FilmeOut])
+
+
+def _json_filme(filme: models.Filme) -> bytes:
+    return schemas.FilmeOut.model_validate(filme).model_dump_json().encode()
+
+
+def _json_lista(filmes: List[models.Filme], next_cursor: Optional[str], paginada: bool) -> bytes:
+    if paginada:
+        return schemas.FilmePagina.model_validate({"itens": filmes, "next_cursor": next_cursor}).model_dump_json().encode()
+    return _LISTA_FILMES.dump_json(_LISTA_FILMES.validate_python(filmes, from_attributes=True))
+
+
+def _versao_stmt(filme_id: UUID):
+    # Consulta barata usada para responder 304 sem carregar o filme
+    return select(models.Filme.versao, models.Filme.atualizado_em).where(models.Filme.id == filme_id)
+
+
+def _chave_lista(skip: int, limit: int, cursor: Optional[str], ator: Optional[str]) -> tuple:
+    # No modo cursor o skip é ignorado
+    return ("filmes", None if cursor is not None else skip, limit, cursor, ator)
+
+
+def _tags_lista(filme_ids: List[UUID]) -> list:
+    return [TAG_LISTAS_FILMES, *filme_ids]
+
+
+# Ordem da listagem por cursor, coberta pelo índice ix_filmes_titulo_id
+_CHAVE_LISTA = (models.Filme.titulo, models.Filme.id)
+
+
+def _chave_linha(linha) -> tuple:
+    return linha.titulo, linha.id
 
 
 class MovieService:
     @staticmethod
     def create_movie(db: Session, filme: schemas.FilmeCreate) -> models.Filme:
-        elenco_str = ", ".join(filme.elenco) if filme.elenco else ""
         db_filme = models.Filme(
             titulo=filme.titulo,
             genero=filme.genero,
             duracao=filme.duracao,
             ano=filme.ano,
             diretor=filme.diretor,
-            elenco=elenco_str,
+            elenco=filme.elenco,
             sinopse=filme.sinopse,
         )
         db.add(db_filme)
+        db.flush()
+        SearchService.reindex(db, [db_filme.id])
         db.commit()
-        db.refresh(db_filme)
-        return db_filme
+        invalidar_filmes(listas=True)
+        return MovieService.get_movie(db, db_filme.id, load_favorites=True)
+
+    @staticmethod
+    def get_movie(db: Session, filme_id: UUID, load_favorites: bool = False) -> Optional[models.Filme]:
+        query = db.query(models.Filme).filter(models.Filme.id == filme_id)
+        if load_favorites:
+            # Para serializar FilmeOut; recarrega também um filme já presente na sessão
+            query = query.options(FAVORITOS_DO_FILME).populate_existing()
+        return query.first()
+
+    @staticmethod
+    def get_movie_version(db: Session, filme_id: UUID):
+        """(versao, atualizado_em) do filme, ou None se não existe."""
+        return db.execute(_versao_stmt(filme_id)).first()
+
+    @staticmethod
+    def get_movie_json(db: Session, filme_id: UUID, versao: Optional[int] = None):
+        """
+        (versao, atualizado_em, FilmeOut serializado com usuarios_favoritaram),
+        servido do cache quando possível. Com `versao`, uma entrada de outra
+        versão (ex.: escrita feita por outro worker) é descartada e recarregada.
+        """
+        chave = ("filme", filme_id)
+        entrada = filmes_cache.get(chave)
+        if entrada is None or (versao is not None and entrada[0] != versao):
+            token = filmes_cache.token(db.info.get("atraso_maximo", 0.0))
+            filme = MovieService.get_movie(db, filme_id, load_favorites=True)
+            if filme is None:
+                return None
+            entrada = (filme.versao, filme.atualizado_em, _json_filme(filme))
+            filmes_cache.set(chave, entrada, tags=(filme_id,), token=token)
+        return entrada
 
     @staticmethod
-    def get_movie(db: Session, filme_id: UUID) -> Optional[models.Filme]:
-        return db.query(models.Filme).filter(models.Filme.id == filme_id).first()
+    def list_movies_json(
+        db: Session, skip: int = 0, limit: int = 20, cursor: Optional[str] = None, ator: Optional[str] = None
+    ) -> bytes:
+        """Página da listagem já serializada; com `cursor`, no envelope FilmePagina."""
+        chave = _chave_lista(skip, limit, cursor, ator)
+        payload = filmes_cache.get(chave)
+        if payload is None:
+            token = filmes_cache.token(db.info.get("atraso_maximo", 0.0))
+            if serialization.SERIALIZACAO_RAPIDA:
+                itens, next_cursor = MovieService.list_movie_dicts(db, skip=skip, limit=limit, cursor=cursor, ator=ator)
+                filme_ids = [item["id"] for item in itens]
+                payload = serialization.pagina_json(itens, next_cursor, paginada=cursor is not None)
+            else:
+                next_cursor = None
+                if cursor is not None:
+                    filmes, next_cursor = MovieService.list_movies_keyset(db, cursor=cursor, limit=limit, ator=ator)
+                else:
+                    filmes = MovieService.list_movies(db, skip=skip, limit=limit, ator=ator)
+                filme_ids = [filme.id for filme in filmes]
+                payload = _json_lista(filmes, next_cursor, paginada=cursor is not None)
+            filmes_cache.set(chave, payload, tags=_tags_lista(filme_ids), token=token)
+        return payload
 
     @staticmethod
-    def list_movies(db: Session, skip: int = 0, limit: int = 20) -> List[models.Filme]:
-        return db.query(models.Filme).offset(skip).limit(limit).all()
+    def list_movie_dicts(
+        db: Session, skip: int = 0, limit: int = 20, cursor: Optional[str] = None, ator: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Como list_movies (ou list_movies_keyset, com `cursor`), mas a partir
+        de projeções SQL, em dicionários no formato de FilmeOut (ver app/serialization.py).
+        """
+        stmt = serialization.filmes_select(*_filtros(ator))
+        next_cursor = None
+        if cursor is not None:
+            linhas, next_cursor = paginate_keyset_rows(db, stmt, _CHAVE_LISTA, cursor, limit, _chave_linha)
+        else:
+            linhas = db.execute(stmt.offset(skip).limit(limit)).all()
+        if not linhas:
+            return [], next_cursor
+        filme_ids = [linha.id for linha in linhas]
+        elenco = db.execute(serialization.elenco_select(filme_ids)).all()
+        favoritos = db.execute(serialization.favoritos_select(filme_ids)).all()
+        return serialization.filmes_dicts(linhas, elenco, favoritos), next_cursor
 
     @staticmethod
-    def update_movie(db: Session, filme_id: UUID, filme_update: schemas.FilmeUpdate) -> Optional[models.Filme]:
+    def list_movies(db: Session, skip: int = 0, limit: int = 20, ator: Optional[str] = None) -> List[models.Filme]:
+        return db.query(models.Filme).options(FAVORITOS_DO_FILME).filter(*_filtros(ator)).offset(skip).limit(limit).all()
+
+    @staticmethod
+    def list_movies_keyset(
+        db: Session, cursor: Optional[str] = None, limit: int = 20, ator: Optional[str] = None
+    ) -> Tuple[List[models.Filme], Optional[str]]:
+        # Ordenado por (titulo, id), coberto pelo índice ix_filmes_titulo_id
+        return paginate_keyset(
+            db.query(models.Filme).options(FAVORITOS_DO_FILME).filter(*_filtros(ator)),
+            (models.Filme.titulo, models.Filme.id),
+            cursor,
+            limit,
+            lambda filme: (filme.titulo, filme.id),
+        )
+
+    @staticmethod
+    def search_movies(
+        db: Session, q: str, cursor: Optional[str] = None, limit: int = 20
+    ) -> Tuple[List[models.Filme], Optional[str]]:
+        return SearchService.search(db, q, cursor=cursor, limit=limit)
+
+    @staticmethod
+    def update_movie(
+        db: Session, filme_id: UUID, filme_update: schemas.FilmeUpdate, versoes: Optional[Set[int]] = None
+    ) -> Optional[models.Filme]:
         filme = db.query(models.Filme).filter(models.Filme.id == filme_id).first()
         if not filme:
             return None
-        for field, value in filme_update.dict(exclude_unset=True).items():
-            if field == "elenco" and value is not None:
-                setattr(filme, field, ", ".join(value))
-            elif value is not None:
+        # If-Match: só atualiza se o cliente viu a versão atual
+        check_version(filme.versao, versoes)
+        for field, value in filme_update.model_dump(exclude_unset=True).items():
+            if value is not None:
                 setattr(filme, field, value)
+        with stale_version_guard():
+            db.flush()
+        SearchService.reindex(db, [filme.id])
         db.commit()
-        db.refresh(filme)
-        return filme
+        invalidar_filmes(filme_id, listas=True)
+        return MovieService.get_movie(db, filme_id, load_favorites=True)
 
     @staticmethod
     def delete_movie(db: Session, filme_id: UUID) -> bool:
-        filme = db.query(models.Filme).filter(models.Filme.id == filme_id).first()
+        filme = db.scalars(row_for_delete_stmt(models.Filme, filme_id)).first()
         if not filme:
             return False
+        # As coleções de usuários do filme não são carregadas (lazy="raise"),
+        # então as associações são removidas diretamente nas tabelas.
+        db.execute(touch_stmt(models.Usuario, models.Usuario.id.in_(_usuarios_com_filme(filme_id))))
+        for tabela in LISTAS:
+            db.execute(delete(tabela).where(tabela.c.filme_id == filme_id))
+        db.execute(_delete_vizinhos_stmt(filme_id))
+        db.execute(movie_removed_stmt(filme_id))
+        db.execute(delete(models.FilmeRanking).where(models.FilmeRanking.filme_id == filme_id))
+        SearchService.remove(db, [filme_id])
         db.delete(filme)
-        db.commit()
+        with stale_version_guard():
+            db.commit()
+        invalidar_filmes(filme_id, listas=True)
+        return True
+
+
+class AsyncMovieService:
+    """Variante de MovieService para AsyncSession (modo DB_ASYNC)."""
+
+    @staticmethod
+    async def create_movie(db: AsyncSession, filme: schemas.FilmeCreate) -> models.Filme:
+        db_filme = models.Filme(
+            titulo=filme.titulo,
+            genero=filme.genero,
+            duracao=filme.duracao,
+            ano=filme.ano,
+            diretor=filme.diretor,
+            elenco=filme.elenco,
+            sinopse=filme.sinopse,
+        )
+        db.add(db_filme)
+        await db.flush()
+        await db.run_sync(SearchService.reindex, [db_filme.id])
+        await db.commit()
+        invalidar_filmes(listas=True)
+        return await AsyncMovieService.get_movie(db, db_filme.id, load_favorites=True)
+
+    @staticmethod
+    async def get_movie(db: AsyncSession, filme_id: UUID, load_favorites: bool = False) -> Optional[models.Filme]:
+        stmt = select(models.Filme).where(models.Filme.id == filme_id)
+        if load_favorites:
+            stmt = stmt.options(FAVORITOS_DO_FILME).execution_options(populate_existing=True)
+        return (await db.execute(stmt)).scalars().first()
+
+    @staticmethod
+    async def get_movie_version(db: AsyncSession, filme_id: UUID):
+        return (await db.execute(_versao_stmt(filme_id))).first()
+
+    @staticmethod
+    async def get_movie_json(db: AsyncSession, filme_id: UUID, versao: Optional[int] = None):
+        chave = ("filme", filme_id)
+        entrada = filmes_cache.get(chave)
+        if entrada is None or (versao is not None and entrada[0] != versao):
+            token = filmes_cache.token(db.info.get("atraso_maximo", 0.0))
+            filme = await AsyncMovieService.get_movie(db, filme_id, load_favorites=True)
+            if filme is None:
+                return None
+            entrada = (filme.versao, filme.atualizado_em, _json_filme(filme))
+            filmes_cache.set(chave, entrada, tags=(filme_id,), token=token)
+        return entrada
+
+    @staticmethod
+    async def list_movies_json(
+        db: AsyncSession, skip: int = 0, limit: int = 20, cursor: Optional[str] = None, ator: Optional[str] = None
+    ) -> bytes:
+        chave = _chave_lista(skip, limit, cursor, ator)
+        payload = filmes_cache.get(chave)
+        if payload is None:
+            token = filmes_cache.token(db.info.get("atraso_maximo", 0.0))
+            if serialization.SERIALIZACAO_RAPIDA:
+                itens, next_cursor = await AsyncMovieService.list_movie_dicts(db, skip=skip, limit=limit, cursor=cursor, ator=ator)
+                filme_ids = [item["id"] for item in itens]
+                payload = serialization.pagina_json(itens, next_cursor, paginada=cursor is not None)
+            else:
+                next_cursor = None
+                if cursor is not None:
+                    filmes, next_cursor = await AsyncMovieService.list_movies_keyset(db, cursor=cursor, limit=limit, ator=ator)
+                else:
+                    filmes = await AsyncMovieService.list_movies(db, skip=skip, limit=limit, ator=ator)
+                filme_ids = [filme.id for filme in filmes]
+                payload = _json_lista(filmes, next_cursor, paginada=cursor is not None)
+            filmes_cache.set(chave, payload, tags=_tags_lista(filme_ids), token=token)
+        return payload
+
+    @staticmethod
+    async def list_movie_dicts(
+        db: AsyncSession, skip: int = 0, limit: int = 20, cursor: Optional[str] = None, ator: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        stmt = serialization.filmes_select(*_filtros(ator))
+        next_cursor = None
+        if cursor is not None:
+            linhas, next_cursor = await paginate_keyset_rows_async(db, stmt, _CHAVE_LISTA, cursor, limit, _chave_linha)
+        else:
+            linhas = (await db.execute(stmt.offset(skip).limit(limit))).all()
+        if not linhas:
+            return [], next_cursor
+        filme_ids = [linha.id for linha in linhas]
+        elenco = (await db.execute(serialization.elenco_select(filme_ids))).all()
+        favoritos = (await db.execute(serialization.favoritos_select(filme_ids))).all()
+        return serialization.filmes_dicts(linhas, elenco, favoritos), next_cursor
+
+    @staticmethod
+    async def list_movies(db: AsyncSession, skip: int = 0, limit: int = 20, ator: Optional[str] = None) -> List[models.Filme]:
+        result = await db.execute(
+            select(models.Filme).options(FAVORITOS_DO_FILME).where(*_filtros(ator)).offset(skip).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def list_movies_keyset(
+        db: AsyncSession, cursor: Optional[str] = None, limit: int = 20, ator: Optional[str] = None
+    ) -> Tuple[List[models.Filme], Optional[str]]:
+        return await paginate_keyset_async(
+            db,
+            select(models.Filme).options(FAVORITOS_DO_FILME).where(*_filtros(ator)),
+            (models.Filme.titulo, models.Filme.id),
+            cursor,
+            limit,
+            lambda filme: (filme.titulo, filme.id),
+        )
+
+    @staticmethod
+    async def update_movie(
+        db: AsyncSession, filme_id: UUID, filme_update: schemas.FilmeUpdate, versoes: Optional[Set[int]] = None
+    ) -> Optional[models.Filme]:
+        filme = await AsyncMovieService.get_movie(db, filme_id)
+        if not filme:
+            return None
+        check_version(filme.versao, versoes)
+        for field, value in filme_update.model_dump(exclude_unset=True).items():
+            if value is not None:
+                setattr(filme, field, value)
+        with stale_version_guard():
+            await db.flush()
+        await db.run_sync(SearchService.reindex, [filme.id])
+        await db.commit()
+        invalidar_filmes(filme_id, listas=True)
+        return await AsyncMovieService.get_movie(db, filme_id, load_favorites=True)
+
+    @staticmethod
+    async def delete_movie(db: AsyncSession, filme_id: UUID) -> bool:
+        filme = (await db.scalars(row_for_delete_stmt(models.Filme, filme_id))).first()
+        if not filme:
+            return False
+        await db.execute(touch_stmt(models.Usuario, models.Usuario.id.in_(_usuarios_com_filme(filme_id))))
+        for tabela in LISTAS:
+            await db.execute(delete(tabela).where(tabela.c.filme_id == filme_id))
+        await db.execute(_delete_vizinhos_stmt(filme_id))
+        await db.execute(movie_removed_stmt(filme_id))
+        await db.execute(delete(models.FilmeRanking).where(models.FilmeRanking.filme_id == filme_id))
+        await db.run_sync(SearchService.remove, [filme_id])
+        await db.delete(filme)
+        with stale_version_guard():
+            await db.commit()
+        invalidar_filmes(filme_id, listas=True)
         return True
@@ -0,0 +1,42 @@
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app import models
+from app.pagination import paginate_keyset
+from app.services.sql_helpers import FAVORITOS_DO_FILME
+
+
+class PersonService:
+    @staticmethod
+    def get_person(db: Session, pessoa_id: UUID) -> models.Pessoa:
+        pessoa = db.get(models.Pessoa, pessoa_id)
+        if not pessoa:
+            raise HTTPException(status_code=404, detail="Pessoa não encontrada")
+        return pessoa
+
+    @staticmethod
+    def get_person_by_name(db: Session, nome: str) -> Optional[models.Pessoa]:
+        return db.query(models.Pessoa).filter(models.Pessoa.nome == nome).first()
+
+    @staticmethod
+    def list_movies(
+        db: Session, pessoa_id: UUID, cursor: Optional[str] = None, limit: int = 20
+    ) -> Tuple[List[models.Filme], Optional[str]]:
+        """Filmes em que a pessoa está no elenco, por (titulo, id) e paginados por cursor."""
+        PersonService.get_person(db, pessoa_id)
+        query = (
+            db.query(models.Filme)
+            .options(FAVORITOS_DO_FILME)
+            .join(models.FilmeElenco, models.FilmeElenco.filme_id == models.Filme.id)
+            .filter(models.FilmeElenco.pessoa_id == pessoa_id)
+        )
+        return paginate_keyset(
+            query,
+            (models.Filme.titulo, models.Filme.id),
+            cursor,
+            limit,
+            lambda filme: (filme.titulo, filme.id),
+        )
@@ -0,0 +1,121 @@
+"""
+Rankings de filmes pela média bayesiana (ponderada) das notas:
+
+    nota = (v * R + m * C) / (v + m)
+
+com R a média do filme, v o número de avaliações, C a média de todas as
+avaliações do escopo e m = RANKING_PESO_PRIOR. Um filme com poucas
+avaliações fica perto de C e só sobe à medida que acumula avaliações.
+"""
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.sql_helpers import FAVORITOS_DO_FILME
+
+# Peso da média do escopo, em "avaliações fictícias"
+RANKING_PESO_PRIOR = float(os.getenv("RANKING_PESO_PRIOR", 10))
+# Posições guardadas por ranking
+RANKING_TAMANHO = int(os.getenv("RANKING_TAMANHO", 100))
+
+GERAL = "geral"
+GENERO = "genero"
+DECADA = "decada"
+
+
+def _decada(ano: int) -> int:
+    return ano - ano % 10
+
+
+def _classificar(filmes: List[tuple]) -> List[tuple]:
+    """(filme_id, soma, total) -> [(filme_id, nota, media, total)] em ordem de classificação."""
+    soma_escopo = sum(soma for _, soma, _ in filmes)
+    total_escopo = sum(total for _, _, total in filmes)
+    media_escopo = soma_escopo / total_escopo
+    classificados = [
+        (filme_id, (soma + RANKING_PESO_PRIOR * media_escopo) / (total + RANKING_PESO_PRIOR), soma / total, total)
+        for filme_id, soma, total in filmes
+    ]
+    # Empates: mais avaliações primeiro, depois o id para uma ordem estável
+    classificados.sort(key=lambda item: (-item[1], -item[3], str(item[0])))
+    return classificados[:RANKING_TAMANHO]
+
+
+class RankingService:
+    @staticmethod
+    def rebuild(db: Session) -> Dict[str, int]:
+        """
+        Recalcula todos os rankings numa transação (leitores continuam vendo
+        os anteriores até o commit). Lê só `filme_estatisticas`, uma linha
+        por filme avaliado, então pode rodar com frequência (ex.: via cron).
+        """
+        agora = db.execute(select(func.now())).scalar()
+        escopos = defaultdict(list)
+        linhas = db.execute(
+            select(models.Filme.id, models.Filme.genero, models.Filme.ano, models.FilmeEstatisticas.soma, models.FilmeEstatisticas.total)
+            .join(models.FilmeEstatisticas, models.FilmeEstatisticas.filme_id == models.Filme.id)
+            .where(models.FilmeEstatisticas.total > 0)
+        )
+        for filme_id, genero, ano, soma, total in linhas:
+            item = (filme_id, soma, total)
+            escopos[(GERAL, "")].append(item)
+            escopos[(GENERO, genero)].append(item)
+            escopos[(DECADA, str(_decada(ano)))].append(item)
+
+        db.execute(delete(models.FilmeRanking))
+        registros = [
+            {
+                "escopo": escopo,
+                "chave": chave,
+                "posicao": posicao,
+                "filme_id": filme_id,
+                "nota": nota,
+                "media": media,
+                "total": total,
+                "calculado_em": agora,
+            }
+            for (escopo, chave), filmes in escopos.items()
+            for posicao, (filme_id, nota, media, total) in enumerate(_classificar(filmes), start=1)
+        ]
+        if registros:
+            db.execute(insert(models.FilmeRanking.__table__), registros)
+        db.commit()
+        return {"rankings": len(escopos), "posicoes": len(registros)}
+
+    @staticmethod
+    def get_ranking(
+        db: Session, genero: Optional[str] = None, decada: Optional[int] = None, limit: int = 20
+    ) -> List[dict]:
+        if genero is not None and decada is not None:
+            raise HTTPException(status_code=400, detail="Informe genero ou decada, não ambos")
+        if genero is not None:
+            escopo, chave = GENERO, genero
+        elif decada is not None:
+            escopo, chave = DECADA, str(_decada(decada))
+        else:
+            escopo, chave = GERAL, ""
+        posicoes = db.execute(
+            select(models.FilmeRanking)
+            .where(models.FilmeRanking.escopo == escopo, models.FilmeRanking.chave == chave)
+            .order_by(models.FilmeRanking.posicao)
+            .limit(limit)
+        ).scalars().all()
+        if not posicoes:
+            return []
+        filmes: Dict[UUID, models.Filme] = {
+            filme.id: filme
+            for filme in db.scalars(
+                select(models.Filme).options(FAVORITOS_DO_FILME).where(models.Filme.id.in_([p.filme_id for p in posicoes]))
+            )
+        }
+        return [
+            {"posicao": p.posicao, "filme": filmes[p.filme_id], "nota": round(p.nota, 4), "media": round(p.media, 4), "total": p.total}
+            for p in posicoes
+            if p.filme_id in filmes
+        ]
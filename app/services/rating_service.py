@@ -1,10 +1,110 @@
-from typing import List, Optional
-from uuid import UUID
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
 
 from fastapi import HTTPException, status
+from sqlalchemy import bindparam, case, delete, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models, schemas
+from app.cache import filmes_cache, invalidar_filmes
+from app.db_helpers import dialect_insert
+from app.etag import check_version, stale_version_guard
+from app.pagination import paginate_keyset, paginate_keyset_async
+from app.services.sql_helpers import row_for_delete_stmt, touch_stmt
+
+NOTAS = range(11)
+
+# Máximo de itens aceitos por POST /avaliacoes/lote
+MAX_ITENS_LOTE = 5000
+
+# Rodadas INSERT/SELECT do lote antes de desistir com 409 (ver _upsert_ratings)
+TENTATIVAS_LOTE = 3
+
+
+def nota_bucket(nota: float) -> int:
+    return min(max(int(round(nota)), 0), 10)
+
+
+def stats_delta_stmt(db, filme_id: UUID, total: int = 0, soma: float = 0.0, notas: Optional[Dict[int, int]] = None):
+    """
+    Upsert que soma um delta ao agregado do filme (criando-o se não existir).
+    Os incrementos são feitos no próprio SQL, então escritas concorrentes
+    no mesmo filme não perdem atualizações. Retorna None se o delta é nulo.
+    """
+    tabela = models.FilmeEstatisticas.__table__
+    valores = {"filme_id": filme_id, "total": total, "soma": soma}
+    valores.update({f"nota_{nota}": 0 for nota in NOTAS})
+    for nota, delta in (notas or {}).items():
+        valores[f"nota_{nota}"] += delta
+    alterados = [coluna for coluna, valor in valores.items() if coluna != "filme_id" and valor]
+    if not alterados:
+        return None
+    stmt = dialect_insert(db, tabela).values(**valores)
+    return stmt.on_conflict_do_update(
+        index_elements=[tabela.c.filme_id],
+        set_={coluna: tabela.c[coluna] + stmt.excluded[coluna] for coluna in alterados},
+    )
+
+
+def stats_deltas_stmt(db):
+    """
+    Versão de stats_delta_stmt para executemany: incrementa todas as colunas,
+    com um conjunto de parâmetros por filme (ver empty_stats_delta).
+    """
+    tabela = models.FilmeEstatisticas.__table__
+    stmt = dialect_insert(db, tabela)
+    colunas = ["total", "soma"] + [f"nota_{nota}" for nota in NOTAS]
+    return stmt.on_conflict_do_update(
+        index_elements=[tabela.c.filme_id],
+        set_={coluna: tabela.c[coluna] + stmt.excluded[coluna] for coluna in colunas},
+    )
+
+
+def empty_stats_delta(filme_id: UUID) -> Dict:
+    delta = {"filme_id": filme_id, "total": 0, "soma": 0.0}
+    delta.update({f"nota_{nota}": 0 for nota in NOTAS})
+    return delta
+
+
+def stats_without_user_stmt(usuario_id: UUID):
+    """Desconta dos agregados, em um único UPDATE, todas as avaliações de um usuário."""
+    tabela = models.FilmeEstatisticas.__table__
+    avaliacoes = (
+        select(models.Avaliacao.filme_id, models.Avaliacao.nota)
+        .where(models.Avaliacao.usuario_id == usuario_id)
+        .subquery()
+    )
+    valores = {"total": tabela.c.total - 1, "soma": tabela.c.soma - avaliacoes.c.nota}
+    for nota in NOTAS:
+        valores[f"nota_{nota}"] = tabela.c[f"nota_{nota}"] - case(
+            (func.round(avaliacoes.c.nota) == nota, 1), else_=0
+        )
+    return update(tabela).where(tabela.c.filme_id == avaliacoes.c.filme_id).values(**valores)
+
+
+def rebuild_stats_stmts(filme_ids: Optional[Iterable[UUID]] = None):
+    """DELETE + INSERT ... SELECT que recalculam os agregados a partir de `avaliacoes`."""
+    tabela = models.FilmeEstatisticas.__table__
+    nota = models.Avaliacao.nota
+    agregado = select(
+        models.Avaliacao.filme_id,
+        func.count(),
+        func.sum(nota),
+        *[func.sum(case((func.round(nota) == n, 1), else_=0)) for n in NOTAS],
+    ).group_by(models.Avaliacao.filme_id)
+    remover = delete(tabela)
+    if filme_ids is not None:
+        filme_ids = list(filme_ids)
+        agregado = agregado.where(models.Avaliacao.filme_id.in_(filme_ids))
+        remover = remover.where(tabela.c.filme_id.in_(filme_ids))
+    colunas = ["filme_id", "total", "soma"] + [f"nota_{n}" for n in NOTAS]
+    return remover, insert(tabela).from_select(colunas, agregado)
+
+
+def _versao_stmt(rating_id: UUID):
+    return select(models.Avaliacao.versao, models.Avaliacao.atualizado_em).where(models.Avaliacao.id == rating_id)
 
 
 class RatingService:
@@ -35,10 +135,147 @@ class RatingService:
             filme_id=rating_data.filme_id
         )
         db.add(nova_avaliacao)
+        db.execute(stats_delta_stmt(
+            db, rating_data.filme_id, total=1, soma=rating_data.nota, notas={nota_bucket(rating_data.nota): 1}
+        ))
+        db.execute(touch_stmt(models.Filme, models.Filme.id == rating_data.filme_id))
         db.commit()
+        invalidar_filmes(rating_data.filme_id)
         db.refresh(nova_avaliacao)
         return nova_avaliacao
 
+    @staticmethod
+    def upsert_ratings(db: Session, itens: List[schemas.AvaliacaoCreate]) -> Dict:
+        """
+        Grava um lote de avaliações: um INSERT ... ON CONFLICT (usuario_id,
+        filme_id) DO NOTHING RETURNING cria as novas, e as que já existiam
+        são travadas, lidas e têm nota e comentário substituídos. Criada ou
+        atualizada é decidido pelo que o próprio INSERT gravou, não por uma
+        leitura anterior, então escritas concorrentes não desviam os agregados.
+        Usuários e filmes são verificados com uma consulta por tabela, e os
+        agregados dos filmes recebem um único upsert incremental. Retorna o
+        status de cada item do lote.
+        """
+        if len(itens) > MAX_ITENS_LOTE:
+            raise HTTPException(status_code=413, detail=f"O lote aceita no máximo {MAX_ITENS_LOTE} avaliações")
+        for _ in range(2):
+            try:
+                return RatingService._upsert_ratings(db, itens)
+            except IntegrityError:
+                # Usuário ou filme removido entre a verificação e o INSERT:
+                # repete uma vez, já enxergando a remoção
+                db.rollback()
+        raise HTTPException(status_code=409, detail="Conflito ao gravar o lote de avaliações; tente novamente")
+
+    @staticmethod
+    def _upsert_ratings(db: Session, itens: List[schemas.AvaliacaoCreate]) -> Dict:
+        resultados: List[Dict] = [{"indice": indice} for indice in range(len(itens))]
+        # Se o mesmo par aparece mais de uma vez, vale o último item
+        ultimo = {(item.usuario_id, item.filme_id): indice for indice, item in enumerate(itens)}
+        usuarios = set(db.scalars(
+            select(models.Usuario.id).where(models.Usuario.id.in_({item.usuario_id for item in itens}))
+        ))
+        filmes = set(db.scalars(
+            select(models.Filme.id).where(models.Filme.id.in_({item.filme_id for item in itens}))
+        ))
+        pares = {}
+        for indice, item in enumerate(itens):
+            par = (item.usuario_id, item.filme_id)
+            if item.usuario_id not in usuarios:
+                resultados[indice].update(status="erro", erro="Usuário não encontrado")
+            elif item.filme_id not in filmes:
+                resultados[indice].update(status="erro", erro="Filme não encontrado")
+            elif ultimo[par] != indice:
+                resultados[indice].update(status="ignorada", erro="Substituída por item posterior do mesmo lote")
+            else:
+                pares[par] = indice
+
+        if pares:
+            tabela = models.Avaliacao.__table__
+            deltas: Dict[UUID, Dict] = {}
+            pendentes = dict(pares)
+            for _ in range(TENTATIVAS_LOTE):
+                # Criadas: o RETURNING do INSERT diz, linha a linha, o que foi
+                # de fato inserido por esta transação
+                inseridas = db.execute(
+                    dialect_insert(db, tabela)
+                    .on_conflict_do_nothing(index_elements=["usuario_id", "filme_id"])
+                    .returning(tabela.c.id, tabela.c.usuario_id, tabela.c.filme_id),
+                    [
+                        {
+                            "id": uuid4(),
+                            "usuario_id": usuario_id,
+                            "filme_id": filme_id,
+                            "nota": itens[indice].nota,
+                            "comentario": itens[indice].comentario,
+                        }
+                        for (usuario_id, filme_id), indice in pendentes.items()
+                    ],
+                )
+                for avaliacao_id, usuario_id, filme_id in inseridas:
+                    indice = pendentes.pop((usuario_id, filme_id))
+                    item = itens[indice]
+                    delta = deltas.setdefault(filme_id, empty_stats_delta(filme_id))
+                    delta["total"] += 1
+                    delta["soma"] += item.nota
+                    delta[f"nota_{nota_bucket(item.nota)}"] += 1
+                    resultados[indice].update(status="criada", id=avaliacao_id)
+                if not pendentes:
+                    break
+                # As demais já existiam, inclusive as gravadas por outra transação
+                # depois do início desta: a nota anterior é lida com a linha travada
+                atualizacoes = []
+                for avaliacao_id, usuario_id, filme_id, nota_antiga in db.execute(
+                    select(tabela.c.id, tabela.c.usuario_id, tabela.c.filme_id, tabela.c.nota)
+                    .where(tuple_(tabela.c.usuario_id, tabela.c.filme_id).in_(list(pendentes)))
+                    .with_for_update()
+                ):
+                    indice = pendentes.pop((usuario_id, filme_id))
+                    item = itens[indice]
+                    delta = deltas.setdefault(filme_id, empty_stats_delta(filme_id))
+                    delta["soma"] += item.nota - nota_antiga
+                    delta[f"nota_{nota_bucket(item.nota)}"] += 1
+                    delta[f"nota_{nota_bucket(nota_antiga)}"] -= 1
+                    resultados[indice].update(status="atualizada", id=avaliacao_id)
+                    atualizacoes.append({"_id": avaliacao_id, "_nota": item.nota, "_comentario": item.comentario})
+                if atualizacoes:
+                    db.execute(
+                        update(tabela)
+                        .where(tabela.c.id == bindparam("_id"))
+                        .values(
+                            nota=bindparam("_nota"),
+                            comentario=bindparam("_comentario"),
+                            versao=tabela.c.versao + 1,
+                            atualizado_em=func.now(),
+                        ),
+                        atualizacoes,
+                    )
+                if not pendentes:
+                    break
+                # O que sobrou foi removido por outra transação entre o INSERT e o
+                # SELECT: volta a ser candidato a criação
+            else:
+                db.rollback()
+                raise HTTPException(status_code=409, detail="Conflito ao gravar o lote de avaliações; tente novamente")
+            db.execute(stats_deltas_stmt(db), list(deltas.values()))
+            db.execute(touch_stmt(models.Filme, models.Filme.id.in_(list(deltas))))
+        db.commit()
+        invalidar_filmes(*{itens[indice].filme_id for indice in pares.values()})
+
+        contagem = {estado: sum(1 for r in resultados if r["status"] == estado) for estado in ("criada", "atualizada", "ignorada", "erro")}
+        return {
+            "criadas": contagem["criada"],
+            "atualizadas": contagem["atualizada"],
+            "ignoradas": contagem["ignorada"],
+            "erros": contagem["erro"],
+            "itens": resultados,
+        }
+
+    @staticmethod
+    def get_rating_version(db: Session, rating_id: UUID):
+        """(versao, atualizado_em) da avaliação, ou None se não existe."""
+        return db.execute(_versao_stmt(rating_id)).first()
+
     @staticmethod
     def get_rating(db: Session, rating_id: UUID) -> Optional[models.Avaliacao]:
         avaliacao = db.query(models.Avaliacao).filter(models.Avaliacao.id == rating_id).first()
@@ -51,22 +288,179 @@ class RatingService:
         return db.query(models.Avaliacao).offset(skip).limit(limit).all()
 
     @staticmethod
-    def update_rating(db: Session, rating_id: UUID, rating_update: schemas.AvaliacaoUpdate) -> models.Avaliacao:
+    def list_ratings_keyset(
+        db: Session, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[models.Avaliacao], Optional[str]]:
+        return paginate_keyset(
+            db.query(models.Avaliacao),
+            (models.Avaliacao.id,),
+            cursor,
+            limit,
+            lambda avaliacao: (avaliacao.id,),
+        )
+
+    @staticmethod
+    def update_rating(
+        db: Session, rating_id: UUID, rating_update: schemas.AvaliacaoUpdate, versoes: Optional[Set[int]] = None
+    ) -> models.Avaliacao:
         avaliacao = db.query(models.Avaliacao).filter(models.Avaliacao.id == rating_id).first()
         if not avaliacao:
             raise HTTPException(status_code=404, detail="Avaliação não encontrada")
+        # If-Match: só atualiza se o cliente viu a versão atual
+        check_version(avaliacao.versao, versoes)
         if rating_update.nota is not None:
+            stmt = RatingService._nota_change_stmt(db, avaliacao, rating_update.nota)
+            if stmt is not None:
+                db.execute(stmt)
+                db.execute(touch_stmt(models.Filme, models.Filme.id == avaliacao.filme_id))
             avaliacao.nota = rating_update.nota
         if rating_update.comentario is not None:
             avaliacao.comentario = rating_update.comentario
-        db.commit()
+        with stale_version_guard():
+            db.commit()
+        invalidar_filmes(avaliacao.filme_id)
         db.refresh(avaliacao)
         return avaliacao
 
     @staticmethod
     def delete_rating(db: Session, rating_id: UUID) -> None:
-        avaliacao = db.query(models.Avaliacao).filter(models.Avaliacao.id == rating_id).first()
+        avaliacao = db.scalars(row_for_delete_stmt(models.Avaliacao, rating_id)).first()
         if not avaliacao:
             raise HTTPException(status_code=404, detail="Avaliação não encontrada")
+        db.execute(stats_delta_stmt(
+            db, avaliacao.filme_id, total=-1, soma=-avaliacao.nota, notas={nota_bucket(avaliacao.nota): -1}
+        ))
+        db.execute(touch_stmt(models.Filme, models.Filme.id == avaliacao.filme_id))
         db.delete(avaliacao)
+        with stale_version_guard():
+            db.commit()
+        invalidar_filmes(avaliacao.filme_id)
+
+    @staticmethod
+    def rebuild_stats(db: Session, filme_ids: Optional[Iterable[UUID]] = None) -> int:
+        """
+        Reconstrói os agregados de FilmeEstatisticas a partir de `avaliacoes`
+        (todos os filmes, ou só os informados). Retorna quantos foram gravados.
+        """
+        if filme_ids is not None:
+            filme_ids = list(filme_ids)
+        remover, inserir = rebuild_stats_stmts(filme_ids)
+        db.execute(remover)
+        result = db.execute(inserir)
+        escopo = [] if filme_ids is None else [models.Filme.id.in_(filme_ids)]
+        db.execute(touch_stmt(models.Filme, *escopo))
         db.commit()
+        if filme_ids is None:
+            filmes_cache.clear()
+        else:
+            invalidar_filmes(*filme_ids)
+        return result.rowcount
+
+    @staticmethod
+    def _nota_change_stmt(db, avaliacao: models.Avaliacao, nova_nota: float):
+        antiga, nova = nota_bucket(avaliacao.nota), nota_bucket(nova_nota)
+        notas = {antiga: -1, nova: 1} if antiga != nova else {}
+        return stats_delta_stmt(db, avaliacao.filme_id, soma=nova_nota - avaliacao.nota, notas=notas)
+
+
+class AsyncRatingService:
+    """Variante de RatingService para AsyncSession (modo DB_ASYNC)."""
+
+    @staticmethod
+    async def create_rating(db: AsyncSession, rating_data: schemas.AvaliacaoCreate) -> models.Avaliacao:
+        # Verifica se o usuário existe
+        if await db.get(models.Usuario, rating_data.usuario_id) is None:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        # Verifica se o filme existe
+        if await db.get(models.Filme, rating_data.filme_id) is None:
+            raise HTTPException(status_code=404, detail="Filme não encontrado")
+        # Verifica se já existe avaliação desse usuário para esse filme
+        avaliacao_existente = (await db.execute(
+            select(models.Avaliacao.id).where(
+                models.Avaliacao.usuario_id == rating_data.usuario_id,
+                models.Avaliacao.filme_id == rating_data.filme_id
+            )
+        )).first()
+        if avaliacao_existente:
+            raise HTTPException(
+                status_code=400,
+                detail="Avaliação já existe para este usuário e filme"
+            )
+        nova_avaliacao = models.Avaliacao(
+            nota=rating_data.nota,
+            comentario=rating_data.comentario,
+            usuario_id=rating_data.usuario_id,
+            filme_id=rating_data.filme_id
+        )
+        db.add(nova_avaliacao)
+        await db.execute(stats_delta_stmt(
+            db, rating_data.filme_id, total=1, soma=rating_data.nota, notas={nota_bucket(rating_data.nota): 1}
+        ))
+        await db.execute(touch_stmt(models.Filme, models.Filme.id == rating_data.filme_id))
+        await db.commit()
+        invalidar_filmes(rating_data.filme_id)
+        await db.refresh(nova_avaliacao)
+        return nova_avaliacao
+
+    @staticmethod
+    async def get_rating_version(db: AsyncSession, rating_id: UUID):
+        return (await db.execute(_versao_stmt(rating_id))).first()
+
+    @staticmethod
+    async def get_rating(db: AsyncSession, rating_id: UUID) -> models.Avaliacao:
+        avaliacao = await db.get(models.Avaliacao, rating_id)
+        if not avaliacao:
+            raise HTTPException(status_code=404, detail="Avaliação não encontrada")
+        return avaliacao
+
+    @staticmethod
+    async def list_ratings(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Avaliacao]:
+        result = await db.execute(select(models.Avaliacao).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def list_ratings_keyset(
+        db: AsyncSession, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[models.Avaliacao], Optional[str]]:
+        return await paginate_keyset_async(
+            db,
+            select(models.Avaliacao),
+            (models.Avaliacao.id,),
+            cursor,
+            limit,
+            lambda avaliacao: (avaliacao.id,),
+        )
+
+    @staticmethod
+    async def update_rating(
+        db: AsyncSession, rating_id: UUID, rating_update: schemas.AvaliacaoUpdate, versoes: Optional[Set[int]] = None
+    ) -> models.Avaliacao:
+        avaliacao = await AsyncRatingService.get_rating(db, rating_id)
+        check_version(avaliacao.versao, versoes)
+        if rating_update.nota is not None:
+            stmt = RatingService._nota_change_stmt(db, avaliacao, rating_update.nota)
+            if stmt is not None:
+                await db.execute(stmt)
+                await db.execute(touch_stmt(models.Filme, models.Filme.id == avaliacao.filme_id))
+            avaliacao.nota = rating_update.nota
+        if rating_update.comentario is not None:
+            avaliacao.comentario = rating_update.comentario
+        with stale_version_guard():
+            await db.commit()
+        invalidar_filmes(avaliacao.filme_id)
+        await db.refresh(avaliacao)
+        return avaliacao
+
+    @staticmethod
+    async def delete_rating(db: AsyncSession, rating_id: UUID) -> None:
+        avaliacao = (await db.scalars(row_for_delete_stmt(models.Avaliacao, rating_id))).first()
+        if not avaliacao:
+            raise HTTPException(status_code=404, detail="Avaliação não encontrada")
+        await db.execute(stats_delta_stmt(
+            db, avaliacao.filme_id, total=-1, soma=-avaliacao.nota, notas={nota_bucket(avaliacao.nota): -1}
+        ))
+        await db.execute(touch_stmt(models.Filme, models.Filme.id == avaliacao.filme_id))
+        await db.delete(avaliacao)
+        with stale_version_guard():
+            await db.commit()
+        invalidar_filmes(avaliacao.filme_id)
@@ -0,0 +1,270 @@
+"""
+Recomendações por filtragem colaborativa item a item.
+
+As similaridades entre filmes são calculadas fora das requisições
+(`python -m app.cli atualizar-recomendacoes`) a partir de `avaliacoes`, e os
+vizinhos mais próximos de cada filme ficam em `filme_vizinhos`. A rota de
+recomendações só agrega, em uma consulta, os vizinhos dos filmes que o
+usuário avaliou.
+"""
+import os
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from fastapi import HTTPException
+from scipy import sparse
+from sqlalchemy import delete, func, insert, or_, select, tuple_, union
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.sql_helpers import FAVORITOS_DO_FILME, copy_rows
+
+# Vizinhos guardados por filme
+VIZINHOS_POR_FILME = int(os.getenv("RECOMENDACAO_VIZINHOS", 50))
+# Pares de filmes com menos avaliadores em comum não são considerados similares
+MIN_COAVALIADORES = int(os.getenv("RECOMENDACAO_MIN_COAVALIADORES", 2))
+# Encolhimento: a similaridade é multiplicada por n / (n + ENCOLHIMENTO), com n
+# avaliadores em comum, para que poucos usuários não produzam similaridade máxima
+ENCOLHIMENTO = float(os.getenv("RECOMENDACAO_ENCOLHIMENTO", 10))
+# Abaixo disso a similaridade é tratada como nula (ruído de ponto flutuante)
+SIMILARIDADE_MINIMA = 1e-6
+
+# Células da matriz densa de similaridades calculada por lote (~32 MB em float64)
+CELULAS_POR_LOTE = 4_000_000
+# Avaliações lidas do banco por vez
+LOTE_LEITURA = 50_000
+# Parâmetros por instrução no IN (abaixo do limite do SQLite)
+BLOCO_IDS = 1000
+# O incremental recalcula os filmes alterados desde a última execução menos
+# esta margem: transações longas gravam o now() do seu início
+MARGEM_INCREMENTAL = timedelta(minutes=5)
+# Com mais filmes alterados que esta fração, o incremental refaz tudo
+FRACAO_MAXIMA_INCREMENTAL = 0.2
+
+
+class _Matriz:
+    """Avaliações como matrizes esparsas filme × usuário (linhas) e usuário × filme."""
+
+    def __init__(self, filmes: List[UUID], centradas: sparse.csr_matrix, presenca: sparse.csr_matrix):
+        self.filmes = filmes
+        self.indice = {filme_id: posicao for posicao, filme_id in enumerate(filmes)}
+        # Colunas normalizadas: o produto escalar entre filmes é o cosseno
+        normas = np.sqrt(np.asarray(centradas.multiply(centradas).sum(axis=0)).ravel())
+        inversas = np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0)
+        normalizadas = (centradas @ sparse.diags(inversas)).tocsr()
+        self._x = normalizadas
+        self._xt = normalizadas.T.tocsr()
+        self._b = presenca
+        self._bt = presenca.T.tocsr()
+
+    def __len__(self) -> int:
+        return len(self.filmes)
+
+    def similaridades(self, posicoes: np.ndarray) -> np.ndarray:
+        """Similaridade dos filmes em `posicoes` com todos os filmes (matriz densa)."""
+        similaridade = (self._xt[posicoes] @ self._x).toarray()
+        apoio = (self._bt[posicoes] @ self._b).toarray()
+        similaridade *= np.divide(apoio, apoio + ENCOLHIMENTO, out=np.zeros_like(apoio), where=apoio > 0)
+        similaridade[(apoio < MIN_COAVALIADORES) | (similaridade < SIMILARIDADE_MINIMA)] = 0
+        similaridade[np.arange(len(posicoes)), posicoes] = 0
+        return similaridade
+
+    def lotes(self, posicoes: np.ndarray):
+        tamanho = max(1, CELULAS_POR_LOTE // max(1, len(self)))
+        for inicio in range(0, len(posicoes), tamanho):
+            lote = posicoes[inicio:inicio + tamanho]
+            yield lote, self.similaridades(lote)
+
+
+def _carregar(db: Session) -> Optional[_Matriz]:
+    usuarios: Dict[UUID, int] = {}
+    filmes: Dict[UUID, int] = {}
+    linhas: List[int] = []
+    colunas: List[int] = []
+    notas: List[float] = []
+    stmt = select(models.Avaliacao.usuario_id, models.Avaliacao.filme_id, models.Avaliacao.nota)
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=LOTE_LEITURA))
+    try:
+        for particao in result.partitions():
+            for usuario_id, filme_id, nota in particao:
+                linhas.append(usuarios.setdefault(usuario_id, len(usuarios)))
+                colunas.append(filmes.setdefault(filme_id, len(filmes)))
+                notas.append(nota)
+    finally:
+        result.close()
+    if not notas:
+        return None
+    linhas = np.asarray(linhas, dtype=np.int64)
+    colunas = np.asarray(colunas, dtype=np.int64)
+    notas = np.asarray(notas, dtype=np.float64)
+    forma = (len(usuarios), len(filmes))
+    # Cada nota menos a média do filme (correlação entre filmes). Centrar pela
+    # média do filme, e não do usuário, faz uma avaliação nova mudar só os
+    # pares que envolvem o filme avaliado, o que permite o incremental.
+    medias = np.bincount(colunas, weights=notas, minlength=forma[1]) / np.bincount(colunas, minlength=forma[1])
+    centradas = sparse.csr_matrix((notas - medias[colunas], (linhas, colunas)), shape=forma)
+    presenca = sparse.csr_matrix((np.ones_like(notas), (linhas, colunas)), shape=forma)
+    return _Matriz(list(filmes), centradas, presenca)
+
+
+def _top_k(similaridade: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, similaridade.shape[1])
+    colunas = np.argpartition(-similaridade, k - 1, axis=1)[:, :k]
+    return colunas, np.take_along_axis(similaridade, colunas, axis=1)
+
+
+def _blocos(ids: Sequence[UUID]):
+    ids = list(ids)
+    for inicio in range(0, len(ids), BLOCO_IDS):
+        yield ids[inicio:inicio + BLOCO_IDS]
+
+
+def _gravar(db: Session, linhas: List[dict]) -> None:
+    if not linhas:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        copy_rows(db, models.FilmeVizinho.__table__, linhas)
+    else:
+        db.execute(insert(models.FilmeVizinho.__table__), linhas)
+
+
+def _recomendacoes_stmt(usuario_id: UUID, limit: int):
+    avaliacoes = models.Avaliacao
+    vizinhos = models.FilmeVizinho
+    minhas = select(avaliacoes.filme_id, avaliacoes.nota).where(avaliacoes.usuario_id == usuario_id).subquery()
+    media = select(func.avg(avaliacoes.nota)).where(avaliacoes.usuario_id == usuario_id).scalar_subquery()
+    vistos = union(
+        select(avaliacoes.filme_id).where(avaliacoes.usuario_id == usuario_id),
+        select(models.usuario_filmes_assistidos.c.filme_id).where(models.usuario_filmes_assistidos.c.usuario_id == usuario_id),
+    )
+    # Nota prevista: média do usuário mais os desvios das notas dele nos
+    # filmes vizinhos, ponderados pela similaridade
+    nota_prevista = (media + func.sum(vizinhos.similaridade * (minhas.c.nota - media)) / func.sum(vizinhos.similaridade))
+    return (
+        select(vizinhos.vizinho_id, nota_prevista.label("nota_prevista"))
+        .join(minhas, minhas.c.filme_id == vizinhos.filme_id)
+        .where(vizinhos.vizinho_id.not_in(vistos))
+        .group_by(vizinhos.vizinho_id)
+        .order_by(nota_prevista.desc(), func.sum(vizinhos.similaridade).desc(), vizinhos.vizinho_id)
+        .limit(limit)
+    )
+
+
+class RecommendationService:
+    @staticmethod
+    def recommend(db: Session, usuario_id: UUID, limit: int = 20) -> List[dict]:
+        """
+        Filmes ainda não avaliados nem marcados como assistidos, ordenados pela
+        nota prevista. Sem avaliações do usuário (ou antes da primeira
+        atualização dos vizinhos) a lista é vazia.
+        """
+        if db.get(models.Usuario, usuario_id) is None:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        previstas = db.execute(_recomendacoes_stmt(usuario_id, limit)).all()
+        if not previstas:
+            return []
+        filmes = {
+            filme.id: filme
+            for filme in db.scalars(
+                select(models.Filme).options(FAVORITOS_DO_FILME).where(models.Filme.id.in_([linha.vizinho_id for linha in previstas]))
+            )
+        }
+        return [
+            {"filme": filmes[linha.vizinho_id], "nota_prevista": round(float(linha.nota_prevista), 4)}
+            for linha in previstas
+            if linha.vizinho_id in filmes
+        ]
+
+    @staticmethod
+    def refresh_neighbors(db: Session, completo: bool = False) -> Dict:
+        """
+        Atualiza `filme_vizinhos`. Por padrão é incremental: só os filmes
+        alterados desde a última execução (toda escrita de avaliação incrementa
+        a versão do filme) têm a lista refeita, e entram como candidatos nas
+        listas dos demais. Vizinhos que perderam similaridade saem dessas
+        listas sem que a vaga seja preenchida até a próxima execução completa.
+        """
+        agora = db.execute(select(func.now())).scalar()
+        ultima = None if completo else db.execute(select(func.max(models.FilmeVizinho.calculado_em))).scalar()
+        matriz = _carregar(db)
+        alterados = None
+        if ultima is not None and matriz is not None:
+            alterados = set(db.scalars(
+                select(models.Filme.id).where(models.Filme.atualizado_em >= ultima - MARGEM_INCREMENTAL)
+            ))
+            if len(alterados) > FRACAO_MAXIMA_INCREMENTAL * len(matriz):
+                alterados = None
+
+        if alterados is None:
+            db.execute(delete(models.FilmeVizinho))
+            gravados = RecommendationService._recalcular_completo(db, matriz, agora) if matriz else 0
+            db.commit()
+            return {"modo": "completo", "filmes": len(matriz) if matriz else 0, "vizinhos": gravados}
+
+        gravados = RecommendationService._recalcular_alterados(db, matriz, alterados, agora)
+        db.commit()
+        return {"modo": "incremental", "filmes": len(alterados), "vizinhos": gravados}
+
+    @staticmethod
+    def _recalcular_completo(db: Session, matriz: _Matriz, agora) -> int:
+        gravados = 0
+        for lote, similaridade in matriz.lotes(np.arange(len(matriz))):
+            colunas, valores = _top_k(similaridade, VIZINHOS_POR_FILME)
+            linhas = [
+                {"filme_id": matriz.filmes[origem], "vizinho_id": matriz.filmes[destino], "similaridade": float(valor), "calculado_em": agora}
+                for origem, destinos, sims in zip(lote, colunas, valores)
+                for destino, valor in zip(destinos, sims)
+                if valor > 0
+            ]
+            _gravar(db, linhas)
+            gravados += len(linhas)
+        return gravados
+
+    @staticmethod
+    def _recalcular_alterados(db: Session, matriz: _Matriz, alterados: set, agora) -> int:
+        vizinho = models.FilmeVizinho
+        for bloco in _blocos(alterados):
+            db.execute(delete(vizinho).where(or_(vizinho.filme_id.in_(bloco), vizinho.vizinho_id.in_(bloco))))
+
+        # Menor similaridade das listas já cheias: candidatos abaixo dela não entram
+        limiar = np.zeros(len(matriz))
+        for filme_id, minima, total in db.execute(
+            select(vizinho.filme_id, func.min(vizinho.similaridade), func.count()).group_by(vizinho.filme_id)
+        ):
+            posicao = matriz.indice.get(filme_id)
+            if posicao is not None and total >= VIZINHOS_POR_FILME:
+                limiar[posicao] = minima
+
+        posicoes = np.array(sorted(matriz.indice[filme_id] for filme_id in alterados if filme_id in matriz.indice), dtype=np.int64)
+        eh_alterado = np.zeros(len(matriz), dtype=bool)
+        eh_alterado[posicoes] = True
+        gravados = 0
+        for lote, similaridade in matriz.lotes(posicoes):
+            # Lista completa dos filmes alterados
+            colunas, valores = _top_k(similaridade, VIZINHOS_POR_FILME)
+            linhas = [
+                {"filme_id": matriz.filmes[origem], "vizinho_id": matriz.filmes[destino], "similaridade": float(valor), "calculado_em": agora}
+                for origem, destinos, sims in zip(lote, colunas, valores)
+                for destino, valor in zip(destinos, sims)
+                if valor > 0
+            ]
+            # A similaridade é simétrica: o filme alterado é candidato na lista dos demais
+            candidatos = (similaridade > limiar) & (similaridade > 0) & ~eh_alterado
+            for linha_lote, destino in zip(*np.nonzero(candidatos)):
+                linhas.append({
+                    "filme_id": matriz.filmes[destino],
+                    "vizinho_id": matriz.filmes[lote[linha_lote]],
+                    "similaridade": float(similaridade[linha_lote, destino]),
+                    "calculado_em": agora,
+                })
+            _gravar(db, linhas)
+            gravados += len(linhas)
+
+        # Corta as listas que passaram de VIZINHOS_POR_FILME
+        posicao = func.row_number().over(partition_by=vizinho.filme_id, order_by=vizinho.similaridade.desc()).label("posicao")
+        ranking = select(vizinho.filme_id, vizinho.vizinho_id, posicao).subquery()
+        excedentes = select(ranking.c.filme_id, ranking.c.vizinho_id).where(ranking.c.posicao > VIZINHOS_POR_FILME)
+        db.execute(delete(vizinho).where(tuple_(vizinho.filme_id, vizinho.vizinho_id).in_(excedentes)))
+        return gravados
@@ -0,0 +1,131 @@
+import os
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from dotenv import load_dotenv
+from sqlalchemy import Float, cast, column, delete, func, insert, literal_column, select, table, update
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Session
+
+from app import models
+from app.pagination import paginate_keyset
+from app.services.sql_helpers import FAVORITOS_DO_FILME
+
+load_dotenv()
+
+# Configuração de text search do PostgreSQL usada no índice e nas consultas
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "portuguese")
+
+# Tabela virtual FTS5 usada como índice quando o banco é SQLite (testes).
+# Criada junto com `filmes` pelo DDL registrado em models.py.
+filmes_fts = table(
+    "filmes_fts",
+    column("filme_id", models.Filme.id.type),
+    column("titulo"),
+    column("elenco"),
+    column("sinopse"),
+)
+
+# Pesos por coluna: título > elenco > sinopse
+FTS5_BM25 = func.bm25(literal_column("filmes_fts"), 0.0, 10.0, 4.0, 1.0, type_=Float)
+
+
+def _elenco_concatenado(agregar):
+    """Subconsulta correlacionada com os nomes do elenco do filme, separados por espaço."""
+    return (
+        select(agregar(models.Pessoa.nome, " "))
+        .join(models.FilmeElenco, models.FilmeElenco.pessoa_id == models.Pessoa.id)
+        .where(models.FilmeElenco.filme_id == models.Filme.id)
+        .scalar_subquery()
+    )
+
+
+def _documento_postgres():
+    """tsvector ponderado calculado a partir da linha do filme e do seu elenco."""
+    config = cast(SEARCH_LANGUAGE, REGCONFIG)
+
+    def peso(coluna, letra):
+        # O peso é renderizado como literal: setweight espera o tipo "char"
+        return func.setweight(func.to_tsvector(config, func.coalesce(coluna, "")), literal_column(f"'{letra}'"))
+
+    return (
+        peso(models.Filme.titulo, "A")
+        .op("||")(peso(_elenco_concatenado(func.string_agg), "B"))
+        .op("||")(peso(models.Filme.sinopse, "C"))
+    )
+
+
+def _consulta_fts5(q: str) -> str:
+    # Cada termo vira uma frase entre aspas: a entrada do usuário nunca é
+    # interpretada como sintaxe do FTS5 e os termos são combinados com AND.
+    return " ".join('"' + termo.replace('"', '""') + '"' for termo in q.split())
+
+
+class SearchService:
+    @staticmethod
+    def reindex(db: Session, filme_ids: Iterable[UUID]) -> None:
+        """Atualiza o índice de busca dos filmes informados (chamar após o flush)."""
+        filme_ids = list(filme_ids)
+        if not filme_ids:
+            return
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(
+                update(models.Filme)
+                .where(models.Filme.id.in_(filme_ids))
+                .values(busca=_documento_postgres())
+                .execution_options(synchronize_session=False)
+            )
+            return
+        SearchService.remove(db, filme_ids)
+        db.execute(
+            insert(filmes_fts).from_select(
+                ["filme_id", "titulo", "elenco", "sinopse"],
+                select(
+                    models.Filme.id,
+                    models.Filme.titulo,
+                    _elenco_concatenado(func.group_concat),
+                    models.Filme.sinopse,
+                ).where(models.Filme.id.in_(filme_ids)),
+            )
+        )
+
+    @staticmethod
+    def remove(db: Session, filme_ids: Iterable[UUID]) -> None:
+        # No PostgreSQL o tsvector sai junto com a linha do filme
+        if db.get_bind().dialect.name != "postgresql":
+            db.execute(delete(filmes_fts).where(filmes_fts.c.filme_id.in_(list(filme_ids))))
+
+    @staticmethod
+    def search(
+        db: Session, q: str, cursor: Optional[str] = None, limit: int = 20
+    ) -> Tuple[List[models.Filme], Optional[str]]:
+        """
+        Busca textual em título, elenco e sinopse, ordenada por relevância.
+        A paginação é por cursor sobre (relevância, id), então páginas
+        profundas custam o mesmo que a primeira.
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            consulta = func.websearch_to_tsquery(cast(SEARCH_LANGUAGE, REGCONFIG), q)
+            # Negado para que "menor primeiro" signifique "mais relevante primeiro"
+            relevancia = -func.ts_rank_cd(models.Filme.busca, consulta, type_=Float)
+            query = db.query(models.Filme, relevancia).options(FAVORITOS_DO_FILME).filter(models.Filme.busca.op("@@")(consulta))
+        else:
+            termos = _consulta_fts5(q)
+            if not termos:
+                return [], None
+            # bm25 já é "menor é melhor" no FTS5
+            relevancia = FTS5_BM25
+            query = (
+                db.query(models.Filme, relevancia)
+                .options(FAVORITOS_DO_FILME)
+                .join(filmes_fts, filmes_fts.c.filme_id == models.Filme.id)
+                .filter(literal_column("filmes_fts").op("MATCH")(termos))
+            )
+        linhas, next_cursor = paginate_keyset(
+            query,
+            (relevancia, models.Filme.id),
+            cursor,
+            limit,
+            lambda linha: (linha[1], linha[0].id),
+        )
+        return [filme for filme, _ in linhas], next_cursor
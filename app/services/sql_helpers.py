@@ -0,0 +1,61 @@
+import io
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import load_only, selectinload
+
+from app import models
+
+# Carregamento de Filme.usuarios_favoritaram para respostas que serializam
+# FilmeOut: uma consulta IN com apenas os ids de quem favoritou
+FAVORITOS_DO_FILME = selectinload(models.Filme.usuarios_favoritaram).options(load_only(models.Usuario.id))
+
+
+def _valor_copy(valor) -> str:
+    # Formato texto do COPY: \N é NULL; barra, tab e quebras de linha escapados
+    if valor is None:
+        return "\\N"
+    return str(valor).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_rows(db, table, linhas) -> None:
+    """
+    Grava `linhas` (dicts com as mesmas chaves) em `table` com COPY FROM STDIN
+    na conexão da sessão, dentro da transação corrente. Apenas PostgreSQL/psycopg2.
+    """
+    if not linhas:
+        return
+    colunas = list(linhas[0])
+    buffer = io.StringIO()
+    for linha in linhas:
+        buffer.write("\t".join(_valor_copy(linha[coluna]) for coluna in colunas))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = db.connection().connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(colunas)}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+
+def touch_stmt(modelo, *criterios):
+    """
+    UPDATE que só incrementa `versao` (e atualizado_em) das linhas de um
+    modelo versionado, para mudanças que não alteram colunas da própria
+    tabela: listas, créditos, agregados de avaliação.
+    """
+    return (
+        update(modelo)
+        .where(*criterios)
+        .values(versao=modelo.versao + 1, atualizado_em=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def row_for_delete_stmt(modelo, row_id):
+    """
+    SELECT da linha a remover, travada até o commit e com os valores atuais
+    mesmo que o objeto já esteja na sessão: a versão conferida pelo DELETE
+    versionado (WHERE versao = <lida>) e os deltas calculados a partir da
+    linha (ex.: a nota nos agregados) não partem de uma leitura antiga.
+    """
+    return select(modelo).where(modelo.id == row_id).with_for_update().execution_options(populate_existing=True)
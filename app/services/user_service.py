@@ -1,10 +1,214 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
+from sqlalchemy import delete, func, select, true as literal_true, union, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, undefer_group
 
-from app import models, schemas
+from app import models, schemas, serialization
+from app.cache import filmes_cache, invalidar_filmes, invalidar_principal
+from app.db_helpers import dialect_insert
+from app.etag import check_version, stale_version_guard
+from app.pagination import paginate_keyset, paginate_keyset_async, paginate_keyset_rows, paginate_keyset_rows_async
+from app.services.cooccurrence_service import (
+    favorites_added_stmt,
+    favorites_lock_stmt,
+    favorites_removed_stmts,
+    user_removed_stmts,
+)
+from app.services.rating_service import stats_without_user_stmt
+from app.services.sql_helpers import FAVORITOS_DO_FILME, row_for_delete_stmt, touch_stmt
+
+# Carregamento das três listas para respostas que serializam UsuarioOut:
+# uma consulta IN por lista, em vez de um JOIN com o produto dos tamanhos,
+# e os favoritos de cada filme (FilmeOut.usuarios_favoritaram).
+LISTAS_USUARIO = (
+    selectinload(models.Usuario.filmes_favoritos).options(FAVORITOS_DO_FILME),
+    selectinload(models.Usuario.filmes_assistidos).options(FAVORITOS_DO_FILME),
+    selectinload(models.Usuario.filmes_em_espera).options(FAVORITOS_DO_FILME),
+)
+
+# Tamanho das listas para UsuarioResumo, na mesma consulta do usuário
+TOTAIS_LISTAS = undefer_group("totais_listas")
+
+_LISTA_USUARIOS = TypeAdapter(List[schemas.UsuarioResumo])
+
+# Ordenações de GET /usuarios/{id}/<lista>; "-" na frente inverte a ordem.
+# O id desempata e completa a chave do cursor.
+ORDENS_LISTA = {
+    "titulo": (models.Filme.titulo, models.Filme.id),
+    "ano": (models.Filme.ano, models.Filme.id),
+}
+
+# Tabelas de associação das listas, pelo nome usado nas rotas
+TABELAS_LISTAS = {
+    "favoritos": models.usuario_filmes_favoritos,
+    "assistidos": models.usuario_filmes_assistidos,
+    "em_espera": models.usuario_filmes_em_espera,
+}
+
+
+def _filmes_afetados_pela_remocao(user_id: UUID):
+    """Filmes cujo FilmeOut muda quando o usuário é removido (estatísticas e favoritos)."""
+    return union(
+        select(models.Avaliacao.filme_id).where(models.Avaliacao.usuario_id == user_id),
+        select(models.usuario_filmes_favoritos.c.filme_id).where(models.usuario_filmes_favoritos.c.usuario_id == user_id),
+    )
+
+
+def _identidade_stmt(user_id: UUID):
+    return select(models.Usuario.id, models.Usuario.nome, models.Usuario.email).where(models.Usuario.id == user_id)
+
+
+def _versao_stmt(user_id: UUID):
+    """
+    Versão da representação UsuarioOut: a do usuário e a soma das versões dos
+    filmes das suas listas (que aparecem aninhados na resposta), mais a data
+    da última alteração entre eles.
+    """
+    listas = union_all(*(
+        select(tabela.c.filme_id).where(tabela.c.usuario_id == user_id)
+        for tabela in (models.usuario_filmes_favoritos, models.usuario_filmes_assistidos, models.usuario_filmes_em_espera)
+    )).subquery()
+    filmes = select(
+        func.coalesce(func.sum(models.Filme.versao), 0).label("versao_filmes"),
+        func.max(models.Filme.atualizado_em).label("filmes_atualizados_em"),
+    ).join(listas, listas.c.filme_id == models.Filme.id).subquery()
+    return (
+        select(models.Usuario.versao, filmes.c.versao_filmes, models.Usuario.atualizado_em, filmes.c.filmes_atualizados_em)
+        .select_from(models.Usuario)
+        .join(filmes, literal_true())
+        .where(models.Usuario.id == user_id)
+    )
+
+
+def _versao_resumo_stmt(user_id: UUID):
+    # UsuarioResumo só depende da linha do usuário (as listas a incrementam via _touch_lista)
+    return select(models.Usuario.versao, models.Usuario.atualizado_em).where(models.Usuario.id == user_id)
+
+
+def _versao_usuario(linha):
+    if linha is None:
+        return None
+    versao, versao_filmes, atualizado_em, filmes_atualizados_em = linha
+    if filmes_atualizados_em is not None and filmes_atualizados_em > atualizado_em:
+        atualizado_em = filmes_atualizados_em
+    return (versao, versao_filmes), atualizado_em
+
+
+def _versao_resumo(linha):
+    if linha is None:
+        return None
+    versao, atualizado_em = linha
+    return (versao,), atualizado_em
+
+
+def _ordem_lista(ordem: str):
+    """(colunas, descendente) de uma ordenação de ORDENS_LISTA; 400 se desconhecida."""
+    descendente = ordem.startswith("-")
+    colunas = ORDENS_LISTA.get(ordem.removeprefix("-"))
+    if colunas is None:
+        opcoes = ", ".join(f"{nome}, -{nome}" for nome in ORDENS_LISTA)
+        raise HTTPException(status_code=400, detail=f"Ordem deve ser uma de: {opcoes}")
+    return colunas, descendente
+
+
+def _touch_lista(db: Session, user_id: UUID, tabela, movie_ids: List[UUID]) -> None:
+    # As listas ficam em tabelas de associação: a versão do usuário (e dos
+    # filmes, quando a lista aparece em FilmeOut) é incrementada à parte
+    db.execute(touch_stmt(models.Usuario, models.Usuario.id == user_id))
+    if tabela is models.usuario_filmes_favoritos:
+        db.execute(touch_stmt(models.Filme, models.Filme.id.in_(movie_ids)))
+
+
+def _invalidar_lista(tabela, movie_ids: List[UUID]) -> None:
+    # FilmeOut só traz os favoritos; chamar após o commit
+    if movie_ids and tabela is models.usuario_filmes_favoritos:
+        invalidar_filmes(*movie_ids)
+
+
+def _filmes_do_lote(db: Session, user_id: UUID, movie_ids: List[UUID]) -> Tuple[List[UUID], List[UUID]]:
+    """(ids existentes, ids inexistentes) do lote, sem repetições e na ordem recebida; 404 se o usuário não existe."""
+    if db.execute(select(models.Usuario.id).where(models.Usuario.id == user_id)).first() is None:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    ids = list(dict.fromkeys(movie_ids))
+    encontrados = set(db.scalars(select(models.Filme.id).where(models.Filme.id.in_(ids))))
+    return [i for i in ids if i in encontrados], [i for i in ids if i not in encontrados]
+
+
+def _checar_usuario_e_filme(db: Session, user_id: UUID, movie_id: UUID) -> None:
+    existe = db.execute(
+        select(models.Usuario.id).where(
+            models.Usuario.id == user_id, select(models.Filme.id).where(models.Filme.id == movie_id).exists()
+        )
+    ).first()
+    if existe is None:
+        raise HTTPException(status_code=404, detail="Usuário ou filme não encontrado")
+
+
+def _incluir_na_lista(db: Session, user_id: UUID, tabela, movie_ids: List[UUID]) -> List[UUID]:
+    """
+    INSERT ... ON CONFLICT DO NOTHING na tabela de associação, sem carregar
+    o usuário nem a lista; devolve os ids efetivamente incluídos. Não faz commit.
+    """
+    if not movie_ids:
+        return []
+    if tabela is models.usuario_filmes_favoritos:
+        db.execute(favorites_lock_stmt(user_id))
+    stmt = (
+        dialect_insert(db, tabela)
+        .values([{"usuario_id": user_id, "filme_id": filme_id} for filme_id in movie_ids])
+        .on_conflict_do_nothing(index_elements=["usuario_id", "filme_id"])
+        .returning(tabela.c.filme_id)
+    )
+    incluidos = list(db.scalars(stmt))
+    if incluidos:
+        if tabela is models.usuario_filmes_favoritos:
+            db.execute(favorites_added_stmt(db, user_id, incluidos))
+        _touch_lista(db, user_id, tabela, incluidos)
+    return incluidos
+
+
+def _remover_da_lista(db: Session, user_id: UUID, tabela, movie_ids: List[UUID]) -> List[UUID]:
+    """DELETE na tabela de associação; devolve os ids efetivamente removidos. Não faz commit."""
+    if not movie_ids:
+        return []
+    if tabela is models.usuario_filmes_favoritos:
+        # Antes do DELETE: os pares são lidos dos favoritos atuais
+        db.execute(favorites_lock_stmt(user_id))
+        for stmt in favorites_removed_stmts(user_id, movie_ids):
+            db.execute(stmt)
+    removidos = list(db.scalars(
+        delete(tabela)
+        .where(tabela.c.usuario_id == user_id, tabela.c.filme_id.in_(movie_ids))
+        .returning(tabela.c.filme_id)
+    ))
+    if removidos:
+        _touch_lista(db, user_id, tabela, removidos)
+    return removidos
+
+
+def _alterar_lista(db: Session, user_id: UUID, lista: str, movie_id: UUID, incluir: bool) -> Dict:
+    _checar_usuario_e_filme(db, user_id, movie_id)
+    tabela = TABELAS_LISTAS[lista]
+    operacao = _incluir_na_lista if incluir else _remover_da_lista
+    alterados = operacao(db, user_id, tabela, [movie_id])
+    db.commit()
+    _invalidar_lista(tabela, alterados)
+    return {"filme_id": movie_id, "lista": lista, "na_lista": incluir, "alterado": bool(alterados)}
+
+
+def _json_usuarios(usuarios: List[models.Usuario], next_cursor: Optional[str], paginada: bool) -> bytes:
+    # Caminho pelos schemas (SERIALIZACAO_RAPIDA=false), como o response_model da rota faria
+    if paginada:
+        return schemas.UsuarioPagina.model_validate({"itens": usuarios, "next_cursor": next_cursor}).model_dump_json().encode()
+    return _LISTA_USUARIOS.dump_json(_LISTA_USUARIOS.validate_python(usuarios, from_attributes=True))
+
+
+def _chave_usuario(usuario) -> tuple:
+    return (usuario.id,)
 
 
 class UserService:
@@ -26,108 +230,293 @@ class UserService:
         return new_user
 
     @staticmethod
-    def get_user(db: Session, user_id: UUID) -> models.Usuario:
-        user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
+    def get_user(db: Session, user_id: UUID, listas: bool = False) -> models.Usuario:
+        """Usuário com o tamanho das listas; com listas=True, também os filmes delas (UsuarioOut)."""
+        user = (
+            db.query(models.Usuario)
+            .options(TOTAIS_LISTAS, *(LISTAS_USUARIO if listas else ()))
+            .filter(models.Usuario.id == user_id)
+            .first()
+        )
         if not user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         return user
 
+    @staticmethod
+    def get_identity(db: Session, user_id: UUID) -> Optional[schemas.UsuarioIdentidade]:
+        """Só id, nome e e-mail: usado na autenticação de cada requisição."""
+        linha = db.execute(_identidade_stmt(user_id)).first()
+        return schemas.UsuarioIdentidade.model_validate(linha) if linha else None
+
+    @staticmethod
+    def get_user_version(db: Session, user_id: UUID, listas: bool = False):
+        """
+        (componentes da ETag, atualizado_em) do usuário, ou None se não existe.
+        Com listas=True, da representação UsuarioOut (inclui as versões dos filmes).
+        """
+        if listas:
+            return _versao_usuario(db.execute(_versao_stmt(user_id)).first())
+        return _versao_resumo(db.execute(_versao_resumo_stmt(user_id)).first())
+
+    @staticmethod
+    def list_movies_in_list(
+        db: Session, user_id: UUID, lista: str, ordem: str = "titulo", cursor: Optional[str] = None, limit: int = 20
+    ) -> Tuple[List[models.Filme], Optional[str]]:
+        """Página de filmes de uma lista do usuário, por cursor."""
+        colunas, descendente = _ordem_lista(ordem)
+        if db.execute(select(models.Usuario.id).where(models.Usuario.id == user_id)).first() is None:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        tabela = TABELAS_LISTAS[lista]
+        return paginate_keyset(
+            (
+                db.query(models.Filme)
+                .options(FAVORITOS_DO_FILME)
+                .join(tabela, tabela.c.filme_id == models.Filme.id)
+                .filter(tabela.c.usuario_id == user_id)
+            ),
+            colunas,
+            cursor,
+            limit,
+            lambda filme: tuple(getattr(filme, coluna.key) for coluna in colunas),
+            descendente=descendente,
+        )
+
     @staticmethod
     def get_user_by_email(db: Session, email: str) -> Optional[models.Usuario]:
         return db.query(models.Usuario).filter(models.Usuario.email == email).first()
 
     @staticmethod
     def list_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.Usuario]:
-        return db.query(models.Usuario).offset(skip).limit(limit).all()
+        return db.query(models.Usuario).options(TOTAIS_LISTAS).offset(skip).limit(limit).all()
+
+    @staticmethod
+    def list_users_json(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> bytes:
+        """
+        Página de UsuarioResumo já serializada; com `cursor`, no envelope
+        UsuarioPagina. Montada a partir de projeções SQL (ver app/serialization.py).
+        """
+        paginada = cursor is not None
+        next_cursor = None
+        if not serialization.SERIALIZACAO_RAPIDA:
+            if paginada:
+                usuarios, next_cursor = UserService.list_users_keyset(db, cursor, limit)
+            else:
+                usuarios = UserService.list_users(db, skip, limit)
+            return _json_usuarios(usuarios, next_cursor, paginada)
+        stmt = serialization.usuarios_select()
+        if paginada:
+            linhas, next_cursor = paginate_keyset_rows(db, stmt, (models.Usuario.id,), cursor, limit, _chave_usuario)
+        else:
+            linhas = db.execute(stmt.offset(skip).limit(limit)).all()
+        return serialization.pagina_json([serialization.usuario_dict(linha) for linha in linhas], next_cursor, paginada)
+
+    @staticmethod
+    def list_users_keyset(
+        db: Session, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[models.Usuario], Optional[str]]:
+        return paginate_keyset(
+            db.query(models.Usuario).options(TOTAIS_LISTAS),
+            (models.Usuario.id,),
+            cursor,
+            limit,
+            lambda usuario: (usuario.id,),
+        )
 
     @staticmethod
-    def update_user(db: Session, user_id: UUID, user_update: schemas.UsuarioUpdate) -> models.Usuario:
+    def update_user(
+        db: Session, user_id: UUID, user_update: schemas.UsuarioUpdate, versoes: Optional[Set[int]] = None
+    ) -> models.Usuario:
         user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
         if not user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        # If-Match: só atualiza se o cliente viu a versão atual
+        check_version(user.versao, versoes)
         for var, value in vars(user_update).items():
             if value is not None:
                 setattr(user, var, value)
-        db.commit()
+        with stale_version_guard():
+            db.commit()
+        invalidar_principal(user_id)
         db.refresh(user)
         return user
 
     @staticmethod
     def delete_user(db: Session, user_id: UUID) -> None:
-        user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
+        # A leitura já trava a linha do usuário (dispensa favorites_lock_stmt)
+        user = db.scalars(row_for_delete_stmt(models.Usuario, user_id)).first()
         if not user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        # As avaliações do usuário saem em cascata: desconta-as dos agregados
+        db.execute(touch_stmt(models.Filme, models.Filme.id.in_(_filmes_afetados_pela_remocao(user_id))))
+        db.execute(stats_without_user_stmt(user_id))
+        for stmt in user_removed_stmts(user_id):
+            db.execute(stmt)
         db.delete(user)
+        with stale_version_guard():
+            db.commit()
+        invalidar_principal(user_id)
+        # Estatísticas e favoritos de vários filmes mudaram
+        filmes_cache.clear()
+
+    # Listas de filmes: escrevem direto na tabela de associação e devolvem só
+    # o estado do filme na lista (StatusLista), sem carregar nem serializar as listas
+    @staticmethod
+    def add_favorite(db: Session, user_id: UUID, movie_id: UUID) -> Dict:
+        return _alterar_lista(db, user_id, "favoritos", movie_id, incluir=True)
+
+    @staticmethod
+    def remove_favorite(db: Session, user_id: UUID, movie_id: UUID) -> Dict:
+        return _alterar_lista(db, user_id, "favoritos", movie_id, incluir=False)
+
+    @staticmethod
+    def add_watched(db: Session, user_id: UUID, movie_id: UUID) -> Dict:
+        return _alterar_lista(db, user_id, "assistidos", movie_id, incluir=True)
+
+    @staticmethod
+    def remove_watched(db: Session, user_id: UUID, movie_id: UUID) -> Dict:
+        return _alterar_lista(db, user_id, "assistidos", movie_id, incluir=False)
+
+    @staticmethod
+    def add_waiting(db: Session, user_id: UUID, movie_id: UUID) -> Dict:
+        return _alterar_lista(db, user_id, "em_espera", movie_id, incluir=True)
+
+    @staticmethod
+    def remove_waiting(db: Session, user_id: UUID, movie_id: UUID) -> Dict:
+        return _alterar_lista(db, user_id, "em_espera", movie_id, incluir=False)
+
+    @staticmethod
+    def add_movies_to_list(db: Session, user_id: UUID, lista: str, movie_ids: List[UUID]) -> Dict:
+        """Inclui vários filmes numa lista (favoritos, assistidos ou em_espera) com um único INSERT."""
+        tabela = TABELAS_LISTAS[lista]
+        existentes, inexistentes = _filmes_do_lote(db, user_id, movie_ids)
+        incluidos = _incluir_na_lista(db, user_id, tabela, existentes)
         db.commit()
+        _invalidar_lista(tabela, incluidos)
+        return {"alterados": len(incluidos), "ignorados": len(existentes) - len(incluidos), "inexistentes": inexistentes}
 
     @staticmethod
-    def add_favorite(db: Session, user_id: UUID, movie_id: UUID) -> models.Usuario:
-        user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
-        movie = db.query(models.Filme).filter(models.Filme.id == movie_id).first()
-        if not user or not movie:
-            raise HTTPException(status_code=404, detail="Usuário ou filme não encontrado")
-        if movie not in user.filmes_favoritos:
-            user.filmes_favoritos.append(movie)
-            db.commit()
-            db.refresh(user)
-        return user
+    def remove_movies_from_list(db: Session, user_id: UUID, lista: str, movie_ids: List[UUID]) -> Dict:
+        """Remove vários filmes de uma lista com um único DELETE."""
+        tabela = TABELAS_LISTAS[lista]
+        existentes, inexistentes = _filmes_do_lote(db, user_id, movie_ids)
+        removidos = _remover_da_lista(db, user_id, tabela, existentes)
+        db.commit()
+        _invalidar_lista(tabela, removidos)
+        return {"alterados": len(removidos), "ignorados": len(existentes) - len(removidos), "inexistentes": inexistentes}
+
+
+class AsyncUserService:
+    """
+    Variante de UserService para AsyncSession (modo DB_ASYNC).
+    Como não há carregamento implícito em async, toda consulta que retorna
+    um usuário para serialização carrega os totais com TOTAIS_LISTAS (e as
+    listas com LISTAS_USUARIO, quando pedidas).
+    """
 
     @staticmethod
-    def remove_favorite(db: Session, user_id: UUID, movie_id: UUID) -> models.Usuario:
-        user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
-        movie = db.query(models.Filme).filter(models.Filme.id == movie_id).first()
-        if not user or not movie:
-            raise HTTPException(status_code=404, detail="Usuário ou filme não encontrado")
-        if movie in user.filmes_favoritos:
-            user.filmes_favoritos.remove(movie)
-            db.commit()
-            db.refresh(user)
-        return user
+    async def create_user(db: AsyncSession, user: schemas.UsuarioCreate) -> models.Usuario:
+        db_user = await AsyncUserService.get_user_by_email(db, user.email)
+        if db_user:
+            raise HTTPException(status_code=400, detail="Email já cadastrado")
+        new_user = models.Usuario(
+            nome=user.nome,
+            email=user.email,
+            senha=user.senha,
+            data_nascimento=user.data_nascimento
+        )
+        db.add(new_user)
+        await db.commit()
+        return await AsyncUserService.get_user(db, new_user.id)
 
     @staticmethod
-    def add_watched(db: Session, user_id: UUID, movie_id: UUID) -> models.Usuario:
-        user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
-        movie = db.query(models.Filme).filter(models.Filme.id == movie_id).first()
-        if not user or not movie:
-            raise HTTPException(status_code=404, detail="Usuário ou filme não encontrado")
-        if movie not in user.filmes_assistidos:
-            user.filmes_assistidos.append(movie)
-            db.commit()
-            db.refresh(user)
+    async def get_user(db: AsyncSession, user_id: UUID, listas: bool = False) -> models.Usuario:
+        result = await db.execute(
+            select(models.Usuario)
+            .options(TOTAIS_LISTAS, *(LISTAS_USUARIO if listas else ()))
+            .where(models.Usuario.id == user_id)
+            .execution_options(populate_existing=True)
+        )
+        user = result.scalars().first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
         return user
 
     @staticmethod
-    def remove_watched(db: Session, user_id: UUID, movie_id: UUID) -> models.Usuario:
-        user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
-        movie = db.query(models.Filme).filter(models.Filme.id == movie_id).first()
-        if not user or not movie:
-            raise HTTPException(status_code=404, detail="Usuário ou filme não encontrado")
-        if movie in user.filmes_assistidos:
-            user.filmes_assistidos.remove(movie)
-            db.commit()
-            db.refresh(user)
-        return user
+    async def get_identity(db: AsyncSession, user_id: UUID) -> Optional[schemas.UsuarioIdentidade]:
+        linha = (await db.execute(_identidade_stmt(user_id))).first()
+        return schemas.UsuarioIdentidade.model_validate(linha) if linha else None
 
     @staticmethod
-    def add_waiting(db: Session, user_id: UUID, movie_id: UUID) -> models.Usuario:
-        user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
-        movie = db.query(models.Filme).filter(models.Filme.id == movie_id).first()
-        if not user or not movie:
-            raise HTTPException(status_code=404, detail="Usuário ou filme não encontrado")
-        if movie not in user.filmes_em_espera:
-            user.filmes_em_espera.append(movie)
-            db.commit()
-            db.refresh(user)
-        return user
+    async def get_user_version(db: AsyncSession, user_id: UUID, listas: bool = False):
+        if listas:
+            return _versao_usuario((await db.execute(_versao_stmt(user_id))).first())
+        return _versao_resumo((await db.execute(_versao_resumo_stmt(user_id))).first())
 
     @staticmethod
-    def remove_waiting(db: Session, user_id: UUID, movie_id: UUID) -> models.Usuario:
-        user = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
-        movie = db.query(models.Filme).filter(models.Filme.id == movie_id).first()
-        if not user or not movie:
-            raise HTTPException(status_code=404, detail="Usuário ou filme não encontrado")
-        if movie in user.filmes_em_espera:
-            user.filmes_em_espera.remove(movie)
-            db.commit()
-            db.refresh(user)
-        return user
+    async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.Usuario]:
+        result = await db.execute(select(models.Usuario).where(models.Usuario.email == email))
+        return result.scalars().first()
+
+    @staticmethod
+    async def list_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Usuario]:
+        result = await db.execute(select(models.Usuario).options(TOTAIS_LISTAS).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def list_users_json(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> bytes:
+        paginada = cursor is not None
+        next_cursor = None
+        if not serialization.SERIALIZACAO_RAPIDA:
+            if paginada:
+                usuarios, next_cursor = await AsyncUserService.list_users_keyset(db, cursor, limit)
+            else:
+                usuarios = await AsyncUserService.list_users(db, skip, limit)
+            return _json_usuarios(usuarios, next_cursor, paginada)
+        stmt = serialization.usuarios_select()
+        if paginada:
+            linhas, next_cursor = await paginate_keyset_rows_async(db, stmt, (models.Usuario.id,), cursor, limit, _chave_usuario)
+        else:
+            linhas = (await db.execute(stmt.offset(skip).limit(limit))).all()
+        return serialization.pagina_json([serialization.usuario_dict(linha) for linha in linhas], next_cursor, paginada)
+
+    @staticmethod
+    async def list_users_keyset(
+        db: AsyncSession, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[models.Usuario], Optional[str]]:
+        return await paginate_keyset_async(
+            db,
+            select(models.Usuario).options(TOTAIS_LISTAS),
+            (models.Usuario.id,),
+            cursor,
+            limit,
+            lambda usuario: (usuario.id,),
+        )
+
+    @staticmethod
+    async def update_user(
+        db: AsyncSession, user_id: UUID, user_update: schemas.UsuarioUpdate, versoes: Optional[Set[int]] = None
+    ) -> models.Usuario:
+        user = await AsyncUserService.get_user(db, user_id)
+        check_version(user.versao, versoes)
+        for var, value in vars(user_update).items():
+            if value is not None:
+                setattr(user, var, value)
+        with stale_version_guard():
+            await db.commit()
+        invalidar_principal(user_id)
+        return await AsyncUserService.get_user(db, user_id)
+
+    @staticmethod
+    async def delete_user(db: AsyncSession, user_id: UUID) -> None:
+        user = (await db.scalars(row_for_delete_stmt(models.Usuario, user_id))).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        await db.execute(touch_stmt(models.Filme, models.Filme.id.in_(_filmes_afetados_pela_remocao(user_id))))
+        await db.execute(stats_without_user_stmt(user_id))
+        for stmt in user_removed_stmts(user_id):
+            await db.execute(stmt)
+        await db.delete(user)
+        with stale_version_guard():
+            await db.commit()
+        invalidar_principal(user_id)
+        filmes_cache.clear()
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base
+from app.schemas import AvaliacaoCreate, FilmeCreate, FilmeUpdate, UsuarioCreate, UsuarioUpdate
+from app.services.movie_service import AsyncMovieService
+from app.services.rating_service import AsyncRatingService
+from app.services.user_service import AsyncUserService
+
+# Banco em memória acessado pelo driver assíncrono (aiosqlite)
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+@pytest.fixture(scope="function")
+def run():
+    engine = create_async_engine(DATABASE_URL, poolclass=StaticPool)
+    TestingSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(setup())
+
+    def _run(coro_fn):
+        async def wrapper():
+            async with TestingSessionLocal() as db:
+                return await coro_fn(db)
+        return asyncio.run(wrapper())
+
+    yield _run
+    asyncio.run(engine.dispose())
+
+
+def filme_data(titulo="Matrix"):
+    return FilmeCreate(
+        titulo=titulo,
+        genero="Ficção Científica",
+        duracao=136,
+        ano=1999,
+        diretor="Lana Wachowski, Lilly Wachowski",
+        elenco=["Keanu Reeves", "Carrie-Anne Moss"],
+    )
+
+
+def test_async_movie_crud(run):
+    async def cenario(db):
+        filme = await AsyncMovieService.create_movie(db, filme_data())
+        assert (await AsyncMovieService.get_movie(db, filme.id)).titulo == "Matrix"
+        pagina, cursor = await AsyncMovieService.list_movies_keyset(db, limit=10)
+        assert [f.id for f in pagina] == [filme.id] and cursor is None
+        await AsyncMovieService.update_movie(db, filme.id, FilmeUpdate(elenco=["Carrie-Anne Moss", "Hugo Weaving"]))
+        assert (await AsyncMovieService.get_movie(db, filme.id)).elenco == ["Carrie-Anne Moss", "Hugo Weaving"]
+        assert await AsyncMovieService.list_movies(db, ator="Keanu Reeves") == []
+        assert await AsyncMovieService.delete_movie(db, filme.id) is True
+        assert await AsyncMovieService.get_movie(db, filme.id) is None
+    run(cenario)
+
+
+def test_async_user_and_rating(run):
+    async def cenario(db):
+        user = await AsyncUserService.create_user(db, UsuarioCreate(
+            nome="Usuário Async",
+            email="async@exemplo.com",
+            senha="senha123",
+            data_nascimento=date(1990, 1, 1),
+        ))
+        # Os totais já vêm carregados: acessá-los não dispara I/O implícito
+        assert (user.total_favoritos, user.total_assistidos, user.total_em_espera) == (0, 0, 0)
+        completo = await AsyncUserService.get_user(db, user.id, listas=True)
+        assert completo.filmes_favoritos == []
+        updated = await AsyncUserService.update_user(db, user.id, UsuarioUpdate(nome="Novo Nome"))
+        assert updated.nome == "Novo Nome"
+
+        filme = await AsyncMovieService.create_movie(db, filme_data("Interestelar"))
+        avaliacao = await AsyncRatingService.create_rating(
+            db, AvaliacaoCreate(nota=9, usuario_id=user.id, filme_id=filme.id)
+        )
+        assert avaliacao.nota == 9
+        with pytest.raises(Exception):
+            await AsyncRatingService.create_rating(
+                db, AvaliacaoCreate(nota=7, usuario_id=user.id, filme_id=filme.id)
+            )
+        assert len(await AsyncRatingService.list_ratings(db)) == 1
+    run(cenario)
@@ -0,0 +1,119 @@
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.cache import TTLCache, filmes_cache
+from app.models import Base, Usuario
+from app.schemas import AvaliacaoCreate, FilmeCreate, FilmeUpdate
+from app.services.movie_service import MovieService
+from app.services.rating_service import RatingService
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_lru_e_ttl():
+    relogio = Relogio()
+    cache = TTLCache(maxsize=2, ttl=10, clock=relogio)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # "b" é o menos usado recentemente e sai quando "c" entra
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    relogio.agora = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirados"]) == (1, 2, 1, 1)
+
+
+def test_invalidacao_por_tag_e_token():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("filme:1", "x", tags=["1"])
+    cache.set("lista", "[1, 2]", tags=["1", "2", "listas"])
+    cache.set("filme:2", "y", tags=["2"])
+    cache.invalidate("1")
+    assert cache.get("filme:1") is None and cache.get("lista") is None
+    assert cache.get("filme:2") == "y"
+    # Valor lido antes de uma invalidação concorrente não é gravado
+    token = cache.token()
+    cache.invalidate("2")
+    assert cache.set("filme:2", "antigo", tags=["2"], token=token) is False
+    assert cache.get("filme:2") is None
+    # ... mas a invalidação de outra tag não impede a gravação
+    assert cache.set("filme:1", "x", tags=["1"], token=token) is True
+    cache.clear()
+    assert cache.set("filme:1", "x", tags=["1"], token=token) is False
+
+
+def test_token_de_leitura_em_replica():
+    relogio = Relogio()
+    cache = TTLCache(maxsize=10, ttl=60, clock=relogio)
+    assert cache.set("filme:1", "x", tags=["1"], token=cache.token(atraso=5)) is True
+    cache.invalidate("1")
+    # Logo após a invalidação, a réplica pode não ter a escrita: não grava
+    relogio.agora = 3
+    assert cache.set("filme:1", "antigo", tags=["1"], token=cache.token(atraso=5)) is False
+    assert cache.set("filme:1", "novo", tags=["1"], token=cache.token()) is True
+    # Só as tags invalidadas no intervalo são afetadas
+    assert cache.set("filme:2", "replica", tags=["2"], token=cache.token(atraso=5)) is True
+    relogio.agora = 6
+    assert cache.set("filme:1", "replica", tags=["1"], token=cache.token(atraso=5)) is True
+
+
+def test_invalidacoes_antigas_sao_descartadas():
+    relogio = Relogio()
+    cache = TTLCache(maxsize=1, ttl=60, clock=relogio)
+    token = cache.token()
+    for tag in range(10):
+        relogio.agora = tag + 1
+        cache.invalidate(tag)
+    # Guarda no máximo 4 * maxsize instantes; as tags descartadas continuam
+    # recusando leituras que começaram antes da sua invalidação
+    assert len(cache._invalidado_em) == 4
+    assert cache.set("a", 1, tags=[0], token=token) is False
+    assert cache.set("a", 1, tags=[0], token=cache.token()) is True
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autoflush=False, bind=engine)()
+    filmes_cache.clear()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_escritas_invalidam_respostas_de_filmes(db):
+    filme = MovieService.create_movie(db, FilmeCreate(
+        titulo="Matrix", genero="Ação", duracao=136, ano=1999, diretor="Wachowski", elenco=["Keanu Reeves"],
+    ))
+    usuario = Usuario(nome="Ana", email="ana@exemplo.com", senha="x", data_nascimento=date(1990, 1, 1))
+    db.add(usuario)
+    db.commit()
+
+    assert json.loads(MovieService.get_movie_json(db, filme.id)[2])["estatisticas"] is None
+    assert [f["titulo"] for f in json.loads(MovieService.list_movies_json(db))] == ["Matrix"]
+    hits = filmes_cache.hits
+    MovieService.get_movie_json(db, filme.id)
+    assert filmes_cache.hits == hits + 1
+
+    RatingService.create_rating(db, AvaliacaoCreate(nota=8, usuario_id=usuario.id, filme_id=filme.id))
+    assert json.loads(MovieService.get_movie_json(db, filme.id)[2])["estatisticas"]["total"] == 1
+    assert json.loads(MovieService.list_movies_json(db))[0]["estatisticas"]["media"] == 8
+
+    MovieService.update_movie(db, filme.id, FilmeUpdate(titulo="The Matrix"))
+    assert json.loads(MovieService.list_movies_json(db, cursor=""))["itens"][0]["titulo"] == "The Matrix"
+    MovieService.delete_movie(db, filme.id)
+    assert MovieService.get_movie_json(db, filme.id) is None
+    assert json.loads(MovieService.list_movies_json(db)) == []
@@ -0,0 +1,167 @@
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import database
+from app.database import MeteredQueuePool, async_database_url, pool_stats, sessao_de_leitura
+from app.instrumentation import contar_consultas
+from app.replicas import (
+    COOKIE_PRIMARIO,
+    LeituraAposEscritaMiddleware,
+    Replicas,
+    cookie_vigente,
+    leitura_no_primario,
+    valor_do_cookie,
+)
+from app.services.auth_service import create_access_token, principal_do_cabecalho
+
+
+def test_pool_stats_reports_checkouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=MeteredQueuePool, pool_size=2, max_overflow=1
+    )
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        stats = pool_stats(engine)
+        assert stats["em_uso"] == 1
+        assert stats["tamanho"] == 2
+        assert stats["max_overflow"] == 1
+    stats = pool_stats(engine)
+    assert stats["em_uso"] == 0
+    assert stats["ociosas"] == 1
+    assert stats["espera_checkout"]["total"] == 1
+    assert stats["timeouts"] == 0
+
+
+def test_async_database_url():
+    assert async_database_url("postgresql+psycopg2://u:p@localhost/db") == "postgresql+asyncpg://u:p@localhost/db"
+    assert async_database_url("sqlite:///./local.db") == "sqlite+aiosqlite:///./local.db"
+
+
+def test_leituras_nas_replicas(tmp_path, monkeypatch):
+    relogio = [0.0]
+    replica_a = create_engine(f"sqlite:///{tmp_path / 'a.db'}")
+    fora_do_ar = create_engine(f"sqlite:///{tmp_path / 'nao' / 'existe.db'}")
+    replicas = Replicas([replica_a, fora_do_ar], pausa=30, clock=lambda: relogio[0])
+    monkeypatch.setattr(database, "replicas", replicas)
+
+    # Round-robin: a réplica que não conecta sai da rotação e a leitura vai para a próxima
+    usadas = []
+    for _ in range(4):
+        db = sessao_de_leitura()
+        usadas.append(db.get_bind())
+        db.close()
+    assert usadas == [replica_a] * 4
+    assert replicas.falhas == [0, 1]
+    assert [r["disponivel"] for r in replicas.stats()] == [True, False]
+
+    # Passada a pausa, volta a ser tentada
+    relogio[0] = 31
+    assert [indice for indice, _ in replicas.candidatas()] == [0, 1]
+
+    # Sem réplica disponível, ou logo após uma escrita do cliente, lê do primário
+    monkeypatch.setattr(database, "replicas", Replicas([fora_do_ar]))
+    assert sessao_de_leitura().get_bind() is database.engine
+    monkeypatch.setattr(database, "replicas", Replicas([replica_a]))
+    db = sessao_de_leitura()
+    assert db.info["replica"] == 0
+    db.close()
+    assert sessao_de_leitura(no_primario=True).get_bind() is database.engine
+
+
+def test_replica_atrasada_sai_da_rotacao(tmp_path, monkeypatch):
+    relogio = [0.0]
+    atrasada = create_engine(f"sqlite:///{tmp_path / 'atrasada.db'}")
+    em_dia = create_engine(f"sqlite:///{tmp_path / 'em_dia.db'}")
+    # SQLite não informa atraso: cada réplica guarda o seu numa tabela
+    for replica, atraso in ((atrasada, 60), (em_dia, 1)):
+        with replica.begin() as conn:
+            conn.execute(text("CREATE TABLE atraso (valor REAL)"))
+            conn.execute(text("INSERT INTO atraso VALUES (:valor)"), {"valor": atraso})
+    monkeypatch.setattr(database, "atraso_stmt", lambda dialeto: text("SELECT valor FROM atraso"))
+    replicas = Replicas([atrasada, em_dia], atraso_max=5, verificacao=10, clock=lambda: relogio[0])
+    monkeypatch.setattr(database, "replicas", replicas)
+
+    usadas = []
+    for _ in range(4):
+        with contar_consultas() as coletor:
+            db = sessao_de_leitura()
+        usadas.append((db.get_bind(), coletor.consultas))
+        db.close()
+    # A atrasada é medida e descartada; a em dia, medida só na primeira vez
+    assert usadas == [(em_dia, 2), (em_dia, 0), (em_dia, 0), (em_dia, 0)]
+    assert replicas.atrasos == [60, 1]
+    assert [(r["disponivel"], r["vezes_atrasada"]) for r in replicas.stats()] == [(False, 1), (True, 0)]
+
+    # Passado o intervalo, é medida de novo e, em dia, volta à rotação
+    with atrasada.begin() as conn:
+        conn.execute(text("UPDATE atraso SET valor = 0"))
+    relogio[0] = 11
+    assert sorted(sessao_de_leitura().info["replica"] for _ in range(2)) == [0, 1]
+    assert replicas.atrasos == [0, 1]
+
+
+def test_cookie_apos_escrita():
+    app = FastAPI()
+    app.add_middleware(LeituraAposEscritaMiddleware, segredo="segredo", janela=5)
+
+    @app.post("/escrever")
+    def escrever():
+        return {}
+
+    @app.post("/falhar", status_code=400)
+    def falhar():
+        return {}
+
+    @app.get("/ler")
+    def ler():
+        return {"primario": leitura_no_primario()}
+
+    @app.get("/exportar")
+    def exportar():
+        # Sessões abertas depois que a rota retorna recebem a mesma decisão
+        return {"primario": database.fabrica_de_leitura().keywords["no_primario"]}
+
+    client = TestClient(app)
+    assert client.get("/ler").json() == {"primario": False}
+    assert "set-cookie" not in client.post("/falhar").headers
+    assert COOKIE_PRIMARIO in client.post("/escrever").headers["set-cookie"]
+    assert client.get("/ler").json() == {"primario": True}
+    assert client.get("/exportar").json() == {"primario": True}
+    assert cookie_vigente(client.cookies[COOKIE_PRIMARIO], "segredo")
+
+    # Cookie sem assinatura válida, ou vencido, não vale
+    forjado = TestClient(app, cookies={COOKIE_PRIMARIO: f"{time.time() + 60:.3f}.abc"})
+    assert forjado.get("/ler").json() == {"primario": False}
+    assert not cookie_vigente(valor_do_cookie(time.time() - 1, "segredo"), "segredo")
+    assert not cookie_vigente(valor_do_cookie(time.time() + 60, "outro"), "segredo")
+
+
+def test_leitura_apos_escrita_pelo_principal():
+    app = FastAPI()
+    tokens = {"Bearer token-ana": "ana", "Bearer token-bia": "bia"}
+    app.add_middleware(LeituraAposEscritaMiddleware, segredo="segredo", identificar=tokens.get, janela=5)
+
+    @app.post("/escrever")
+    def escrever():
+        return {}
+
+    @app.get("/ler")
+    def ler():
+        return {"primario": leitura_no_primario()}
+
+    # Clientes de API não guardam cookies: a escrita fica associada ao principal
+    ana = {"Authorization": "Bearer token-ana"}
+    client = TestClient(app)
+    client.post("/escrever", headers=ana)
+    client.cookies.clear()
+    assert client.get("/ler", headers=ana).json() == {"primario": True}
+    assert client.get("/ler", headers={"Authorization": "Bearer token-bia"}).json() == {"primario": False}
+    assert client.get("/ler").json() == {"primario": False}
+    assert principal_do_cabecalho(f"Bearer {create_access_token({'sub': 'ana'})}") == "ana"
+    assert principal_do_cabecalho("Bearer invalido") is None
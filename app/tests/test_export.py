@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+import pytest
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.models import Base, Usuario, Filme, Avaliacao
+from app.services import export_service
+from app.services.export_service import ExportService, em_sessao_propria
+
+# Configuração do banco de dados em memória para testes
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    usuarios = [
+        Usuario(nome=f"Usuário {i}", email=f"export{i}@exemplo.com", senha="x", data_nascimento=date(1990, 1, 1))
+        for i in range(2)
+    ]
+    filmes = [
+        Filme(titulo=f"Filme {i}", genero="Drama", duracao=100, ano=2020, diretor="Diretor", elenco=[], sinopse="")
+        for i in range(5)
+    ]
+    session.add_all(usuarios + filmes)
+    session.flush()
+    # 2 usuários x 5 filmes = 10 avaliações; vírgula e aspas testam o escape do CSV
+    session.add_all(
+        Avaliacao(usuario_id=usuario.id, filme_id=filme.id, nota=n % 11, comentario='Bom, "muito" bom')
+        for n, (usuario, filme) in enumerate((u, f) for u in usuarios for f in filmes)
+    )
+    session.execute(models.usuario_filmes_favoritos.insert(), [
+        {"usuario_id": usuarios[0].id, "filme_id": filme.id} for filme in filmes[:3]
+    ])
+    session.execute(models.usuario_filmes_em_espera.insert(), [
+        {"usuario_id": usuarios[1].id, "filme_id": filmes[4].id}
+    ])
+    session.commit()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def lote_pequeno(monkeypatch):
+    monkeypatch.setattr(export_service, "LOTE_EXPORTACAO", 3)
+
+
+def test_export_ratings_ndjson(db):
+    linhas = [json.loads(linha) for linha in "".join(ExportService.export_ratings(db, "ndjson")).splitlines()]
+    assert len(linhas) == 10
+    assert set(linhas[0]) == {"id", "usuario_id", "filme_id", "nota", "comentario"}
+    assert linhas[0]["comentario"] == 'Bom, "muito" bom'
+
+    usuario_id = db.query(Usuario.id).filter_by(email="export0@exemplo.com").scalar()
+    filtradas = "".join(ExportService.export_ratings(db, "ndjson", usuario_id=usuario_id)).splitlines()
+    assert {json.loads(linha)["usuario_id"] for linha in filtradas} == {str(usuario_id)}
+    assert len(filtradas) == 5
+
+
+def test_export_ratings_csv(db):
+    linhas = list(csv.reader(io.StringIO("".join(ExportService.export_ratings(db, "csv")))))
+    assert linhas[0] == ["id", "usuario_id", "filme_id", "nota", "comentario"]
+    assert len(linhas) == 11
+    assert {linha[4] for linha in linhas[1:]} == {'Bom, "muito" bom'}
+
+
+def test_export_ratings_em_pedacos(db, lote_pequeno):
+    # Com lotes de 3 linhas, cada pedaço da resposta traz no máximo 3
+    # avaliações, e o primeiro sai antes de o resto ser lido do banco
+    pedacos = ExportService.export_ratings(db, "ndjson")
+    assert next(pedacos).count("\n") == 3
+    assert [pedaco.count("\n") for pedaco in pedacos] == [3, 3, 1]
+
+    pedacos = list(ExportService.export_ratings(db, "csv"))
+    assert len(pedacos) == 4
+    assert pedacos[0].startswith("id,usuario_id,")
+
+
+def test_export_user_lists(db, lote_pequeno):
+    pedacos = list(ExportService.export_user_lists(db, "csv"))
+    assert len(pedacos) == 2
+    linhas = list(csv.reader(io.StringIO("".join(pedacos))))
+    assert linhas[0] == ["usuario_id", "lista", "filme_id"]
+    assert sorted(linha[1] for linha in linhas[1:]) == ["em_espera", "favoritos", "favoritos", "favoritos"]
+
+    usuario_id = db.query(Usuario.id).filter_by(email="export1@exemplo.com").scalar()
+    linhas = [json.loads(linha) for linha in "".join(ExportService.export_user_lists(db, "ndjson", usuario_id)).splitlines()]
+    assert [(linha["usuario_id"], linha["lista"]) for linha in linhas] == [(str(usuario_id), "em_espera")]
+
+
+def test_em_sessao_propria_fecha_a_sessao(db):
+    sessoes = []
+
+    def fabrica():
+        sessoes.append(TestingSessionLocal())
+        return sessoes[-1]
+
+    pedacos = em_sessao_propria(fabrica, ExportService.export_ratings, "ndjson")
+    # Nada é aberto antes de a resposta começar a ser consumida
+    assert sessoes == []
+    assert "".join(pedacos).count("\n") == 10
+    assert len(sessoes) == 1
+    assert not sessoes[0].in_transaction()
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import threading
+from unittest import mock
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.testclient import TestClient
+
+from app import database
+from app.cache import filmes_cache
+from app.instrumentation import SQL_N_MAIS_1_LIMITE, contar_consultas, max_consultas
+from app.main import app
+from app.metrics import Counter, Histogram, Registro, gravar_amostras, ler_amostras, render
+from app.models import Base
+from app.schemas import FilmeCreate
+from app.services.movie_service import MovieService
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    filmes_cache.clear()
+    app.dependency_overrides[database.get_db] = _get_db
+    app.dependency_overrides[database.get_read_db] = _get_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_server_timing_e_log(client, caplog):
+    with TestingSessionLocal() as db:
+        filme = MovieService.create_movie(db, FilmeCreate(
+            titulo="Matrix", genero="Ficção Científica", duracao=136, ano=1999,
+            diretor="Lana Wachowski", elenco=["Keanu Reeves"], sinopse="Um hacker."
+        ))
+    filmes_cache.clear()
+    with caplog.at_level(logging.INFO, logger="app.sql"):
+        # Versão, filme, elenco e favoritados
+        with max_consultas(4) as coletor:
+            resposta = client.get(f"/filmes/{filme.id}")
+        # Depois só a versão: o corpo vem do cache
+        with max_consultas(1):
+            assert client.get(f"/filmes/{filme.id}").status_code == 200
+    assert resposta.status_code == 200
+    assert coletor.consultas > 0
+    assert resposta.headers["server-timing"].startswith("db;dur=")
+    assert f'desc="{coletor.consultas} consultas"' in resposta.headers["server-timing"]
+    linha = json.loads(caplog.records[0].getMessage())
+    assert linha["rota"] == "/filmes/{filme_id}"
+    assert linha["status"] == 200
+    assert linha["consultas"] == coletor.consultas
+    assert "n_mais_1" not in linha
+
+
+def test_max_consultas_falha_e_n_mais_1():
+    with pytest.raises(AssertionError, match="máximo 2"):
+        with max_consultas(2):
+            with engine.connect() as conn:
+                for _ in range(SQL_N_MAIS_1_LIMITE):
+                    conn.execute(text("SELECT 1"))
+    with contar_consultas() as coletor:
+        with engine.connect() as conn:
+            for _ in range(SQL_N_MAIS_1_LIMITE):
+                conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+    assert coletor.consultas == SQL_N_MAIS_1_LIMITE + 1
+    assert coletor.repetidas() == [{"sql": "SELECT 1", "vezes": SQL_N_MAIS_1_LIMITE}]
+    # Fora de um coletor nada é registrado
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert coletor.consultas == SQL_N_MAIS_1_LIMITE + 1
+
+
+def test_instrucao_com_erro_nao_acumula_estado_na_conexao():
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM tabela_inexistente"))
+        with contar_consultas() as coletor:
+            conn.execute(text("SELECT 1"))
+        assert coletor.consultas == 1
+        assert "inicio_consulta" not in conn.info
+
+
+def test_metrics(client):
+    client.get("/filmes/ranking")
+    client.get("/nao/existe")
+    resposta = client.get("/metrics")
+    assert resposta.headers["content-type"].startswith("text/plain; version=0.0.4")
+    linhas = resposta.text.splitlines()
+    assert "# TYPE http_request_duration_seconds histogram" in linhas
+    assert any(l.startswith('http_requests_total{method="GET",route="/filmes/ranking",status="200"} ') for l in linhas)
+    assert any(l.startswith('http_requests_total{method="GET",route="<desconhecida>",status="404"} ') for l in linhas)
+    assert any(l.startswith('http_response_size_bytes_count{method="GET",route="/filmes/ranking"} ') for l in linhas)
+    assert any(l.startswith('db_statement_duration_seconds_count{operation="SELECT"} ') for l in linhas)
+    # A própria requisição de /metrics está em andamento
+    assert "http_requests_in_progress 1" in linhas
+
+
+def test_metricas_de_varias_threads_e_processos(tmp_path):
+    contador = Counter()
+    histograma = Histogram(buckets=(1, 10))
+    threads = [threading.Thread(target=lambda: [(contador.inc(), histograma.observe(5)) for _ in range(1000)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert contador.value() == 4000
+    assert histograma.snapshot()["buckets"] == {"1": 0, "10": 4000, "+Inf": 4000}
+
+    # Dois workers gravando no mesmo diretório: /metrics soma as séries
+    for pid, quantidade in ((1, 2), (2, 3)):
+        registro = Registro()
+        registro.counter("requisicoes_total", "Requisições", ("rota",)).labels("/a").inc(quantidade)
+        registro.gauge("em_andamento", "Em andamento").labels().inc()
+        with mock.patch("os.getpid", return_value=pid):
+            gravar_amostras(str(tmp_path), registro)
+    texto = render(ler_amostras(str(tmp_path), validade=60))
+    assert 'requisicoes_total{rota="/a"} 5' in texto
+    assert "em_andamento 2" in texto
+    # Gauges de workers que pararam de gravar são descartados; contadores não
+    texto = render(ler_amostras(str(tmp_path), validade=-1))
+    assert 'requisicoes_total{rota="/a"} 5' in texto
+    assert "em_andamento 2" not in texto
@@ -1,11 +1,27 @@
+import io
+import json
+
 import pytest
+from pydantic import ValidationError
 from uuid import uuid4
 from sqlalchemy import create_engine
+from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.orm import sessionmaker
 
-from app.models import Base, Filme
-from app.schemas import FilmeCreate, FilmeUpdate
+from datetime import date, datetime, timezone
+
+from app import schemas
+from app.models import Base, Filme, FilmeVizinho, Pessoa, Usuario
+from app.schemas import AvaliacaoCreate, FilmeCreate, FilmeUpdate
+from app.services.cooccurrence_service import CooccurrenceService
+from app.services.export_service import ExportService
+from app.services.import_service import ImportService, ler_csv, ler_ndjson
 from app.services.movie_service import MovieService
+from app.services.person_service import PersonService
+from app.services.ranking_service import RankingService
+from app.services.rating_service import RatingService
+from app.services.recommendation_service import RecommendationService
+from app.services.user_service import UserService
 
 # Configuração de banco de dados em memória para testes
 DATABASE_URL = "sqlite:///:memory:"
@@ -125,3 +141,169 @@ def test_delete_movie_inexistente(db_session):
     fake_id = uuid4()
     deleted = MovieService.delete_movie(db_session, fake_id)
     assert deleted is False
+
+def test_list_movies_keyset(db_session):
+    for titulo in ["C", "A", "B", "A"]:
+        MovieService.create_movie(db_session, FilmeCreate(
+            titulo=titulo,
+            genero="Ação",
+            duracao=100,
+            ano=2020,
+            diretor="Diretor",
+            elenco=["Ator"],
+        ))
+    vistos = []
+    cursor = None
+    while True:
+        pagina, cursor = MovieService.list_movies_keyset(db_session, cursor=cursor, limit=3)
+        vistos.extend(pagina)
+        if cursor is None:
+            break
+    assert [f.titulo for f in vistos] == ["A", "A", "B", "C"]
+    assert len({f.id for f in vistos}) == 4
+
+def test_search_movies(db_session):
+    dados = [
+        ("Matrix", ["Keanu Reeves"], "Um hacker descobre a verdade."),
+        ("O Hacker", ["Angelina Jolie"], "Jovens invadem sistemas."),
+        ("John Wick", ["Keanu Reeves"], "Um assassino aposentado volta à ação."),
+        ("Interestelar", ["Anne Hathaway"], "Viagem por um buraco de minhoca."),
+    ]
+    for titulo, elenco, sinopse in dados:
+        MovieService.create_movie(db_session, FilmeCreate(
+            titulo=titulo, genero="Ação", duracao=100, ano=2000,
+            diretor="Diretor", elenco=elenco, sinopse=sinopse,
+        ))
+    # O mesmo termo no título pesa mais que na sinopse
+    resultado, _ = MovieService.search_movies(db_session, "hacker")
+    assert [f.titulo for f in resultado] == ["O Hacker", "Matrix"]
+    # Busca por ator, sem acentuação, paginada por cursor
+    primeira, cursor = MovieService.search_movies(db_session, "keanu", limit=1)
+    segunda, fim = MovieService.search_movies(db_session, "keanu", cursor=cursor, limit=1)
+    assert {f.titulo for f in primeira + segunda} == {"Matrix", "John Wick"}
+    assert fim is None
+    assert [f.titulo for f in MovieService.search_movies(db_session, "acao")[0]] == ["John Wick"]
+    # O índice acompanha atualizações e remoções
+    filme = MovieService.search_movies(db_session, "interestelar")[0][0]
+    MovieService.update_movie(db_session, filme.id, FilmeUpdate(titulo="Interstellar"))
+    assert MovieService.search_movies(db_session, "interestelar")[0] == []
+    MovieService.delete_movie(db_session, filme.id)
+    assert MovieService.search_movies(db_session, "interstellar")[0] == []
+
+def test_elenco_normalizado(db_session):
+    def criar(titulo, elenco):
+        return MovieService.create_movie(db_session, FilmeCreate(
+            titulo=titulo, genero="Ação", duracao=100, ano=2000,
+            diretor="Diretor", elenco=elenco,
+        ))
+    matrix = criar("Matrix", ["Keanu Reeves", "Carrie-Anne Moss"])
+    criar("John Wick", ["Keanu Reeves", "Ian McShane"])
+    criar("Speed", ["Sandra Bullock", "Keanu Reeves"])
+    # Ordem de créditos preservada e uma única pessoa por nome
+    assert matrix.elenco == ["Keanu Reeves", "Carrie-Anne Moss"]
+    assert db_session.query(Pessoa).count() == 4
+    keanu = PersonService.get_person_by_name(db_session, "Keanu Reeves")
+    primeira, cursor = PersonService.list_movies(db_session, keanu.id, limit=2)
+    segunda, fim = PersonService.list_movies(db_session, keanu.id, cursor=cursor, limit=2)
+    assert [f.titulo for f in primeira + segunda] == ["John Wick", "Matrix", "Speed"]
+    assert fim is None
+    assert [f.titulo for f in MovieService.list_movies(db_session, ator="Ian McShane")] == ["John Wick"]
+    # Atualizar o elenco reaproveita as pessoas existentes
+    MovieService.update_movie(db_session, matrix.id, FilmeUpdate(elenco=["Laurence Fishburne", "Keanu Reeves"]))
+    assert MovieService.get_movie(db_session, matrix.id).elenco == ["Laurence Fishburne", "Keanu Reeves"]
+    assert db_session.query(Pessoa).count() == 5
+    assert MovieService.list_movies_keyset(db_session, ator="Carrie-Anne Moss")[0] == []
+    # Nomes maiores que pessoas.nome são recusados na validação, não pelo banco
+    with pytest.raises(ValidationError, match="elenco.0"):
+        FilmeUpdate(elenco=["x" * 201])
+
+def test_filmeout_traz_quem_favoritou(db_session):
+    def criar(titulo):
+        return MovieService.create_movie(db_session, FilmeCreate(
+            titulo=titulo, genero="Ação", duracao=100, ano=2000, diretor="Diretor", elenco=["Keanu Reeves"],
+        ))
+    matrix, wick = criar("Matrix"), criar("John Wick")
+    assert schemas.FilmeOut.model_validate(matrix).usuarios_favoritaram == []
+    neo = Usuario(nome="Neo", email="neo@exemplo.com", senha="x", data_nascimento=date(1964, 9, 2))
+    trinity = Usuario(nome="Trinity", email="trinity@exemplo.com", senha="x", data_nascimento=date(1967, 8, 21))
+    db_session.add_all([neo, trinity])
+    db_session.commit()
+    UserService.add_movies_to_list(db_session, neo.id, "favoritos", [matrix.id, wick.id])
+    UserService.add_favorite(db_session, trinity.id, matrix.id)
+    RatingService.create_rating(db_session, AvaliacaoCreate(nota=9, usuario_id=trinity.id, filme_id=matrix.id))
+    RankingService.rebuild(db_session)
+    db_session.add(FilmeVizinho(filme_id=matrix.id, vizinho_id=wick.id, similaridade=0.9, calculado_em=datetime.now(timezone.utc)))
+    db_session.commit()
+    matrix_id, wick_id, neo_id, trinity_id = matrix.id, wick.id, neo.id, trinity.id
+    esperado = {matrix_id: {neo_id, trinity_id}, wick_id: {neo_id}}
+    db_session.expunge_all()
+
+    def conferir(filmes):
+        # Toda resposta com FilmeOut carrega quem favoritou (lazy="raise" falharia se não carregasse)
+        assert filmes
+        for filme in filmes:
+            assert set(schemas.FilmeOut.model_validate(filme).usuarios_favoritaram) == esperado[filme.id]
+
+    keanu = PersonService.get_person_by_name(db_session, "Keanu Reeves")
+    conferir([MovieService.get_movie(db_session, matrix_id, load_favorites=True)])
+    conferir([MovieService.update_movie(db_session, wick_id, FilmeUpdate(duracao=101))])
+    conferir(MovieService.list_movies(db_session))
+    conferir(MovieService.list_movies_keyset(db_session)[0])
+    conferir(MovieService.search_movies(db_session, "matrix")[0])
+    conferir(PersonService.list_movies(db_session, keanu.id)[0])
+    conferir(UserService.list_movies_in_list(db_session, neo_id, "favoritos")[0])
+    conferir([item["filme"] for item in RankingService.get_ranking(db_session)])
+    conferir([item["filme"] for item in CooccurrenceService.related(db_session, matrix_id)])
+    conferir([item["filme"] for item in RecommendationService.recommend(db_session, trinity_id)])
+    usuario = schemas.UsuarioOut.model_validate(UserService.get_user(db_session, neo_id, listas=True))
+    assert {uid for filme in usuario.filmes_favoritos for uid in filme.usuarios_favoritaram} == {neo_id, trinity_id}
+    # Sem carregamento explícito, acessar a coleção é um erro, não uma lista vazia
+    db_session.expunge_all()
+    with pytest.raises(InvalidRequestError):
+        db_session.get(Filme, matrix_id).usuarios_favoritaram
+    assert MovieService.delete_movie(db_session, matrix_id)
+
+def test_import_movies(db_session):
+    ndjson = [
+        '{"titulo": "Matrix", "genero": "Ação", "duracao": 136, "ano": 1999, "diretor": "Wachowski", "elenco": ["Keanu Reeves"]}\n',
+        '{"titulo": "Sem duração", "genero": "Ação", "ano": 1999, "diretor": "X", "elenco": []}\n',
+        '\n',
+        '{"titulo": "Quebrado"\n',
+        '{"titulo": "John Wick", "genero": "Ação", "duracao": 101, "ano": 2014, "diretor": "Stahelski", "elenco": ["Keanu Reeves", "Ian McShane"]}\n',
+    ]
+    resultado = ImportService.import_movies(db_session, ler_ndjson(ndjson), tamanho_lote=1)
+    assert resultado["importados"] == 2
+    assert [erro["linha"] for erro in resultado["erros"]] == [2, 4]
+    assert "duracao" in resultado["erros"][0]["erro"]
+
+    csv_linhas = [
+        "titulo,genero,duracao,ano,diretor,elenco,sinopse\n",
+        'Speed,Ação,116,1994,Jan de Bont,Keanu Reeves|Sandra Bullock,"Um ônibus, uma bomba"\n',
+        "Ruim,Ação,longo,1994,X,,\n",
+    ]
+    resultado = ImportService.import_movies(db_session, ler_csv(csv_linhas))
+    assert resultado["importados"] == 1 and resultado["total_erros"] == 1
+    assert resultado["erros"][0]["linha"] == 3
+
+    # Pessoas compartilhadas, ordem de créditos, sinopse e índice de busca
+    assert db_session.query(Pessoa).count() == 3
+    keanu = PersonService.get_person_by_name(db_session, "Keanu Reeves")
+    assert [f.titulo for f in PersonService.list_movies(db_session, keanu.id)[0]] == ["John Wick", "Matrix", "Speed"]
+    speed = MovieService.search_movies(db_session, "bomba")[0][0]
+    assert speed.elenco == ["Keanu Reeves", "Sandra Bullock"]
+    assert speed.sinopse == "Um ônibus, uma bomba"
+
+def test_export_movies(db_session):
+    MovieService.create_movie(db_session, FilmeCreate(
+        titulo="Matrix", genero="Ação", duracao=136, ano=1999, diretor="Wachowski",
+        elenco=["Keanu Reeves", "Carrie-Anne Moss"], sinopse="Linha 1\nLinha 2, com vírgula",
+    ))
+    ndjson = "".join(ExportService.export_movies(db_session, "ndjson"))
+    assert json.loads(ndjson)["elenco"] == ["Keanu Reeves", "Carrie-Anne Moss"]
+    # O CSV exportado é aceito pela importação
+    csv_texto = "".join(ExportService.export_movies(db_session, "csv"))
+    resultado = ImportService.import_movies(db_session, ler_csv(io.StringIO(csv_texto, newline="")))
+    assert resultado["importados"] == 1
+    copias = MovieService.list_movies(db_session)
+    assert [f.elenco for f in copias] == [["Keanu Reeves", "Carrie-Anne Moss"]] * 2
+    assert {f.sinopse for f in copias} == {"Linha 1\nLinha 2, com vírgula"}
@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Filme, Usuario
+from app.schemas import AvaliacaoCreate
+from app.services.movie_service import MovieService
+from app.services.ranking_service import RankingService
+from app.services.rating_service import RatingService
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_ranking_bayesiano(db):
+    filmes = {
+        "Unanime": Filme(titulo="Unanime", genero="Drama", duracao=100, ano=1994, diretor="D"),
+        "Consagrado": Filme(titulo="Consagrado", genero="Drama", duracao=100, ano=2001, diretor="D"),
+        "Mediano": Filme(titulo="Mediano", genero="Drama", duracao=100, ano=1999, diretor="D"),
+        "Outro": Filme(titulo="Outro", genero="Ação", duracao=100, ano=2005, diretor="D"),
+    }
+    usuarios = [Usuario(nome=f"U{i}", email=f"u{i}@exemplo.com", senha="x", data_nascimento=date(1990, 1, 1)) for i in range(20)]
+    db.add_all([*filmes.values(), *usuarios])
+    db.commit()
+    # Uma única nota 10 não supera vinte notas 9
+    RatingService.create_rating(db, AvaliacaoCreate(nota=10, usuario_id=usuarios[0].id, filme_id=filmes["Unanime"].id))
+    RatingService.create_rating(db, AvaliacaoCreate(nota=7, usuario_id=usuarios[0].id, filme_id=filmes["Outro"].id))
+    for usuario in usuarios:
+        RatingService.create_rating(db, AvaliacaoCreate(nota=9, usuario_id=usuario.id, filme_id=filmes["Consagrado"].id))
+        RatingService.create_rating(db, AvaliacaoCreate(nota=5, usuario_id=usuario.id, filme_id=filmes["Mediano"].id))
+
+    assert RankingService.get_ranking(db) == []
+    assert RankingService.rebuild(db) == {"rankings": 5, "posicoes": 12}
+
+    geral = RankingService.get_ranking(db)
+    assert [item["filme"].titulo for item in geral] == ["Consagrado", "Unanime", "Outro", "Mediano"]
+    assert geral[1]["media"] == 10 and geral[1]["total"] == 1
+    assert geral[1]["nota"] < geral[0]["nota"]
+    assert [item["filme"].titulo for item in RankingService.get_ranking(db, genero="Drama")] == ["Consagrado", "Unanime", "Mediano"]
+    assert [item["filme"].titulo for item in RankingService.get_ranking(db, decada=1997)] == ["Unanime", "Mediano"]
+    assert [item["filme"].titulo for item in RankingService.get_ranking(db, genero="Ação")] == ["Outro"]
+    assert [item["posicao"] for item in RankingService.get_ranking(db, limit=2)] == [1, 2]
+    with pytest.raises(HTTPException) as exc:
+        RankingService.get_ranking(db, genero="Drama", decada=1990)
+    assert exc.value.status_code == 400
+
+    MovieService.delete_movie(db, filmes["Consagrado"].id)
+    assert [item["filme"].titulo for item in RankingService.get_ranking(db, genero="Drama")] == ["Unanime", "Mediano"]
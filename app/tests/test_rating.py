@@ -1,9 +1,11 @@
 import pytest
+from datetime import date
+from fastapi import HTTPException
 from uuid import uuid4
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
-from app.models import Base, Usuario, Filme, Avaliacao
+from app.models import Base, Usuario, Filme, Avaliacao, FilmeEstatisticas
 from app.schemas import AvaliacaoCreate, AvaliacaoUpdate
 from app.services.rating_service import RatingService
 
@@ -21,21 +23,21 @@ def db():
     session.close()
     Base.metadata.drop_all(bind=engine)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def usuario(db):
     user = Usuario(
         id=uuid4(),
         nome="Usuário Teste",
         email="teste@exemplo.com",
         senha="senha123",
-        data_nascimento="1990-01-01"
+        data_nascimento=date(1990, 1, 1)
     )
     db.add(user)
     db.commit()
     db.refresh(user)
     return user
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def filme(db):
     movie = Filme(
         id=uuid4(),
@@ -97,3 +99,151 @@ def test_delete_rating(db, usuario, filme):
     RatingService.delete_rating(db, avaliacao.id)
     deleted = db.query(Avaliacao).filter_by(id=avaliacao.id).first()
     assert deleted is None
+
+def test_rating_stats_follow_writes(db, usuario, filme):
+    avaliacao = RatingService.create_rating(
+        db, AvaliacaoCreate(nota=8, usuario_id=usuario.id, filme_id=filme.id)
+    )
+    assert filme.estatisticas.total == 1
+    assert filme.estatisticas.media == 8
+    assert filme.estatisticas.histograma[8] == 1
+
+    RatingService.update_rating(db, avaliacao.id, AvaliacaoUpdate(nota=6))
+    assert filme.estatisticas.media == 6
+    assert filme.estatisticas.histograma[6] == 1
+    assert filme.estatisticas.histograma[8] == 0
+
+    RatingService.delete_rating(db, avaliacao.id)
+    assert filme.estatisticas.total == 0
+    assert filme.estatisticas.media is None
+
+def test_rebuild_stats(db, usuario, filme):
+    RatingService.create_rating(db, AvaliacaoCreate(nota=10, usuario_id=usuario.id, filme_id=filme.id))
+    # Simula um agregado divergente e reconcilia a partir de `avaliacoes`
+    db.query(FilmeEstatisticas).update({"total": 42, "soma": 0, "nota_10": 0})
+    db.commit()
+    assert RatingService.rebuild_stats(db) == 1
+    assert filme.estatisticas.total == 1
+    assert filme.estatisticas.histograma[10] == 1
+    assert filme.estatisticas.media == 10
+
+def _novo_usuario(db, email):
+    user = Usuario(nome=email, email=email, senha="x", data_nascimento=date(1990, 1, 1))
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _novo_filme(db, titulo):
+    movie = Filme(titulo=titulo, genero="Drama", duracao=100, ano=2020, diretor="Diretor", elenco=[], sinopse="")
+    db.add(movie)
+    db.commit()
+    return movie
+
+
+def test_upsert_ratings(db):
+    usuario = _novo_usuario(db, "lote@exemplo.com")
+    outro = _novo_usuario(db, "outro@exemplo.com")
+    filme = _novo_filme(db, "Filme do Lote")
+    existente = RatingService.create_rating(db, AvaliacaoCreate(nota=10, usuario_id=usuario.id, filme_id=filme.id))
+    resultado = RatingService.upsert_ratings(db, [
+        AvaliacaoCreate(nota=4, comentario="Revisto", usuario_id=usuario.id, filme_id=filme.id),
+        AvaliacaoCreate(nota=2, usuario_id=outro.id, filme_id=filme.id),
+        AvaliacaoCreate(nota=7, usuario_id=outro.id, filme_id=filme.id),
+        AvaliacaoCreate(nota=5, usuario_id=uuid4(), filme_id=filme.id),
+        AvaliacaoCreate(nota=5, usuario_id=outro.id, filme_id=uuid4()),
+    ])
+    assert [item["status"] for item in resultado["itens"]] == ["atualizada", "ignorada", "criada", "erro", "erro"]
+    assert (resultado["criadas"], resultado["atualizadas"], resultado["ignoradas"], resultado["erros"]) == (1, 1, 1, 2)
+    assert resultado["itens"][0]["id"] == existente.id
+    db.refresh(existente)
+    assert (existente.nota, existente.comentario, existente.versao) == (4, "Revisto", 2)
+    db.refresh(filme.estatisticas)
+    assert filme.estatisticas.total == 2
+    assert filme.estatisticas.media == 5.5
+    assert filme.estatisticas.histograma[4] == filme.estatisticas.histograma[7] == 1
+    assert filme.estatisticas.histograma[10] == 0
+
+
+def test_upsert_ratings_com_escrita_concorrente(tmp_path):
+    # Duas engines no mesmo arquivo: a segunda grava a mesma avaliação logo
+    # antes do INSERT do lote, depois de qualquer leitura que o lote já tenha feito
+    url = f"sqlite:///{tmp_path / 'concorrente.db'}"
+    principal, concorrente = create_engine(url), create_engine(url)
+    Base.metadata.create_all(bind=principal)
+    db = sessionmaker(bind=principal)()
+    outra = sessionmaker(bind=concorrente)()
+    usuario = _novo_usuario(db, "concorrente@exemplo.com")
+    filme = _novo_filme(db, "Filme Disputado")
+    usuario_id, filme_id = usuario.id, filme.id
+
+    def gravar_antes(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO avaliacoes") and not outra.info.get("gravou"):
+            outra.info["gravou"] = True
+            RatingService.create_rating(outra, AvaliacaoCreate(nota=3, usuario_id=usuario_id, filme_id=filme_id))
+
+    event.listen(principal, "before_cursor_execute", gravar_antes)
+    try:
+        resultado = RatingService.upsert_ratings(db, [AvaliacaoCreate(nota=9, usuario_id=usuario_id, filme_id=filme_id)])
+    finally:
+        event.remove(principal, "before_cursor_execute", gravar_antes)
+    # A linha gravada pela outra transação é atualizada, não contada como nova
+    assert [item["status"] for item in resultado["itens"]] == ["atualizada"]
+    estatisticas = db.get(FilmeEstatisticas, filme_id)
+    db.refresh(estatisticas)
+    assert (estatisticas.total, estatisticas.media) == (1, 9)
+    assert estatisticas.histograma[9] == 1
+    assert estatisticas.histograma[3] == 0
+    outra.close()
+    db.close()
+
+
+def test_delete_rating_apos_escrita_concorrente(tmp_path):
+    # A sessão que remove já tem a avaliação carregada (nota 8, versão 1)
+    # quando outra sessão a altera: a remoção parte da linha atual, sem
+    # StaleDataError e sem descontar a nota antiga dos agregados
+    url = f"sqlite:///{tmp_path / 'remocao.db'}"
+    Base.metadata.create_all(bind=create_engine(url))
+    db = sessionmaker(bind=create_engine(url))()
+    outra = sessionmaker(bind=create_engine(url))()
+    usuario = _novo_usuario(db, "remocao@exemplo.com")
+    filme = _novo_filme(db, "Filme Removido")
+    avaliacao = RatingService.create_rating(db, AvaliacaoCreate(nota=8, usuario_id=usuario.id, filme_id=filme.id))
+    assert avaliacao.nota == 8
+
+    RatingService.update_rating(outra, avaliacao.id, AvaliacaoUpdate(nota=3))
+    RatingService.delete_rating(db, avaliacao.id)
+    estatisticas = db.get(FilmeEstatisticas, filme.id)
+    db.refresh(estatisticas)
+    assert (estatisticas.total, estatisticas.soma) == (0, 0)
+    assert estatisticas.histograma[3] == 0
+    assert estatisticas.histograma[8] == 0
+
+    # Já removida por outra sessão: 404, não 500
+    avaliacao = RatingService.create_rating(db, AvaliacaoCreate(nota=5, usuario_id=usuario.id, filme_id=filme.id))
+    RatingService.delete_rating(outra, avaliacao.id)
+    with pytest.raises(HTTPException) as exc:
+        RatingService.delete_rating(db, avaliacao.id)
+    assert exc.value.status_code == 404
+    outra.close()
+    db.close()
+
+
+def test_versoes_e_if_match(db):
+    usuario = _novo_usuario(db, "versoes@exemplo.com")
+    filme = _novo_filme(db, "Filme Versionado")
+    avaliacao = RatingService.create_rating(db, AvaliacaoCreate(nota=8, usuario_id=usuario.id, filme_id=filme.id))
+    db.refresh(filme)
+    versao_filme = filme.versao
+    versao = RatingService.get_rating_version(db, avaliacao.id).versao
+    # If-Match com a versão atual: atualiza e incrementa a avaliação e o filme
+    atualizada = RatingService.update_rating(db, avaliacao.id, AvaliacaoUpdate(nota=6), versoes={versao})
+    assert atualizada.versao == versao + 1
+    db.refresh(filme)
+    assert filme.versao > versao_filme
+    # Versão antiga: 412 e nada muda
+    with pytest.raises(HTTPException) as exc:
+        RatingService.update_rating(db, avaliacao.id, AvaliacaoUpdate(nota=1), versoes={versao})
+    assert exc.value.status_code == 412
+    db.rollback()
+    assert RatingService.get_rating(db, avaliacao.id).nota == 6
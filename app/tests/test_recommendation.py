@@ -0,0 +1,87 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Avaliacao, Base, Filme, FilmeVizinho, Usuario
+from app.schemas import AvaliacaoCreate
+from app.services import recommendation_service
+from app.services.movie_service import MovieService
+from app.services.rating_service import RatingService
+from app.services.recommendation_service import RecommendationService
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def _popular(db):
+    filmes = {titulo: Filme(titulo=titulo, genero="Drama", duracao=100, ano=2000, diretor="D") for titulo in "ABCD"}
+    usuarios = [Usuario(nome=f"U{i}", email=f"u{i}@exemplo.com", senha="x", data_nascimento=date(1990, 1, 1)) for i in range(5)]
+    db.add_all([*filmes.values(), *usuarios])
+    db.flush()
+    # Quem gosta de A acima da média também gosta de B; o mesmo para C e D
+    notas = [
+        (0, {"A": 10, "B": 9, "C": 2, "D": 1}),
+        (1, {"A": 6, "B": 5, "C": 6, "D": 7}),
+        (2, {"A": 9, "B": 10, "C": 3, "D": 2}),
+        (3, {"A": 5, "B": 4, "C": 7, "D": 8}),
+        (4, {"A": 10, "C": 1}),
+    ]
+    for indice, avaliacoes in notas:
+        for titulo, nota in avaliacoes.items():
+            db.add(Avaliacao(usuario_id=usuarios[indice].id, filme_id=filmes[titulo].id, nota=nota))
+    db.commit()
+    return filmes, usuarios
+
+
+def _vizinhos(db):
+    return {
+        (linha.filme_id, linha.vizinho_id): round(linha.similaridade, 6)
+        for linha in db.scalars(select(FilmeVizinho))
+    }
+
+
+def test_recomendacoes(db):
+    filmes, usuarios = _popular(db)
+    assert RecommendationService.recommend(db, usuarios[4].id) == []
+    resultado = RecommendationService.refresh_neighbors(db)
+    assert resultado["modo"] == "completo" and resultado["vizinhos"] > 0
+
+    recomendados = RecommendationService.recommend(db, usuarios[4].id)
+    # B é parecido com A (nota 10); D com C (nota 1)
+    assert [item["filme"].titulo for item in recomendados] == ["B", "D"]
+    assert recomendados[0]["nota_prevista"] > recomendados[1]["nota_prevista"]
+
+    # Filmes assistidos não são recomendados
+    usuarios[4].filmes_assistidos.append(filmes["B"])
+    db.commit()
+    assert [item["filme"].titulo for item in RecommendationService.recommend(db, usuarios[4].id)] == ["D"]
+
+    # Remover o filme o retira das listas de vizinhos
+    MovieService.delete_movie(db, filmes["D"].id)
+    assert all(filmes["D"].id not in par for par in _vizinhos(db))
+
+
+def test_atualizacao_incremental(db, monkeypatch):
+    monkeypatch.setattr(recommendation_service, "FRACAO_MAXIMA_INCREMENTAL", 1.0)
+    filmes, usuarios = _popular(db)
+    RecommendationService.refresh_neighbors(db)
+    # Recua os relógios para que só o filme avaliado a seguir conte como alterado
+    db.execute(FilmeVizinho.__table__.update().values(calculado_em=datetime(2020, 1, 2)))
+    db.execute(Filme.__table__.update().values(atualizado_em=datetime(2020, 1, 1)))
+    db.commit()
+    RatingService.create_rating(db, AvaliacaoCreate(nota=2, usuario_id=usuarios[4].id, filme_id=filmes["D"].id))
+
+    resultado = RecommendationService.refresh_neighbors(db)
+    assert (resultado["modo"], resultado["filmes"]) == ("incremental", 1)
+    incremental = _vizinhos(db)
+    RecommendationService.refresh_neighbors(db, completo=True)
+    assert incremental == _vizinhos(db)
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import serialization
+from app.cache import filmes_cache
+from app.models import Base, Usuario
+from app.schemas import AvaliacaoCreate, FilmeCreate, UsuarioCreate
+from app.services.movie_service import AsyncMovieService, MovieService
+from app.services.rating_service import RatingService
+from app.services.user_service import AsyncUserService, UserService
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autoflush=False, bind=engine)()
+    filmes = [
+        MovieService.create_movie(session, FilmeCreate(
+            titulo=f"Filme {i}", genero="Drama", duracao=100 + i, ano=2000 + i, diretor="Diretora",
+            elenco=[f"Ator {i}", "Atriz Comum"], sinopse=None if i % 2 else "Sinopse",
+        ))
+        for i in range(5)
+    ]
+    for i in range(3):
+        session.add(Usuario(nome=f"Usuário {i}", email=f"u{i}@exemplo.com", senha="x", data_nascimento=date(1990, 1, i + 1)))
+    session.commit()
+    usuario, outro = session.query(Usuario).limit(2).all()
+    RatingService.create_rating(session, AvaliacaoCreate(nota=7, usuario_id=usuario.id, filme_id=filmes[0].id))
+    UserService.add_favorite(session, usuario.id, filmes[1].id)
+    UserService.add_favorite(session, outro.id, filmes[1].id)
+    UserService.add_favorite(session, outro.id, filmes[3].id)
+    filmes_cache.clear()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def _nos_dois_caminhos(monkeypatch, gerar):
+    """Payloads (decodificados) pelo caminho rápido e pelos schemas, sem o cache entre eles."""
+    payloads = []
+    for rapida in (True, False):
+        monkeypatch.setattr(serialization, "SERIALIZACAO_RAPIDA", rapida)
+        filmes_cache.clear()
+        payload = json.loads(gerar())
+        # A ordem de quem favoritou não é definida em nenhum dos caminhos
+        for filme in payload["itens"] if isinstance(payload, dict) else payload:
+            if "usuarios_favoritaram" in filme:
+                filme["usuarios_favoritaram"].sort()
+        payloads.append(payload)
+    return payloads
+
+
+def test_filmes_iguais_aos_schemas(db, monkeypatch):
+    rapida, schemas = _nos_dois_caminhos(monkeypatch, lambda: MovieService.list_movies_json(db, limit=10))
+    assert rapida == schemas
+    assert [list(filme) for filme in rapida] == [list(filme) for filme in schemas]
+    avaliado = next(filme for filme in rapida if filme["estatisticas"])
+    assert avaliado["estatisticas"] == {"total": 1, "media": 7.0, "histograma": [0] * 7 + [1] + [0] * 3}
+    assert sorted(len(filme["usuarios_favoritaram"]) for filme in rapida) == [0, 0, 0, 1, 2]
+
+    # Paginação por cursor, página a página
+    cursor = ""
+    while cursor is not None:
+        rapida, schemas = _nos_dois_caminhos(
+            monkeypatch, lambda: MovieService.list_movies_json(db, limit=2, cursor=cursor)
+        )
+        assert rapida == schemas
+        cursor = rapida["next_cursor"]
+    rapida, schemas = _nos_dois_caminhos(monkeypatch, lambda: MovieService.list_movies_json(db, ator="Atriz Comum"))
+    assert rapida == schemas and len(rapida) == 5
+
+
+def test_usuarios_iguais_aos_schemas(db, monkeypatch):
+    rapida, schemas = _nos_dois_caminhos(monkeypatch, lambda: UserService.list_users_json(db))
+    assert rapida == schemas
+    assert sorted(usuario["total_favoritos"] for usuario in rapida) == [0, 1, 2]
+    rapida, schemas = _nos_dois_caminhos(monkeypatch, lambda: UserService.list_users_json(db, limit=2, cursor=""))
+    assert rapida == schemas
+    assert len(rapida["itens"]) == 2 and rapida["next_cursor"]
+
+
+def test_caminho_rapido_assincrono(db, monkeypatch):
+    async_engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    sessoes = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def cenario():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessoes() as adb:
+            await AsyncMovieService.create_movie(adb, FilmeCreate(
+                titulo="Matrix", genero="Ficção", duracao=136, ano=1999, diretor="Wachowski", elenco=["Keanu Reeves"]
+            ))
+            await AsyncUserService.create_user(adb, UsuarioCreate(
+                nome="Neo", email="neo@exemplo.com", senha="senha123", data_nascimento=date(1964, 9, 2)
+            ))
+            payloads = {}
+            for rapida in (True, False):
+                monkeypatch.setattr(serialization, "SERIALIZACAO_RAPIDA", rapida)
+                filmes_cache.clear()
+                payloads[rapida] = (
+                    json.loads(await AsyncMovieService.list_movies_json(adb, cursor="")),
+                    json.loads(await AsyncUserService.list_users_json(adb, cursor="")),
+                )
+        await async_engine.dispose()
+        return payloads
+
+    payloads = asyncio.run(cenario())
+    assert payloads[True] == payloads[False]
+    assert payloads[True][0]["itens"][0]["elenco"] == ["Keanu Reeves"]
+    assert payloads[True][1]["itens"][0]["email"] == "neo@exemplo.com"
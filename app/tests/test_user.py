@@ -1,3 +1,4 @@
+import os
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -5,8 +6,23 @@ from sqlalchemy.pool import StaticPool
 from datetime import date
 from uuid import uuid4
 
-from app.models import Base, Usuario, Filme
+import threading
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.api.user_controller import get_current_user
+from app.cache import principais_cache
+from app.instrumentation import contar_consultas
+from app.models import Base, Usuario, Filme, FilmeCoocorrencia
 from app.schemas import UsuarioCreate, UsuarioUpdate
+from app.services import auth_service
+from app.services.cooccurrence_service import CooccurrenceService, favorites_lock_stmt
+from app.services.auth_service import HashingPool, authenticate_user, create_access_token
 from app.services.user_service import UserService
 
 # Configuração do banco de dados em memória para testes
@@ -52,6 +68,31 @@ def test_get_user(db):
     fetched = UserService.get_user(db, user.id)
     assert fetched.email == "teste@exemplo.com"
 
+def test_get_user_loads_lists_without_join(db):
+    from sqlalchemy import inspect
+
+    listas = ("usuario_filmes_favoritos", "usuario_filmes_assistidos", "usuario_filmes_em_espera")
+    user = UserService.create_user(db, UsuarioCreate(
+        nome="Listas", email="listas@exemplo.com", senha="senha123", data_nascimento=date(1990, 1, 1)
+    ))
+    user_id = user.id
+    db.expire(user)
+    assert {"filmes_favoritos", "filmes_assistidos", "filmes_em_espera"} <= inspect(user).unloaded
+    # Por padrão só os totais (UsuarioResumo), em uma consulta sem JOIN; as listas apenas com listas=True
+    with contar_consultas() as coletor:
+        fetched = UserService.get_user(db, user_id)
+    assert coletor.consultas == 1
+    assert "JOIN" not in next(iter(coletor.instrucoes))
+    assert not {"total_favoritos", "total_assistidos", "total_em_espera"} & inspect(fetched).unloaded
+    assert {"filmes_favoritos", "filmes_assistidos", "filmes_em_espera"} <= inspect(fetched).unloaded
+    db.expire(fetched)
+    with contar_consultas() as coletor:
+        fetched = UserService.get_user(db, user_id, listas=True)
+    assert not {"filmes_favoritos", "filmes_assistidos", "filmes_em_espera"} & inspect(fetched).unloaded
+    # Uma consulta por lista: nenhuma instrução junta duas listas (produto cartesiano)
+    com_join = [sql for sql in coletor.instrucoes if "JOIN" in sql]
+    assert all(sum(lista in sql for lista in listas) == 1 for sql in com_join) and len(com_join) == 3
+
 def test_list_users(db):
     users = UserService.list_users(db)
     assert len(users) >= 1
@@ -80,31 +121,175 @@ def test_add_and_remove_favorite(db):
 
     user = db.query(Usuario).filter(Usuario.email == "teste@exemplo.com").first()
     # Adiciona aos favoritos
-    user = UserService.add_favorite(db, user.id, filme.id)
-    assert any(f.id == filme.id for f in user.filmes_favoritos)
+    assert UserService.add_favorite(db, user.id, filme.id)["alterado"] is True
+    assert UserService.add_favorite(db, user.id, filme.id) == {
+        "filme_id": filme.id, "lista": "favoritos", "na_lista": True, "alterado": False
+    }
+    assert any(f.id == filme.id for f in UserService.get_user(db, user.id).filmes_favoritos)
     # Remove dos favoritos
-    user = UserService.remove_favorite(db, user.id, filme.id)
-    assert all(f.id != filme.id for f in user.filmes_favoritos)
+    assert UserService.remove_favorite(db, user.id, filme.id)["alterado"] is True
+    assert UserService.remove_favorite(db, user.id, filme.id)["alterado"] is False
+    assert all(f.id != filme.id for f in UserService.get_user(db, user.id).filmes_favoritos)
+    with pytest.raises(HTTPException) as exc:
+        UserService.add_favorite(db, user.id, uuid4())
+    assert exc.value.status_code == 404
 
 def test_add_and_remove_watched(db):
     filme = db.query(Filme).first()
     user = db.query(Usuario).filter(Usuario.email == "teste@exemplo.com").first()
     # Adiciona aos assistidos
-    user = UserService.add_watched(db, user.id, filme.id)
-    assert any(f.id == filme.id for f in user.filmes_assistidos)
+    UserService.add_watched(db, user.id, filme.id)
+    assert any(f.id == filme.id for f in UserService.get_user(db, user.id).filmes_assistidos)
     # Remove dos assistidos
-    user = UserService.remove_watched(db, user.id, filme.id)
-    assert all(f.id != filme.id for f in user.filmes_assistidos)
+    assert UserService.remove_watched(db, user.id, filme.id)["na_lista"] is False
+    assert all(f.id != filme.id for f in UserService.get_user(db, user.id).filmes_assistidos)
 
 def test_add_and_remove_waiting(db):
     filme = db.query(Filme).first()
     user = db.query(Usuario).filter(Usuario.email == "teste@exemplo.com").first()
     # Adiciona à lista de espera
-    user = UserService.add_waiting(db, user.id, filme.id)
-    assert any(f.id == filme.id for f in user.filmes_em_espera)
+    UserService.add_waiting(db, user.id, filme.id)
+    assert any(f.id == filme.id for f in UserService.get_user(db, user.id).filmes_em_espera)
     # Remove da lista de espera
-    user = UserService.remove_waiting(db, user.id, filme.id)
-    assert all(f.id != filme.id for f in user.filmes_em_espera)
+    UserService.remove_waiting(db, user.id, filme.id)
+    assert all(f.id != filme.id for f in UserService.get_user(db, user.id).filmes_em_espera)
+
+def test_current_user_cache(db):
+    principais_cache.clear()
+    user = db.query(Usuario).filter(Usuario.email == "teste@exemplo.com").first()
+    token = create_access_token(data={"sub": str(user.id)})
+    consultas = []
+
+    def contar(*args):
+        consultas.append(1)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        assert get_current_user(token, db).nome == user.nome
+        assert get_current_user(token, db).email == user.email
+        # A segunda requisição com o mesmo token não consulta o banco
+        assert len(consultas) == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    # Alterar o usuário invalida a identidade em cache
+    UserService.update_user(db, user.id, UsuarioUpdate(nome="Nome Novo"))
+    assert get_current_user(token, db).nome == "Nome Novo"
+    with pytest.raises(HTTPException):
+        get_current_user(create_access_token(data={"sub": str(uuid4())}), db)
+
+def test_hashing_pool_recusa_quando_saturado():
+    pool = HashingPool(workers=1, queue_size=1)
+    liberar = threading.Event()
+    pendentes = [pool.submit(liberar.wait), pool.submit(liberar.wait)]
+    with pytest.raises(HTTPException) as exc:
+        pool.submit(liberar.wait)
+    assert exc.value.status_code == 503
+    liberar.set()
+    assert all(futuro.result(timeout=5) for futuro in pendentes)
+    stats = pool.stats()
+    assert (stats["rejeitados"], stats["executando"], stats["na_fila"]) == (1, 0, 0)
+    assert stats["duracao"]["total"] == 2
+
+def test_login_refaz_hash_com_custo_antigo(db, monkeypatch):
+    monkeypatch.setattr(auth_service, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+    antigo = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("senha-antiga")
+    user = UserService.create_user(db, UsuarioCreate(
+        nome="Rehash", email="rehash@exemplo.com", senha=antigo, data_nascimento=date(1990, 1, 1)
+    ))
+    assert authenticate_user(db, "rehash@exemplo.com", "errada") is None
+    assert authenticate_user(db, "rehash@exemplo.com", "senha-antiga").id == user.id
+    db.refresh(user)
+    assert user.senha.startswith("$2b$05$")
+    assert authenticate_user(db, "rehash@exemplo.com", "senha-antiga").id == user.id
+
+def test_tambem_favoritaram(db):
+    filmes = [Filme(titulo=titulo, genero="Drama", duracao=100, ano=2000, diretor="D", elenco=[]) for titulo in "XYZ"]
+    usuarios = [
+        UserService.create_user(db, UsuarioCreate(nome=f"Fã {i}", email=f"fa{i}@exemplo.com", senha="x", data_nascimento=date(1990, 1, 1)))
+        for i in range(3)
+    ]
+    db.add_all(filmes)
+    db.commit()
+    x, y, z = filmes
+    for usuario, favoritos in zip(usuarios, ([x, y, z], [x, y], [x, z])):
+        for filme in favoritos:
+            UserService.add_favorite(db, usuario.id, filme.id)
+
+    def relacionados(filme):
+        return [(item["filme"].titulo, item["favoritos_em_comum"]) for item in CooccurrenceService.related(db, filme.id)]
+
+    def contagens():
+        return {(c.filme_id, c.outro_id): c.total for c in db.query(FilmeCoocorrencia).all()}
+
+    assert sorted(relacionados(x)) == [("Y", 2), ("Z", 2)]
+    assert relacionados(y) == [("X", 2), ("Z", 1)]
+    UserService.remove_favorite(db, usuarios[1].id, y.id)
+    assert relacionados(x)[0] == ("Z", 2) and sorted(relacionados(y)) == [("X", 1), ("Z", 1)]
+    UserService.delete_user(db, usuarios[0].id)
+    assert relacionados(y) == []
+    # A contagem incremental coincide com a reconstrução completa
+    incremental = contagens()
+    CooccurrenceService.rebuild(db)
+    assert contagens() == incremental == {(x.id, z.id): 1, (z.id, x.id): 1}
+    # Inclusões paralelas do mesmo usuário são serializadas pela trava na linha do usuário
+    assert str(favorites_lock_stmt(x.id).compile(dialect=postgresql.dialect())).endswith("FOR UPDATE")
+
+def test_listas_em_lote(db):
+    filmes = [Filme(titulo=titulo, genero="Drama", duracao=100, ano=2000, diretor="D", elenco=[]) for titulo in "KLM"]
+    db.add_all(filmes)
+    db.commit()
+    k, l, m = filmes
+    usuario = UserService.create_user(db, UsuarioCreate(nome="Lote", email="lote@exemplo.com", senha="x", data_nascimento=date(1990, 1, 1)))
+    UserService.add_favorite(db, usuario.id, k.id)
+    inexistente = uuid4()
+
+    resultado = UserService.add_movies_to_list(db, usuario.id, "favoritos", [k.id, l.id, m.id, l.id, inexistente])
+    assert resultado == {"alterados": 2, "ignorados": 1, "inexistentes": [inexistente]}
+    assert {f.id for f in UserService.get_user(db, usuario.id).filmes_favoritos} == {k.id, l.id, m.id}
+    resultado = UserService.add_movies_to_list(db, usuario.id, "assistidos", [k.id, l.id])
+    assert resultado == {"alterados": 2, "ignorados": 0, "inexistentes": []}
+
+    resultado = UserService.remove_movies_from_list(db, usuario.id, "favoritos", [l.id, m.id])
+    assert resultado == {"alterados": 2, "ignorados": 0, "inexistentes": []}
+    assert UserService.remove_movies_from_list(db, usuario.id, "em_espera", [k.id])["ignorados"] == 1
+    assert [f.id for f in UserService.get_user(db, usuario.id).filmes_favoritos] == [k.id]
+    assert len(UserService.get_user(db, usuario.id).filmes_assistidos) == 2
+    with pytest.raises(HTTPException) as exc:
+        UserService.add_movies_to_list(db, uuid4(), "favoritos", [k.id])
+    assert exc.value.status_code == 404
+
+    # As contagens de coocorrência seguem as operações em lote
+    UserService.add_movies_to_list(db, usuario.id, "favoritos", [l.id, m.id])
+    UserService.remove_movies_from_list(db, usuario.id, "favoritos", [m.id])
+    incremental = {(c.filme_id, c.outro_id): c.total for c in db.query(FilmeCoocorrencia).all()}
+    CooccurrenceService.rebuild(db)
+    assert {(c.filme_id, c.outro_id): c.total for c in db.query(FilmeCoocorrencia).all()} == incremental
+    assert incremental[(k.id, l.id)] == incremental[(l.id, k.id)] == 1 and (k.id, m.id) not in incremental
+
+def test_listas_paginadas(db):
+    filmes = [Filme(titulo=titulo, genero="Drama", duracao=100, ano=ano, diretor="D", elenco=[]) for titulo, ano in (("Cc", 1990), ("Aa", 2010), ("Bb", 2000))]
+    db.add_all(filmes)
+    db.commit()
+    usuario = UserService.create_user(db, UsuarioCreate(nome="Pag", email="pag@exemplo.com", senha="x", data_nascimento=date(1990, 1, 1)))
+    UserService.add_movies_to_list(db, usuario.id, "assistidos", [f.id for f in filmes])
+    UserService.add_waiting(db, usuario.id, filmes[0].id)
+
+    resumo = UserService.get_user(db, usuario.id)
+    assert (resumo.total_favoritos, resumo.total_assistidos, resumo.total_em_espera) == (0, 3, 1)
+
+    def titulos(ordem):
+        pagina, cursor = UserService.list_movies_in_list(db, usuario.id, "assistidos", ordem=ordem, limit=2)
+        resto, fim = UserService.list_movies_in_list(db, usuario.id, "assistidos", ordem=ordem, cursor=cursor, limit=2)
+        assert cursor is not None and fim is None
+        return [f.titulo for f in pagina + resto]
+
+    assert titulos("titulo") == ["Aa", "Bb", "Cc"]
+    assert titulos("-titulo") == ["Cc", "Bb", "Aa"]
+    assert titulos("-ano") == ["Aa", "Bb", "Cc"]
+    assert [f.titulo for f in UserService.list_movies_in_list(db, usuario.id, "em_espera")[0]] == ["Cc"]
+    with pytest.raises(HTTPException) as exc:
+        UserService.list_movies_in_list(db, usuario.id, "assistidos", ordem="duracao")
+    assert exc.value.status_code == 400
 
 def test_delete_user(db):
     user = db.query(Usuario).filter(Usuario.email == "teste@exemplo.com").first()
@@ -0,0 +1,8 @@
+"""
+Benchmarks de carga e latência da MovieTracker API.
+
+    python -m benchmarks.seed --perfil pequeno          # popula o banco de DATABASE_URL
+    python -m benchmarks.load --saida resultado.json    # sobe um servidor local e mede cada rota
+    python -m benchmarks.compare antes.json depois.json # diferença entre duas execuções
+    python -m benchmarks.serialization                  # serialização rápida x schemas nas listagens
+"""
@@ -0,0 +1,76 @@
+"""
+Compara dois resultados de benchmarks.load (por exemplo, antes e depois de
+um commit) rota a rota: vazão e p50/p95/p99, com a variação percentual.
+
+Uso:
+    python -m benchmarks.compare ANTES.json DEPOIS.json [--limite 10]
+
+Sai com código 1 se alguma rota piorar além de --limite por cento no p95
+(útil em CI); só informativo sem --falhar.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Optional
+
+METRICAS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def variacao(antes: float, depois: float) -> Optional[float]:
+    if not antes:
+        return None
+    return (depois - antes) / antes * 100
+
+
+def formatar(antes: float, depois: float) -> str:
+    delta = variacao(antes, depois)
+    sufixo = "" if delta is None else f" ({delta:+.1f}%)"
+    return f"{antes:g} -> {depois:g}{sufixo}"
+
+
+def comparar(antes: Dict, depois: Dict, limite: float):
+    """Linhas da tabela e as rotas cujo p95 piorou mais que `limite` por cento."""
+    linhas = []
+    regressoes = []
+    rotas = sorted(set(antes["rotas"]) | set(depois["rotas"]))
+    for rota in ["total", *rotas]:
+        a = antes["total"] if rota == "total" else antes["rotas"].get(rota)
+        d = depois["total"] if rota == "total" else depois["rotas"].get(rota)
+        if a is None or d is None:
+            linhas.append((rota, *(["ausente em um dos arquivos"] + [""] * (len(METRICAS) - 1))))
+            continue
+        linhas.append((rota, *(formatar(a[metrica], d[metrica]) for metrica in METRICAS)))
+        delta = variacao(a["p95_ms"], d["p95_ms"])
+        if rota != "total" and delta is not None and delta > limite:
+            regressoes.append((rota, delta))
+    return linhas, regressoes
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("antes")
+    parser.add_argument("depois")
+    parser.add_argument("--limite", type=float, default=10, help="Piora máxima aceitável do p95, em %%")
+    parser.add_argument("--falhar", action="store_true", help="Código de saída 1 se houver regressão")
+    args = parser.parse_args(argv)
+
+    with open(args.antes, encoding="utf-8") as arquivo:
+        antes = json.load(arquivo)
+    with open(args.depois, encoding="utf-8") as arquivo:
+        depois = json.load(arquivo)
+    if antes.get("dados") != depois.get("dados"):
+        print(f"Atenção: conjuntos de dados diferentes: {antes.get('dados')} x {depois.get('dados')}")
+
+    linhas, regressoes = comparar(antes, depois, args.limite)
+    cabecalho = ("rota", *METRICAS)
+    larguras = [max(len(str(linha[i])) for linha in [cabecalho, *linhas]) for i in range(len(cabecalho))]
+    for linha in [cabecalho, *linhas]:
+        print("  ".join(str(valor).ljust(largura) for valor, largura in zip(linha, larguras)))
+    for rota, delta in regressoes:
+        print(f"Regressão: {rota} p95 {delta:+.1f}%")
+    if regressoes and args.falhar:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
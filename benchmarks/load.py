@@ -0,0 +1,314 @@
+"""
+Gerador de carga HTTP: sobe a API localmente (uvicorn) sobre o banco de
+DATABASE_URL, já populado por benchmarks.seed, dispara requisições
+concorrentes em todas as rotas de leitura (e, com --escritas, nas escritas
+principais) e grava vazão e latências (p50/p95/p99) por rota num JSON
+comparável entre commits (ver benchmarks.compare).
+
+Uso:
+    python -m benchmarks.load [--saida resultado.json] [--duracao 30] [--concorrencia 32]
+                              [--aquecimento 5] [--workers 1] [--rotas REGEX] [--url URL] [--escritas]
+
+Com --url, mede um servidor já em execução em vez de subir um. As rotas de
+importação e exportação ficam de fora: seu custo cresce com o catálogo
+inteiro e é medido pela CLI. As escritas alteram os dados semeados (notas,
+listas em_espera), então rodadas com --escritas só são comparáveis entre si
+se o banco for semeado de novo antes de cada uma.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import func, select
+
+from app import database, models
+from benchmarks.seed import DOMINIO_EMAIL, SENHA_USUARIOS
+
+# Ids sorteados do banco para montar as requisições
+AMOSTRA = 1000
+
+
+@dataclass
+class Cenario:
+    """Uma rota (pelo template, que identifica o resultado) e como montar cada requisição."""
+    rota: str
+    peso: int
+    montar: Callable[[random.Random, "Dados"], Tuple[str, str, Optional[dict]]]
+    # Altera os dados semeados: só entra na carga com --escritas
+    escrita: bool = False
+
+
+@dataclass
+class Dados:
+    filmes: List[str]
+    usuarios: List[str]
+    avaliacoes: List[str]
+    pessoas: List[str]
+    pessoas_nomes: List[str]
+    generos: List[str]
+    termos: List[str]
+    email: str
+    token: str = ""
+
+
+def carregar_dados() -> Dados:
+    db = database.SessionLocal()
+    try:
+        def amostra(coluna) -> List[str]:
+            return [str(valor) for valor in db.scalars(select(coluna).order_by(func.random()).limit(AMOSTRA))]
+
+        filmes = amostra(models.Filme.id)
+        usuarios = amostra(models.Usuario.id)
+        if not filmes or not usuarios:
+            raise SystemExit("Banco vazio: rode antes `python -m benchmarks.seed`")
+        email = db.scalar(select(models.Usuario.email).where(models.Usuario.email.like(f"%@{DOMINIO_EMAIL}")).limit(1))
+        titulos = db.scalars(select(models.Filme.titulo).limit(AMOSTRA)).all()
+        return Dados(
+            filmes=filmes,
+            usuarios=usuarios,
+            avaliacoes=amostra(models.Avaliacao.id),
+            pessoas=amostra(models.Pessoa.id),
+            pessoas_nomes=amostra(models.Pessoa.nome),
+            generos=list(db.scalars(select(models.Filme.genero).distinct())),
+            termos=sorted({palavra for titulo in titulos for palavra in titulo.split() if not palavra.isdigit()}),
+            email=email,
+        )
+    finally:
+        db.close()
+
+
+def _get(caminho: str) -> Tuple[str, str, Optional[dict]]:
+    return "GET", caminho, None
+
+
+CENARIOS = [
+    Cenario("GET /filmes/", 8, lambda r, d: _get("/filmes/?cursor=&limit=20")),
+    Cenario("GET /filmes/?ator=", 2, lambda r, d: _get(f"/filmes/?cursor=&ator={r.choice(d.pessoas_nomes)}")),
+    Cenario("GET /filmes/{filme_id}", 20, lambda r, d: _get(f"/filmes/{r.choice(d.filmes)}")),
+    Cenario("GET /filmes/busca", 6, lambda r, d: _get(f"/filmes/busca?q={r.choice(d.termos)}")),
+    Cenario("GET /filmes/ranking", 4, lambda r, d: _get(f"/filmes/ranking?genero={r.choice(d.generos)}")),
+    Cenario("GET /filmes/{filme_id}/tambem_favoritaram", 4, lambda r, d: _get(f"/filmes/{r.choice(d.filmes)}/tambem_favoritaram")),
+    Cenario("GET /usuarios/", 3, lambda r, d: _get("/usuarios/?cursor=&limit=50")),
+    Cenario("GET /usuarios/{usuario_id}", 10, lambda r, d: _get(f"/usuarios/{r.choice(d.usuarios)}")),
+    Cenario("GET /usuarios/{usuario_id}/assistidos", 6, lambda r, d: _get(f"/usuarios/{r.choice(d.usuarios)}/assistidos?ordem=-ano")),
+    Cenario("GET /usuarios/{usuario_id}/favoritos", 4, lambda r, d: _get(f"/usuarios/{r.choice(d.usuarios)}/favoritos")),
+    Cenario("GET /usuarios/{usuario_id}/recomendacoes", 4, lambda r, d: _get(f"/usuarios/{r.choice(d.usuarios)}/recomendacoes")),
+    Cenario("GET /usuarios/me", 4, lambda r, d: ("GET", "/usuarios/me", {"headers": {"Authorization": f"Bearer {d.token}"}})),
+    Cenario("POST /usuarios/login", 1, lambda r, d: (
+        "POST", "/usuarios/login", {"data": {"username": d.email, "password": SENHA_USUARIOS}},
+    )),
+    Cenario("POST /usuarios/{usuario_id}/em_espera/{filme_id}", 3, lambda r, d: (
+        "POST", f"/usuarios/{r.choice(d.usuarios)}/em_espera/{r.choice(d.filmes)}", None,
+    ), escrita=True),
+    Cenario("DELETE /usuarios/{usuario_id}/em_espera/{filme_id}", 3, lambda r, d: (
+        "DELETE", f"/usuarios/{r.choice(d.usuarios)}/em_espera/{r.choice(d.filmes)}", None,
+    ), escrita=True),
+    Cenario("GET /avaliacoes/", 3, lambda r, d: _get("/avaliacoes/?cursor=&limit=50")),
+    Cenario("GET /avaliacoes/{avaliacao_id}", 6, lambda r, d: _get(f"/avaliacoes/{r.choice(d.avaliacoes)}")),
+    Cenario("PUT /avaliacoes/{avaliacao_id}", 3, lambda r, d: (
+        "PUT", f"/avaliacoes/{r.choice(d.avaliacoes)}", {"json": {"nota": r.randint(0, 10)}},
+    ), escrita=True),
+    Cenario("GET /pessoas/{pessoa_id}", 2, lambda r, d: _get(f"/pessoas/{r.choice(d.pessoas)}")),
+    Cenario("GET /pessoas/{pessoa_id}/filmes", 2, lambda r, d: _get(f"/pessoas/{r.choice(d.pessoas)}/filmes")),
+    Cenario("GET /diagnostico/cache", 1, lambda r, d: _get("/diagnostico/cache")),
+]
+
+
+class Medicoes:
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = {}
+        # Respostas por código HTTP ("erro" para falhas de conexão/timeout)
+        self.status: Dict[str, Dict[str, int]] = {}
+
+    def registrar(self, rota: str, segundos: float, status: str) -> None:
+        self.latencias.setdefault(rota, []).append(segundos * 1000)
+        contagem = self.status.setdefault(rota, {})
+        contagem[status] = contagem.get(status, 0) + 1
+
+
+def erros(status: Dict[str, int]) -> int:
+    return sum(total for codigo, total in status.items() if not codigo.isdigit() or int(codigo) >= 400)
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil pelo posto mais próximo (sem interpolação)."""
+    if not ordenados:
+        return 0.0
+    posto = max(1, -(-len(ordenados) * p // 100))
+    return ordenados[int(posto) - 1]
+
+
+def resumir(latencias: List[float], status: Dict[str, int], duracao: float) -> Dict:
+    ordenados = sorted(latencias)
+    return {
+        "requisicoes": len(ordenados),
+        "erros": erros(status),
+        "status": dict(sorted(status.items())),
+        "rps": round(len(ordenados) / duracao, 2),
+        "media_ms": round(sum(ordenados) / len(ordenados), 3) if ordenados else 0.0,
+        "p50_ms": round(percentil(ordenados, 50), 3),
+        "p95_ms": round(percentil(ordenados, 95), 3),
+        "p99_ms": round(percentil(ordenados, 99), 3),
+        "max_ms": round(ordenados[-1], 3) if ordenados else 0.0,
+    }
+
+
+async def executar(cliente: httpx.AsyncClient, cenarios: List[Cenario], dados: Dados,
+                   concorrencia: int, duracao: float, semente: int) -> Medicoes:
+    medicoes = Medicoes()
+    pesos = [cenario.peso for cenario in cenarios]
+    fim = time.perf_counter() + duracao
+
+    async def usuario_virtual(indice: int) -> None:
+        rng = random.Random(semente * 1000 + indice)
+        while time.perf_counter() < fim:
+            cenario = rng.choices(cenarios, pesos)[0]
+            metodo, caminho, opcoes = cenario.montar(rng, dados)
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente.request(metodo, caminho, **(opcoes or {}))
+                status = str(resposta.status_code)
+            except httpx.HTTPError:
+                status = "erro"
+            medicoes.registrar(cenario.rota, time.perf_counter() - inicio, status)
+
+    await asyncio.gather(*(usuario_virtual(i) for i in range(concorrencia)))
+    return medicoes
+
+
+def iniciar_servidor(porta: int, workers: int) -> subprocess.Popen:
+    comando = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(comando, env=os.environ.copy())
+
+
+def aguardar_servidor(url: str, processo: Optional[subprocess.Popen], limite: float = 30) -> None:
+    prazo = time.monotonic() + limite
+    while time.monotonic() < prazo:
+        if processo is not None and processo.poll() is not None:
+            raise SystemExit(f"O servidor terminou ao iniciar (código {processo.returncode})")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"O servidor não respondeu em {url} em {limite:.0f}s")
+
+
+def commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def contagens() -> Dict[str, int]:
+    db = database.SessionLocal()
+    try:
+        return {
+            nome: db.scalar(select(func.count()).select_from(modelo))
+            for nome, modelo in (("filmes", models.Filme), ("usuarios", models.Usuario), ("avaliacoes", models.Avaliacao))
+        }
+    finally:
+        db.close()
+
+
+async def medir(url: str, args) -> Dict:
+    dados = carregar_dados()
+    cenarios = [
+        cenario for cenario in CENARIOS
+        if re.search(args.rotas, cenario.rota) and (args.escritas or not cenario.escrita)
+    ]
+    if not dados.avaliacoes:
+        cenarios = [cenario for cenario in cenarios if "avaliacao_id" not in cenario.rota]
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limites) as cliente:
+        resposta = await cliente.post("/usuarios/login", data={"username": dados.email, "password": SENHA_USUARIOS})
+        dados.token = resposta.json().get("access_token", "") if resposta.status_code == 200 else ""
+        if args.aquecimento > 0:
+            await executar(cliente, cenarios, dados, args.concorrencia, args.aquecimento, args.semente)
+        inicio = time.perf_counter()
+        medicoes = await executar(cliente, cenarios, dados, args.concorrencia, args.duracao, args.semente)
+        duracao = time.perf_counter() - inicio
+
+    todas = [ms for latencias in medicoes.latencias.values() for ms in latencias]
+    status_total: Dict[str, int] = {}
+    for status in medicoes.status.values():
+        for codigo, total in status.items():
+            status_total[codigo] = status_total.get(codigo, 0) + total
+    return {
+        "commit": commit_atual(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "banco": database.engine.dialect.name,
+            "db_async": database.DB_ASYNC,
+        },
+        "parametros": {
+            "duracao": args.duracao,
+            "aquecimento": args.aquecimento,
+            "concorrencia": args.concorrencia,
+            "workers": args.workers,
+            "semente": args.semente,
+            "escritas": args.escritas,
+        },
+        "dados": contagens(),
+        "total": resumir(todas, status_total, duracao),
+        "rotas": {
+            cenario.rota: resumir(medicoes.latencias.get(cenario.rota, []), medicoes.status.get(cenario.rota, {}), duracao)
+            for cenario in cenarios
+        },
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Servidor já em execução (por padrão sobe um uvicorn local)")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Processos do uvicorn local")
+    parser.add_argument("--duracao", type=float, default=30, help="Segundos de medição")
+    parser.add_argument("--aquecimento", type=float, default=5, help="Segundos de carga descartados antes da medição")
+    parser.add_argument("--concorrencia", type=int, default=32, help="Requisições simultâneas")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--rotas", default=".", help="Expressão regular: só as rotas que casam")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--escritas", action="store_true",
+                        help="Inclui as rotas que alteram os dados (semeie o banco de novo antes de cada rodada)")
+    parser.add_argument("--saida", default="resultado.json")
+    args = parser.parse_args(argv)
+
+    processo = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.porta}"
+        processo = iniciar_servidor(args.porta, args.workers)
+    try:
+        aguardar_servidor(url, processo)
+        resultado = asyncio.run(medir(url, args))
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait(timeout=30)
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+    total = resultado["total"]
+    print(f"{total['requisicoes']} requisições, {total['rps']} req/s, p50 {total['p50_ms']} ms, "
+          f"p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms, {total['erros']} erros -> {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
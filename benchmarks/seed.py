@@ -0,0 +1,228 @@
+"""
+Gera um conjunto de dados sintético e reprodutível (mesma semente, mesmos
+dados) no banco de DATABASE_URL, com INSERTs em massa (COPY no PostgreSQL).
+
+A atividade dos usuários e a popularidade dos filmes seguem distribuições de
+cauda longa: poucos usuários avaliam milhares de filmes e poucos filmes
+concentram a maior parte das avaliações e das listas, como em produção.
+
+Uso:
+    python -m benchmarks.seed [--perfil pequeno|medio|grande] [--filmes N] [--usuarios N]
+                              [--avaliacoes N] [--semente N] [--criar-tabelas] [--sem-recomendacoes]
+
+Use um banco dedicado: os dados são acrescentados aos existentes.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import date
+from typing import Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import func, insert, select
+
+from app import database, models
+from app.services.auth_service import get_password_hash
+from app.services.cooccurrence_service import CooccurrenceService
+from app.services.import_service import ImportService
+from app.services.ranking_service import RankingService
+from app.services.rating_service import RatingService
+from app.services.recommendation_service import RecommendationService
+from app.services.sql_helpers import copy_rows
+
+PERFIS = {
+    "pequeno": {"filmes": 2_000, "usuarios": 500, "avaliacoes": 20_000},
+    "medio": {"filmes": 100_000, "usuarios": 10_000, "avaliacoes": 1_000_000},
+    "grande": {"filmes": 1_000_000, "usuarios": 100_000, "avaliacoes": 10_000_000},
+}
+
+# Tamanho médio de cada lista por usuário (a distribuição é de cauda longa)
+MEDIA_LISTAS = {
+    models.usuario_filmes_favoritos: 10,
+    models.usuario_filmes_assistidos: 50,
+    models.usuario_filmes_em_espera: 10,
+}
+
+# Credenciais dos usuários gerados: usuario<i>@DOMINIO_EMAIL / SENHA_USUARIOS
+SENHA_USUARIOS = "benchmark"
+DOMINIO_EMAIL = "benchmark.movietracker.com.br"
+
+LINHAS_POR_LOTE = 10_000
+
+GENEROS = ["Ação", "Aventura", "Animação", "Comédia", "Crime", "Documentário", "Drama", "Fantasia",
+           "Ficção Científica", "Guerra", "Musical", "Romance", "Suspense", "Terror", "Western"]
+PALAVRAS = ["noite", "cidade", "último", "segredo", "caminho", "sombra", "mar", "fogo", "tempo", "estrela",
+            "coração", "guerra", "silêncio", "viagem", "casa", "rio", "verão", "inverno", "sonho", "memória",
+            "lobo", "jardim", "espelho", "tempestade", "horizonte", "ilha", "labirinto", "promessa", "vento", "luz"]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Isabel", "João",
+         "Karina", "Lucas", "Marina", "Nuno", "Olívia", "Paulo", "Rafaela", "Sérgio", "Tatiana", "Vítor"]
+SOBRENOMES = ["Almeida", "Barbosa", "Costa", "Dias", "Esteves", "Ferreira", "Gomes", "Lima", "Moreira",
+              "Nunes", "Oliveira", "Pereira", "Rocha", "Santos", "Teixeira", "Vieira"]
+
+
+def indice_popular(rng: random.Random, n: int, expoente: float = 3.0) -> int:
+    """Índice em [0, n) com viés para os primeiros (cauda longa: u**expoente)."""
+    return min(n - 1, int(n * rng.random() ** expoente))
+
+
+def tamanho_cauda_longa(rng: random.Random, media: float, maximo: int) -> int:
+    # Pareto com alfa 1.5 tem média 3: normaliza para a média pedida
+    return min(maximo, int(round(media * rng.paretovariate(1.5) / 3)))
+
+
+def novo_id(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def amostra_popular(rng: random.Random, ids: List[uuid.UUID], quantidade: int) -> Set[uuid.UUID]:
+    escolhidos: Set[uuid.UUID] = set()
+    tentativas = 0
+    while len(escolhidos) < quantidade and tentativas < quantidade * 10:
+        escolhidos.add(ids[indice_popular(rng, len(ids))])
+        tentativas += 1
+    return escolhidos
+
+
+def gerar_filmes(rng: random.Random, total: int) -> Iterator[Tuple[int, Dict]]:
+    pessoas = max(10, total // 2)
+    for i in range(total):
+        palavras = rng.sample(PALAVRAS, rng.randint(1, 3))
+        elenco = {f"{NOMES[p % len(NOMES)]} {SOBRENOMES[p // len(NOMES) % len(SOBRENOMES)]} {p}"
+                  for p in (indice_popular(rng, pessoas, 2.0) for _ in range(rng.randint(2, 8)))}
+        yield i + 1, {
+            "titulo": f"{' '.join(palavras).capitalize()} {i}",
+            "genero": rng.choice(GENEROS),
+            "duracao": rng.randint(70, 200),
+            "ano": rng.randint(1930, 2025),
+            "diretor": f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}",
+            "elenco": sorted(elenco),
+            "sinopse": " ".join(rng.choices(PALAVRAS, k=rng.randint(10, 40))),
+        }
+
+
+def gravar(db, tabela, linhas: List[Dict]) -> None:
+    if not linhas:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        copy_rows(db, tabela, linhas)
+    else:
+        db.execute(insert(tabela), linhas)
+
+
+def semear(db, filmes: int, usuarios: int, avaliacoes: int, semente: int, recomendacoes: bool = True) -> Dict:
+    rng = random.Random(semente)
+    etapas: Dict[str, float] = {}
+
+    inicio = time.perf_counter()
+    resultado = ImportService.import_movies(db, gerar_filmes(rng, filmes))
+    if resultado["total_erros"]:
+        raise RuntimeError(f"Falha ao gerar filmes: {resultado['erros'][:5]}")
+    # Os títulos são determinísticos (os ids não): os primeiros são os "populares"
+    filme_ids = list(db.scalars(select(models.Filme.id).order_by(models.Filme.titulo)))
+    etapas["filmes"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    # Um único hash para todos: o custo do bcrypt não entra na carga de dados
+    senha = get_password_hash(SENHA_USUARIOS)
+    primeiro = db.scalar(select(func.count()).select_from(models.Usuario))
+    usuario_ids = []
+    lote = []
+    for i in range(primeiro, primeiro + usuarios):
+        usuario_id = novo_id(rng)
+        usuario_ids.append(usuario_id)
+        lote.append({
+            "id": usuario_id,
+            "nome": f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}",
+            "email": f"usuario{i}@{DOMINIO_EMAIL}",
+            "senha": senha,
+            "data_nascimento": date(rng.randint(1950, 2008), rng.randint(1, 12), rng.randint(1, 28)),
+        })
+        if len(lote) >= LINHAS_POR_LOTE:
+            gravar(db, models.Usuario.__table__, lote)
+            lote = []
+    gravar(db, models.Usuario.__table__, lote)
+    db.commit()
+    etapas["usuarios"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    media = avaliacoes / max(1, usuarios)
+    total_avaliacoes = 0
+    lote = []
+    for usuario_id in usuario_ids:
+        for filme_id in amostra_popular(rng, filme_ids, tamanho_cauda_longa(rng, media, len(filme_ids) // 2)):
+            lote.append({"id": novo_id(rng), "nota": rng.randint(0, 10), "comentario": None,
+                         "usuario_id": usuario_id, "filme_id": filme_id})
+        if len(lote) >= LINHAS_POR_LOTE:
+            gravar(db, models.Avaliacao.__table__, lote)
+            db.commit()
+            total_avaliacoes += len(lote)
+            lote = []
+    gravar(db, models.Avaliacao.__table__, lote)
+    db.commit()
+    total_avaliacoes += len(lote)
+    RatingService.rebuild_stats(db)
+    etapas["avaliacoes"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    totais_listas = {}
+    for tabela, media_lista in MEDIA_LISTAS.items():
+        total = 0
+        lote = []
+        for usuario_id in usuario_ids:
+            for filme_id in amostra_popular(rng, filme_ids, tamanho_cauda_longa(rng, media_lista, len(filme_ids) // 2)):
+                lote.append({"usuario_id": usuario_id, "filme_id": filme_id})
+            if len(lote) >= LINHAS_POR_LOTE:
+                gravar(db, tabela, lote)
+                total += len(lote)
+                lote = []
+        gravar(db, tabela, lote)
+        db.commit()
+        totais_listas[tabela.name] = total + len(lote)
+    etapas["listas"] = time.perf_counter() - inicio
+
+    # Estruturas derivadas que as rotas leem
+    inicio = time.perf_counter()
+    CooccurrenceService.rebuild(db)
+    RankingService.rebuild(db)
+    if recomendacoes:
+        RecommendationService.refresh_neighbors(db, completo=True)
+    etapas["derivados"] = time.perf_counter() - inicio
+
+    return {
+        "semente": semente,
+        "filmes": len(filme_ids),
+        "usuarios": len(usuario_ids),
+        "avaliacoes": total_avaliacoes,
+        "listas": totais_listas,
+        "segundos": {etapa: round(segundos, 2) for etapa, segundos in etapas.items()},
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.seed", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--perfil", choices=sorted(PERFIS), default="pequeno")
+    parser.add_argument("--filmes", type=int, help="Sobrescreve o número de filmes do perfil")
+    parser.add_argument("--usuarios", type=int, help="Sobrescreve o número de usuários do perfil")
+    parser.add_argument("--avaliacoes", type=int, help="Número aproximado de avaliações")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--criar-tabelas", action="store_true", help="Cria as tabelas (bancos de teste sem Alembic)")
+    parser.add_argument("--sem-recomendacoes", action="store_true", help="Não calcula filme_vizinhos (lento nos perfis grandes)")
+    args = parser.parse_args(argv)
+
+    tamanhos = dict(PERFIS[args.perfil])
+    for chave in tamanhos:
+        if getattr(args, chave) is not None:
+            tamanhos[chave] = getattr(args, chave)
+    if args.criar_tabelas:
+        models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        resumo = semear(db, semente=args.semente, recomendacoes=not args.sem_recomendacoes, **tamanhos)
+    finally:
+        db.close()
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compara o caminho rápido de serialização (projeções SQL + orjson, ver
+app/serialization.py) com o caminho pelos schemas pydantic em GET /filmes/ e
+GET /usuarios/, sobre o banco de DATABASE_URL já populado por benchmarks.seed.
+
+Mede as funções que as rotas chamam, sem HTTP e sem o cache de filmes,
+percorrendo as páginas por cursor: tempo de parede e de CPU por página, e a
+aceleração do caminho rápido. Antes de medir, confere que os dois caminhos
+produzem o mesmo JSON.
+
+Uso:
+    python -m benchmarks.serialization [--limit 100] [--paginas 50] [--repeticoes 3] [--saida serializacao.json]
+
+De ponta a ponta, compare benchmarks.load com SERIALIZACAO_RAPIDA=false e true.
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import orjson
+
+from app import database, serialization
+from app.cache import filmes_cache
+from app.services.movie_service import MovieService
+from app.services.user_service import UserService
+from benchmarks.load import commit_atual, contagens
+
+ROTAS: Dict[str, Callable] = {
+    "GET /filmes/": lambda db, cursor, limit: MovieService.list_movies_json(db, limit=limit, cursor=cursor),
+    "GET /usuarios/": lambda db, cursor, limit: UserService.list_users_json(db, limit=limit, cursor=cursor),
+}
+
+MODOS = (("schemas", False), ("rapida", True))
+
+
+def gerar_pagina(db, gerar: Callable, cursor: str, limit: int, rapida: bool) -> Tuple[bytes, float, float]:
+    """Uma página, sem cache: (payload, segundos de parede, segundos de CPU)."""
+    serialization.SERIALIZACAO_RAPIDA = rapida
+    filmes_cache.clear()
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    payload = gerar(db, cursor, limit)
+    return payload, time.perf_counter() - inicio, time.process_time() - inicio_cpu
+
+
+def percorrer(db, gerar: Callable, limit: int, paginas: int, rapida: bool) -> Dict:
+    """Percorre `paginas` páginas por cursor (recomeçando do início no fim da listagem)."""
+    cursor: Optional[str] = ""
+    parede = cpu = 0.0
+    tamanho = 0
+    for _ in range(paginas):
+        payload, segundos, segundos_cpu = gerar_pagina(db, gerar, cursor, limit, rapida)
+        parede += segundos
+        cpu += segundos_cpu
+        tamanho += len(payload)
+        cursor = orjson.loads(payload)["next_cursor"] or ""
+    return {
+        "ms_por_pagina": round(parede / paginas * 1000, 3),
+        "cpu_ms_por_pagina": round(cpu / paginas * 1000, 3),
+        "paginas_por_s": round(paginas / parede, 1) if parede else None,
+        "bytes_por_pagina": tamanho // paginas,
+    }
+
+
+def medir(db, limit: int, paginas: int, repeticoes: int) -> Dict:
+    resultado = {}
+    for rota, gerar in ROTAS.items():
+        primeiras = {modo: gerar_pagina(db, gerar, "", limit, rapida)[0] for modo, rapida in MODOS}
+        if json.loads(primeiras["schemas"]) != json.loads(primeiras["rapida"]):
+            raise RuntimeError(f"{rota}: os dois caminhos produzem JSON diferente")
+        medidas = {}
+        for modo, rapida in MODOS:
+            # Aquecimento, depois a melhor de `repeticoes` passadas
+            percorrer(db, gerar, limit, min(paginas, 5), rapida)
+            passadas = [percorrer(db, gerar, limit, paginas, rapida) for _ in range(repeticoes)]
+            medidas[modo] = min(passadas, key=lambda passada: passada["ms_por_pagina"])
+        medidas["aceleracao"] = round(medidas["schemas"]["ms_por_pagina"] / medidas["rapida"]["ms_por_pagina"], 2)
+        medidas["aceleracao_cpu"] = round(medidas["schemas"]["cpu_ms_por_pagina"] / medidas["rapida"]["cpu_ms_por_pagina"], 2)
+        resultado[rota] = medidas
+    return resultado
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=100, help="Itens por página")
+    parser.add_argument("--paginas", type=int, default=50, help="Páginas percorridas em cada passada")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default="serializacao.json")
+    args = parser.parse_args(argv)
+
+    original = serialization.SERIALIZACAO_RAPIDA
+    db = database.SessionLocal()
+    try:
+        rotas = medir(db, args.limit, args.paginas, args.repeticoes)
+    finally:
+        db.close()
+        serialization.SERIALIZACAO_RAPIDA = original
+    resultado = {
+        "commit": commit_atual(),
+        "parametros": {"limit": args.limit, "paginas": args.paginas, "repeticoes": args.repeticoes},
+        "dados": contagens(),
+        "rotas": rotas,
+    }
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+    for rota, medidas in rotas.items():
+        print(f"{rota}: schemas {medidas['schemas']['ms_por_pagina']} ms/página, "
+              f"rápida {medidas['rapida']['ms_por_pagina']} ms/página ({medidas['aceleracao']}x, "
+              f"CPU {medidas['aceleracao_cpu']}x)")
+    print(f"-> {args.saida}")
+
+
+if __name__ == "__main__":
+    main()